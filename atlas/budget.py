@@ -0,0 +1,106 @@
+import os
+import resource
+import sys
+import time
+from typing import NamedTuple, Optional
+
+
+class Budget(NamedTuple):
+    """
+    Limits on the work done by a single enumeration i.e. a call to ``generate``. The limits are checked
+    before every run of the generator, so a run in progress is never interrupted.
+
+    Args:
+        max_op_calls (Optional[int]): Maximum number of operator calls across all the runs
+        max_runs (Optional[int]): Maximum number of runs (executions) of the generator
+        time_limit (Optional[float]): Maximum wall-clock time in seconds since the start of the enumeration
+        max_rss (Optional[int]): Maximum resident set size of the process in bytes
+        rss_check_interval (int): The RSS is only checked every ``rss_check_interval`` runs as it is
+            relatively expensive to query
+    """
+    max_op_calls: Optional[int] = None
+    max_runs: Optional[int] = None
+    time_limit: Optional[float] = None
+    max_rss: Optional[int] = None
+    rss_check_interval: int = 64
+
+
+class StopReason:
+    FINISHED = 'finished'
+    MAX_OP_CALLS = 'max_op_calls'
+    MAX_RUNS = 'max_runs'
+    TIME_LIMIT = 'time_limit'
+    MAX_RSS = 'max_rss'
+
+
+class EnumerationSummary:
+    """
+    Summary of an enumeration performed under a budget. ``stop_reason`` is one of the constants in ``StopReason``,
+    or None if the enumeration is in progress or was abandoned by the consumer of ``generate``.
+    """
+
+    def __init__(self):
+        self.stop_reason: Optional[str] = None
+        self.num_runs: int = 0
+        self.num_op_calls: int = 0
+        self.elapsed: float = 0.0
+        self.rss: Optional[int] = None
+
+    def __repr__(self):
+        return f"EnumerationSummary(stop_reason={self.stop_reason!r}, num_runs={self.num_runs}, " \
+               f"num_op_calls={self.num_op_calls}, elapsed={self.elapsed:.3f}, rss={self.rss})"
+
+
+def _get_rss() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    except (OSError, ValueError):
+        #  Fall back to the peak RSS, which is reported in bytes on macOS and kilobytes elsewhere
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class BudgetTracker:
+    def __init__(self, budget: Budget):
+        self.budget = budget
+        self.summary = EnumerationSummary()
+        self.start_time: float = 0.0
+
+    def start(self):
+        self.start_time = time.monotonic()
+
+    def record_run(self, num_op_calls: int):
+        summary = self.summary
+        summary.num_runs += 1
+        summary.num_op_calls += num_op_calls
+
+    def exhausted(self) -> bool:
+        """
+        Check if the budget is exhausted, and if so, record the reason in the summary.
+        """
+        budget = self.budget
+        summary = self.summary
+        summary.elapsed = time.monotonic() - self.start_time
+
+        if budget.max_runs is not None and summary.num_runs >= budget.max_runs:
+            summary.stop_reason = StopReason.MAX_RUNS
+
+        elif budget.max_op_calls is not None and summary.num_op_calls >= budget.max_op_calls:
+            summary.stop_reason = StopReason.MAX_OP_CALLS
+
+        elif budget.time_limit is not None and summary.elapsed >= budget.time_limit:
+            summary.stop_reason = StopReason.TIME_LIMIT
+
+        elif budget.max_rss is not None and summary.num_runs % budget.rss_check_interval == 0:
+            summary.rss = _get_rss()
+            if summary.rss >= budget.max_rss:
+                summary.stop_reason = StopReason.MAX_RSS
+
+        return summary.stop_reason is not None
+
+    def finish(self):
+        self.summary.elapsed = time.monotonic() - self.start_time
+        if self.summary.stop_reason is None:
+            self.summary.stop_reason = StopReason.FINISHED
@@ -0,0 +1,119 @@
+import math
+import statistics
+from typing import Any, Callable, Collection, Dict, List, NamedTuple, Tuple
+
+from atlas.hooks import Hook
+from atlas.operators import OpInfo
+from atlas.strategies.randomized import get_sequence_lengths, get_subset_lengths
+
+
+class SearchSpaceEstimate(NamedTuple):
+    """
+    Estimates of the number of executions (runs) of a generator explored by exhaustive DFS, and the total
+    number of operator calls made across these executions. The intervals are normal-approximation confidence
+    intervals, which can be optimistic for very unbalanced search trees.
+    """
+    num_executions: float
+    num_executions_interval: Tuple[float, float]
+    num_op_calls: float
+    num_op_calls_interval: Tuple[float, float]
+    num_probes: int
+
+
+def _subset_branching(domain, retval, lengths: Collection[int] = None, include_empty: bool = False, **kwargs):
+    lengths = get_subset_lengths(domain, lengths, include_empty)
+    return len(lengths) * math.comb(len(domain), len(retval))
+
+
+def _ordered_subset_branching(domain, retval, lengths: Collection[int] = None, include_empty: bool = False,
+                              **kwargs):
+    lengths = get_subset_lengths(domain, lengths, include_empty)
+    return len(lengths) * math.perm(len(domain), len(retval))
+
+
+def _sequence_branching(domain, retval, max_len: int = None, lengths: Collection[int] = None, **kwargs):
+    lengths = get_sequence_lengths(domain, lengths if lengths is not None else range(1, max_len + 1))
+    return len(lengths) * len(domain) ** len(retval)
+
+
+def _product_branching(domain, retval, **kwargs):
+    return math.prod(len(list(d)) for d in domain)
+
+
+def _substr_branching(domain, retval, **kwargs):
+    return len(domain) * (len(domain) + 1) // 2
+
+
+class BranchingRecorder(Hook):
+    """
+    Records the inverse of the probability of every choice made by the operators of ``RandStrategy``, which is
+    the size of the domain of the operator for operators that choose uniformly, such as ``Select``.
+    For every run, it records the product of these values, which is an unbiased estimate of the number of
+    executions (Knuth's estimator), along with the number of operator calls.
+
+    Operators without a known branching function are assumed to choose uniformly from ``domain``.
+    Additional operators can be supported by passing functions to compute the branching of a choice,
+    which are called as ``func(domain, retval, **kwargs)`` where ``kwargs`` are the arguments of the operator.
+    """
+
+    DEFAULT_BRANCHING_FUNCS: Dict[str, Callable] = {
+        'Subset': _subset_branching,
+        'OrderedSubset': _ordered_subset_branching,
+        'Sequence': _sequence_branching,
+        'Product': _product_branching,
+        'Substr': _substr_branching,
+    }
+
+    def __init__(self, branching_funcs: Dict[str, Callable] = None):
+        self.branching_funcs = {**self.DEFAULT_BRANCHING_FUNCS, **(branching_funcs or {})}
+        self.weight: int = 1
+        self.num_ops: int = 0
+
+        #  (weight, number of operator calls) for every finished run
+        self.samples: List[Tuple[int, int]] = []
+
+    def init(self, f_args, f_kwargs, **kwargs):
+        self.samples = []
+
+    def init_run(self, f_args, f_kwargs, **kwargs):
+        self.weight = 1
+        self.num_ops = 0
+
+    def before_op(self, domain=None, context=None, op_info: OpInfo = None, **kwargs):
+        self.num_ops += 1
+
+    def after_op(self, domain=None, context=None, op_info: OpInfo = None, retval: Any = None, **kwargs):
+        func = self.branching_funcs.get(op_info.op_type, None)
+        if func is not None:
+            self.weight *= func(domain, retval, **kwargs)
+
+        else:
+            self.weight *= len(domain)
+
+    def finish_run(self):
+        self.samples.append((self.weight, self.num_ops))
+
+
+def _get_interval(samples: List[float], confidence: float) -> Tuple[float, float]:
+    mean = statistics.fmean(samples)
+    if len(samples) < 2:
+        return mean, mean
+
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    delta = z * statistics.stdev(samples) / math.sqrt(len(samples))
+    return max(mean - delta, 0.0), mean + delta
+
+
+def make_estimate(recorder: BranchingRecorder, confidence: float) -> SearchSpaceEstimate:
+    executions = [float(weight) for weight, _ in recorder.samples]
+    op_calls = [float(weight) * num_ops for weight, num_ops in recorder.samples]
+    if len(executions) == 0:
+        raise ValueError("No runs finished while probing the search space")
+
+    return SearchSpaceEstimate(
+        num_executions=statistics.fmean(executions),
+        num_executions_interval=_get_interval(executions, confidence),
+        num_op_calls=statistics.fmean(op_calls),
+        num_op_calls_interval=_get_interval(op_calls, confidence),
+        num_probes=len(executions)
+    )
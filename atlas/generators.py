@@ -1,34 +1,58 @@
 import ast
 import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import hashlib
+import importlib.util
 import inspect
+import marshal
+import os
+import random
+import tempfile
 import textwrap
+import threading
+import types
 import warnings
 import weakref
 import sys
-from typing import Callable, Set, Optional, Union, Dict, List, Any, Iterable, Iterator, Type, Tuple
+from typing import Callable, Set, Optional, Union, Dict, List, Any, Iterable, Iterator, Type, Tuple, NamedTuple, \
+    Sequence
 
-import astunparse
+import cloudpickle
+import numpy as np
 
+from atlas.budget import Budget, BudgetTracker, EnumerationSummary
+from atlas.estimation import BranchingRecorder, SearchSpaceEstimate, make_estimate
+from atlas.exceptions import ExceptionAsContinue
 from atlas.hooks import Hook
+from atlas.memo import MemoCache, RecordingStrategy
 from atlas.models import GeneratorModel
 from atlas.operators import OpInfo, OpInfoConstructor, returns_lambda
-from atlas.strategies import RandStrategy, DfsStrategy, PartialReplayStrategy
+from atlas.strategies import RandStrategy, DfsStrategy, PartialReplayStrategy, FullReplayStrategy, \
+    BatchReplayStrategy, BestFirstStrategy
 from atlas.strategy import Strategy
-from atlas.tracing import DefaultTracer, GeneratorTrace
+from atlas.tracing import DefaultTracer, GeneratorTrace, TraceStore, TraceTrie, ChoiceTrace, make_tracer, \
+    get_worker_tracing
 from atlas.utils import astutils
 from atlas.utils.genutils import register_generator, register_group, get_group_by_name
-from atlas.utils.inspection import getclosurevars_recursive
+from atlas.utils.inspection import getclosurevars_recursive, get_annotation_names, get_qualified_name, \
+    resolve_qualified_name
 from atlas.warnings import PerformanceWarning
 from atlas.wrappers import CallGenerator
 
 _GEN_EXEC_ENV_VAR = "_atlas_gen_exec_env"
 _GEN_STRATEGY_VAR = "_atlas_gen_strategy"
 _GEN_MODEL_VAR = "_atlas_gen_model"
-_GEN_HOOK_WRAPPER = "_atlas_hook_wrapper"
 _GEN_HOOK_VAR = "_atlas_gen_hooks"
 _GEN_COMPOSITION_ID = "_atlas_composition_call"
 _GEN_COMPILED_TARGET_ID = "_atlas_compiled_function"
 
+#  The execution environment whose generator is currently executing, if any.
+#  Set only for the duration of each step of ``GeneratorExecEnvironment.generate``
+_ACTIVE_EXEC_ENV: contextvars.ContextVar = contextvars.ContextVar("_atlas_active_gen_exec_env", default=None)
+
 
 def make_strategy(strategy: Union[str, Strategy]) -> Strategy:
     if isinstance(strategy, Strategy):
@@ -43,16 +67,61 @@ def make_strategy(strategy: Union[str, Strategy]) -> Strategy:
     raise Exception(f"Unrecognized strategy - {strategy}")
 
 
-def hook_wrapper(*args, _atlas_gen_strategy=None, _atlas_gen_hooks=None, **kwargs):
-    for h in _atlas_gen_hooks:
-        h.before_op(*args, **kwargs)
+def _overrides(hook: Hook, method: str) -> bool:
+    #  Methods can also be assigned on the instance
+    return method in getattr(hook, '__dict__', ()) or getattr(type(hook), method) is not getattr(Hook, method)
+
+
+def observes_ops(hooks: List[Hook]) -> bool:
+    """
+    Return whether any of the hooks overrides ``before_op`` or ``after_op``. Generators are compiled with hook
+    support only if this is the case, so hooks that only observe runs do not slow down operator calls.
+    """
+    return any(_overrides(h, 'before_op') or _overrides(h, 'after_op') for h in hooks)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_hook_wrapper_factory(num_before: int, num_after: int) -> Callable:
+    #  Unrolls the calls to the hooks, which avoids iterating over the hooks and calling inherited no-op methods.
+    #  The arguments of operator calls are spelled out as it is cheaper than packing and unpacking them every call
+    args = "domain, context=context, model=model, op_info=op_info, handler=handler"
+    before = [f"before_{i}" for i in range(num_before)]
+    after = [f"after_{i}" for i in range(num_after)]
+    lines = [f"def factory({', '.join(before + after)}):",
+             f"    def hook_wrapper(domain=None, context=None, model=None, op_info=None, handler=None, "
+             f"{_GEN_STRATEGY_VAR}=None, **kwargs):"]
+    lines.extend(f"        {name}({args}, **kwargs)" for name in before)
+    if num_after == 0:
+        lines.append(f"        return {_GEN_STRATEGY_VAR}.generic_op({args}, **kwargs)")
+
+    else:
+        lines.append(f"        result = {_GEN_STRATEGY_VAR}.generic_op({args}, **kwargs)")
+        lines.extend(f"        {name}({args}, retval=result, **kwargs)" for name in after)
+        lines.append("        return result")
 
-    result = _atlas_gen_strategy.generic_op(*args, **kwargs)
+    lines.append("    return hook_wrapper")
+    namespace: Dict[str, Any] = {}
+    exec("\n".join(lines), namespace)
+    return namespace['factory']
 
-    for h in _atlas_gen_hooks:
-        h.after_op(*args, **kwargs, retval=result)
 
-    return result
+def get_op_hooks(hooks: List[Hook]) -> Tuple[List[Callable], List[Callable]]:
+    """
+    Return the ``before_op`` and ``after_op`` methods of the hooks that override them, in order
+    """
+    return ([h.before_op for h in hooks if _overrides(h, 'before_op')],
+            [h.after_op for h in hooks if _overrides(h, 'after_op')])
+
+
+def make_hook_wrapper(hooks: List[Hook]) -> Callable:
+    """
+    Return the function that operator calls are routed through in generators compiled with hook support.
+    It calls the ``before_op`` and ``after_op`` methods of the hooks, in order, around the call to the
+    ``generic_op`` method of the strategy, skipping the hooks that do not override them. The methods are
+    looked up when the wrapper is created, so the wrapper has to be re-created if the hooks change.
+    """
+    before, after = get_op_hooks(hooks)
+    return _get_hook_wrapper_factory(len(before), len(after))(*before, *after)
 
 
 def cache_wrapper(compiled_func: Callable):
@@ -70,41 +139,227 @@ def cache_wrapper(compiled_func: Callable):
     return wrapper
 
 
+def memo_wrapper(gen: 'Generator', compiled_func: Callable):
+    def wrapper(*args, **kwargs):
+        env: GeneratorExecEnvironment = kwargs[_GEN_EXEC_ENV_VAR]
+        user_kwargs = {k: v for k, v in kwargs.items()
+                       if k not in (_GEN_EXEC_ENV_VAR, _GEN_STRATEGY_VAR, _GEN_MODEL_VAR, _GEN_HOOK_VAR)}
+
+        def run(recorder: RecordingStrategy):
+            return env.run_recording(recorder, compiled_func, args, {**kwargs, _GEN_STRATEGY_VAR: recorder})
+
+        return env.memo.call(gen, args, user_kwargs, kwargs[_GEN_STRATEGY_VAR], kwargs[_GEN_MODEL_VAR], run)
+
+    return wrapper
+
+
+def lazy_compilation_wrapper(gen: 'Generator', namespace: Dict[str, Any], call_id: str, with_hooks: bool):
+    """
+    Placeholder for the call to the composed generator ``gen`` inside a compiled generator. The generator is
+    compiled for the strategy it is invoked with on the first invocation, after which the placeholder
+    replaces itself in ``namespace`` with the compiled function.
+    """
+    def wrapper(*args, **kwargs):
+        strategy = kwargs.get(_GEN_STRATEGY_VAR)
+        if isinstance(strategy, RecordingStrategy):
+            strategy = strategy.strategy
+
+        if isinstance(strategy, PartialReplayStrategy):
+            strategy = strategy.backup_strategy
+
+        compiled_func = compile_func(gen, gen.func, strategy, with_hooks)
+        if gen.memoize and not with_hooks:
+            #  Hooks observe every operator call, which is not possible if results are served from the cache
+            compiled_func = memo_wrapper(gen, compiled_func)
+
+        elif gen.caching and isinstance(strategy, DfsStrategy):
+            #  Add instructions for using cached result if any
+            compiled_func = cache_wrapper(compiled_func)
+
+        namespace[call_id] = compiled_func
+        return compiled_func(*args, **kwargs)
+
+    return wrapper
+
+
+class CompilationArtifact(NamedTuple):
+    """
+    The result of rewriting a generator function. It only contains data that can be marshalled, and is
+    linked against the namespace of the function and the operator handlers of the strategy at load time.
+    """
+    #  Code object of the module defining the rewritten function
+    code: types.CodeType
+    #  Tuples of the form (op_info variable, handler variable, dispatcher variable, OpInfo) for every operator call.
+    #  The dispatcher variable is None if the call is routed through the generic_op method of the strategy
+    op_calls: Tuple[Tuple[str, str, Optional[str], OpInfo], ...]
+    #  Tuples of the form (call variable, qualified name of the generator) for every composed generator call
+    compositions: Tuple[Tuple[str, str], ...]
+    #  Names used in the annotations of the function. Required to construct the namespace of the function
+    annotation_names: Tuple[str, ...]
+    #  Tuples of the form (qualified name, kind) for every called name that was statically resolved, where the
+    #  kind is one of the ``_CALL_KIND_*`` constants. Used to detect stale artifacts when loading from disk
+    call_kinds: Tuple[Tuple[str, str], ...]
+
+
+_CALL_KIND_UNRESOLVED = 'unresolved'
+_CALL_KIND_GENERATOR = 'generator'
+_CALL_KIND_CALL_GENERATOR = 'call_generator'
+_CALL_KIND_OTHER = 'other'
+
+
+def _get_call_kind(resolution: Tuple[bool, Any]) -> str:
+    found, function = resolution
+    if not found:
+        return _CALL_KIND_UNRESOLVED
+
+    if isinstance(function, Generator):
+        return _CALL_KIND_GENERATOR
+
+    if function is CallGenerator:
+        return _CALL_KIND_CALL_GENERATOR
+
+    return _CALL_KIND_OTHER
+
+
 class CompilationCache:
     WITHOUT_HOOKS: Dict[Type[Strategy], weakref.WeakKeyDictionary] = collections.defaultdict(weakref.WeakKeyDictionary)
     WITH_HOOKS: Dict[Type[Strategy], weakref.WeakKeyDictionary] = collections.defaultdict(weakref.WeakKeyDictionary)
+    LOCK: threading.RLock = threading.RLock()
 
+    #  Directory of the opt-in on-disk cache of compilation artifacts. Disabled if None.
+    PERSISTENT_DIR: Optional[str] = os.environ.get("ATLAS_COMPILATION_CACHE_DIR", None)
 
-def compile_func(gen: 'Generator', func: Callable, strategy: Strategy, with_hooks: bool = False) -> Callable:
+    #  Bump this whenever the artifact format changes
+    PERSISTENT_FORMAT_VERSION: int = 3
+
+    @classmethod
+    def enable_persistence(cls, path: str):
+        """
+        Store compilation artifacts in ``path`` so that subsequent processes can skip source retrieval,
+        AST rewriting and compilation of generators that have not changed. The cache can also be enabled
+        by setting the ``ATLAS_COMPILATION_CACHE_DIR`` environment variable.
+
+        Args:
+            path (str): The directory to use for the cache. It is created if it does not exist.
+
+        """
+        os.makedirs(path, exist_ok=True)
+        cls.PERSISTENT_DIR = path
+
+    @classmethod
+    def disable_persistence(cls):
+        cls.PERSISTENT_DIR = None
+
+    @classmethod
+    def clear(cls):
+        """
+        Clear the in-memory cache. The on-disk cache, if any, is left untouched.
+        """
+        with cls.LOCK:
+            cls.WITHOUT_HOOKS.clear()
+            cls.WITH_HOOKS.clear()
+
+    @classmethod
+    def get_persistent_key(cls, gen: 'Generator', func: Callable, strategy: Strategy,
+                           with_hooks: bool) -> Optional[str]:
+        filename = func.__code__.co_filename
+        source_digest = _get_file_digest(filename)
+        if source_digest is None:
+            return None
+
+        known_ops = sorted((name, sorted((handler.__qualname__, sorted(attrs.items(), key=repr))
+                                         for handler, attrs in handlers))
+                           for name, handlers in strategy.get_known_ops().items())
+
+        key = repr((
+            cls.PERSISTENT_FORMAT_VERSION,
+            importlib.util.MAGIC_NUMBER,
+            _get_file_digest(__file__),
+            source_digest,
+            os.path.abspath(filename),
+            func.__code__.co_firstlineno,
+            func.__qualname__,
+            gen.name,
+            gen.group,
+            f"{strategy.__class__.__module__}.{strategy.__class__.__qualname__}",
+            [_get_file_digest(getattr(sys.modules.get(c.__module__), '__file__', None) or '')
+             for c in strategy.__class__.__mro__],
+            known_ops,
+            sorted(strategy.get_known_methods()),
+            with_hooks
+        ))
+
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def load_persistent(cls, key: str) -> Optional[CompilationArtifact]:
+        try:
+            with open(os.path.join(cls.PERSISTENT_DIR, f"{key}.atlas"), 'rb') as f:
+                code, op_calls, compositions, annotation_names, call_kinds = marshal.load(f)
+
+            return CompilationArtifact(
+                code=code,
+                op_calls=tuple((op_info_var, handler_var, dispatcher_var, OpInfo(*op_info))
+                               for op_info_var, handler_var, dispatcher_var, op_info in op_calls),
+                compositions=compositions,
+                annotation_names=annotation_names,
+                call_kinds=call_kinds
+            )
+
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+    @classmethod
+    def store_persistent(cls, key: str, artifact: CompilationArtifact):
+        path = os.path.join(cls.PERSISTENT_DIR, f"{key}.atlas")
+        payload = (
+            artifact.code,
+            tuple((op_info_var, handler_var, dispatcher_var, tuple(op_info))
+                  for op_info_var, handler_var, dispatcher_var, op_info in artifact.op_calls),
+            artifact.compositions,
+            artifact.annotation_names,
+            artifact.call_kinds
+        )
+
+        try:
+            os.makedirs(cls.PERSISTENT_DIR, exist_ok=True)
+
+            #  Write to a temporary file first so that concurrent processes never see partial entries
+            fd, tmp_path = tempfile.mkstemp(dir=cls.PERSISTENT_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                marshal.dump(payload, f)
+
+            os.replace(tmp_path, path)
+
+        except (OSError, ValueError):
+            pass
+
+
+@functools.lru_cache(maxsize=None)
+def _get_file_digest(filename: str) -> Optional[str]:
+    try:
+        with open(filename, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    except OSError:
+        return None
+
+
+def rewrite_func(gen: 'Generator', func: Callable, strategy: Strategy, with_hooks: bool = False) -> CompilationArtifact:
     """
-    The compilation basically assigns functionality to each of the operator calls as
-    governed by the semantics (strategy). Memoization is done with the keys as the `func`,
-    the class of the `strategy` and the `with_hooks` argument.
+    Rewrite the operator calls, known method calls and composed generator calls in the source of ``func``
+    as governed by the semantics (strategy), and compile the result.
 
     Args:
         gen (Generator): The generator object containing the function to compile
         func (Callable): The function to compile
         strategy (Strategy): The strategy governing the behavior of the operators
-        with_hooks (bool): Whether support for hooks is required
+        with_hooks (bool): Whether support for hooks observing operator calls is required
 
     Returns:
-        The compiled function
+        A CompilationArtifact
 
     """
-
-    if isinstance(strategy, PartialReplayStrategy):
-        strategy = strategy.backup_strategy
-
-    if with_hooks:
-        cache = CompilationCache.WITH_HOOKS[strategy.__class__]
-    else:
-        cache = CompilationCache.WITHOUT_HOOKS[strategy.__class__]
-
-    if func in cache:
-        return cache[func]
-
-    cache[func] = None
-
     source_code, start_lineno = inspect.getsourcelines(func)
     source_code = ''.join(source_code)
     f_ast = astutils.parse(textwrap.dedent(source_code))
@@ -121,16 +376,16 @@ def compile_func(gen: 'Generator', func: Callable, strategy: Strategy, with_hook
 
     #  Get all the external dependencies of this function.
     #  We rely on a modified closure function adopted from the ``inspect`` library.
-    closure_vars = getclosurevars_recursive(func, f_ast)
+    annotation_names = get_annotation_names(f_ast)
+    closure_vars = getclosurevars_recursive(func, annotation_names=annotation_names)
     g = {**closure_vars.nonlocals.copy(), **closure_vars.globals.copy()}
     known_ops: Set[str] = strategy.get_known_ops()
     known_methods: Set[str] = strategy.get_known_methods()
     op_info_constructor = OpInfoConstructor()
-    delayed_compilations: List[Tuple[Generator, str]] = []
 
-    ops = {}
-    handlers = {}
-    op_infos = {}
+    op_calls: List[Tuple[str, str, Optional[str], OpInfo]] = []
+    resolutions: Dict[str, Tuple[bool, Any]] = {}
+    compositions: List[Tuple[str, str]] = []
     op_idx: int = 0
     composition_cnt: int = 0
     for n in astutils.preorder_traversal(f_ast):
@@ -139,53 +394,80 @@ def compile_func(gen: 'Generator', func: Callable, strategy: Strategy, with_hook
             #  This new function is determined by the semantics (strategy) being used for compilation.
             #  Also determine if there any eligible hooks for this operator call.
             op_idx += 1
-            handler_idx = len(handlers)
+            handler_idx = len(op_calls)
             op_info: OpInfo = op_info_constructor.get(n, gen.name, gen.group)
+            handler = strategy.get_op_handler(op_info)
+            op_args = n.args[:]
 
-            n.keywords.append(ast.keyword(arg='model', value=ast.Name(_GEN_MODEL_VAR, ast.Load())))
+            #  Strategies can provide a specialized callable for the call-site which is then called directly
+            #  with the strategy and the model as the first two positional arguments
+            dispatcher_var: Optional[str] = None
+            if (not with_hooks) and strategy.get_op_dispatcher(op_info, handler) is not None:
+                dispatcher_var = f"_op_dispatch_{op_idx}"
+                n.func = ast.Name(dispatcher_var, ast.Load())
+                n.args = [ast.Name(_GEN_STRATEGY_VAR, ast.Load()), ast.Name(_GEN_MODEL_VAR, ast.Load()), *op_args]
 
-            n.keywords.append(ast.keyword(arg='op_info', value=ast.Name(f"_op_info_{op_idx}", ast.Load())))
-            op_infos[f"_op_info_{op_idx}"] = op_info
+            else:
+                n.keywords.append(ast.keyword(arg='model', value=ast.Name(_GEN_MODEL_VAR, ast.Load())))
 
-            n.keywords.append(ast.keyword(arg='handler', value=ast.Name(f"_handler_{handler_idx}", ast.Load())))
-            handler = strategy.get_op_handler(op_info)
-            handlers[f"_handler_{handler_idx}"] = handler
+                n.keywords.append(ast.keyword(arg='op_info', value=ast.Name(f"_op_info_{op_idx}", ast.Load())))
+                n.keywords.append(ast.keyword(arg='handler', value=ast.Name(f"_handler_{handler_idx}", ast.Load())))
 
-            if not with_hooks:
-                n.func = astutils.parse(f"{_GEN_STRATEGY_VAR}.generic_op").value
-            else:
-                n.keywords.append(ast.keyword(arg=_GEN_HOOK_VAR, value=ast.Name(_GEN_HOOK_VAR, ctx=ast.Load())))
-                n.keywords.append(ast.keyword(arg=_GEN_STRATEGY_VAR, value=ast.Name(_GEN_STRATEGY_VAR, ctx=ast.Load())))
+                if not with_hooks:
+                    n.func = astutils.parse(f"{_GEN_STRATEGY_VAR}.generic_op").value
+                else:
+                    #  The hook variable holds the wrapper returned by ``make_hook_wrapper`` for the hooks in use
+                    n.keywords.append(ast.keyword(arg=_GEN_STRATEGY_VAR,
+                                                  value=ast.Name(_GEN_STRATEGY_VAR, ctx=ast.Load())))
 
-                n.func.id = _GEN_HOOK_WRAPPER
-                ops[_GEN_HOOK_WRAPPER] = hook_wrapper
+                    n.func = ast.Name(_GEN_HOOK_VAR, ast.Load())
+
+            op_calls.append((f"_op_info_{op_idx}", f"_handler_{handler_idx}", dispatcher_var, op_info))
 
             if returns_lambda(handler):
                 n.func = ast.Call(func=n.func, args=n.args[:], keywords=n.keywords[:])
                 n.keywords = []
-                n.args = [n.args[0]]
-
-            ast.fix_missing_locations(n)
+                n.args = [op_args[0]]
 
         elif isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id in known_methods:
             #  Similar in spirit to the known_ops case, just much less fancy stuff to do.
             #  Only need to get the right handler which we will achieve by simply making this
             #  a method call instead of a regular call.
             n.func = ast.Attribute(value=ast.Name(_GEN_STRATEGY_VAR, ctx=ast.Load()), attr=n.func.id, ctx=ast.Load())
-            ast.fix_missing_locations(n)
 
         elif isinstance(n, ast.Call):
-            #  Try to check if it is a call to a Generator
-            #  TODO : Can we be more sophisticated in our static analysis here
-            try:
-                function = eval(astunparse.unparse(n.func), g)
-            except:
+            #  Check if it is a call to a Generator by statically resolving the called name
+            name = get_qualified_name(n.func)
+            if name is None:
+                continue
+
+            if name not in resolutions:
+                resolutions[name] = resolve_qualified_name(name, g)
+
+            found, function = resolutions[name]
+            if not found:
                 continue
 
+            owner = name.rpartition('.')[0]
+            if isinstance(function, Generator) and owner != '':
+                if owner not in resolutions:
+                    resolutions[owner] = resolve_qualified_name(owner, g)
+
+                if not inspect.ismodule(resolutions[owner][1]):
+                    #  Generators accessed through classes or instances may be bound at runtime, so the call is
+                    #  kept as is and only passed the execution environment for the composition
+                    n.keywords.append(ast.keyword(arg=_GEN_EXEC_ENV_VAR,
+                                                  value=ast.Name(_GEN_EXEC_ENV_VAR, ast.Load())))
+                    continue
+
             if isinstance(function, Generator):
                 call_id = f"{_GEN_COMPOSITION_ID}_{composition_cnt}"
                 composition_cnt += 1
-                n.func.id = call_id
+
+                #  We delay compilation to handle mutually recursive generators
+                compositions.append((call_id, name))
+
+                n.func = ast.Name(call_id, ast.Load())
                 n.keywords.append(ast.keyword(arg=_GEN_EXEC_ENV_VAR,
                                               value=ast.Name(_GEN_EXEC_ENV_VAR, ast.Load())))
                 n.keywords.append(ast.keyword(arg=_GEN_STRATEGY_VAR,
@@ -194,10 +476,6 @@ def compile_func(gen: 'Generator', func: Callable, strategy: Strategy, with_hook
                                               value=ast.Name(_GEN_MODEL_VAR, ast.Load())))
                 n.keywords.append(ast.keyword(arg=_GEN_HOOK_VAR,
                                               value=ast.Name(_GEN_HOOK_VAR, ast.Load())))
-                ast.fix_missing_locations(n)
-
-                #  We delay compilation to handle mutually recursive generators
-                delayed_compilations.append((function, call_id))
 
             elif function is CallGenerator:
                 wrapped_func = n.args[0]
@@ -206,7 +484,6 @@ def compile_func(gen: 'Generator', func: Callable, strategy: Strategy, with_hook
                 n.keywords = wrapped_func.keywords[:]
                 n.keywords.append(ast.keyword(arg=_GEN_EXEC_ENV_VAR,
                                               value=ast.Name(_GEN_EXEC_ENV_VAR, ast.Load())))
-                ast.fix_missing_locations(n)
 
     #  Add the execution environment argument to the function
     f_ast.args.kwonlyargs.append(ast.arg(arg=_GEN_EXEC_ENV_VAR, annotation=None))
@@ -223,48 +500,128 @@ def compile_func(gen: 'Generator', func: Callable, strategy: Strategy, with_hook
     #  Add the hook argument to the function
     f_ast.args.kwonlyargs.append(ast.arg(arg=_GEN_HOOK_VAR, annotation=None))
     f_ast.args.kw_defaults.append(ast.NameConstant(value=None))
-    ast.fix_missing_locations(f_ast)
 
-    #  New name so it doesn't clash with original
-    func_name = f"{_GEN_COMPILED_TARGET_ID}_{len(cache)}"
+    #  Locations of all the nodes introduced above are filled in one pass
+    ast.fix_missing_locations(f_ast)
 
-    g.update({k: v for k, v in ops.items()})
-    g.update({k: v for k, v in handlers.items()})
-    g.update({k: v for k, v in op_infos.items()})
-    
     if sys.version_info >= (3, 8):
         module = ast.Module(type_ignores=[])
     else:
         module = ast.Module()
     module.body = [f_ast]
 
-    #  Passing ``g`` to exec allows us to execute all the new functions
-    #  we assigned to every operator call in the previous AST walk
-    filename = inspect.getabsfile(func)
-    exec(compile(module, filename=filename, mode="exec"), g)
-    result = g[func.__name__]
-    g["__name__"] = filename
+    return CompilationArtifact(
+        code=compile(module, filename=inspect.getabsfile(func), mode="exec"),
+        op_calls=tuple(op_calls),
+        compositions=tuple(compositions),
+        annotation_names=tuple(annotation_names),
+        call_kinds=tuple((name, _get_call_kind(resolution)) for name, resolution in resolutions.items())
+    )
 
-    if inspect.ismethod(func):
-        result = result.__get__(func.__self__, func.__self__.__class__)
 
-    #  Restore the correct namespace so that tracebacks contain actual function names
-    g[gen.name] = gen
-    g[func_name] = result
+def compile_func(gen: 'Generator', func: Callable, strategy: Strategy, with_hooks: bool = False) -> Callable:
+    """
+    The compilation basically assigns functionality to each of the operator calls as
+    governed by the semantics (strategy). Memoization is done with the keys as the `func`,
+    the class of the `strategy` and the `with_hooks` argument. If persistence is enabled
+    for the ``CompilationCache``, the rewritten code is additionally stored on disk.
+
+    Args:
+        gen (Generator): The generator object containing the function to compile
+        func (Callable): The function to compile
+        strategy (Strategy): The strategy governing the behavior of the operators
+        with_hooks (bool): Whether support for hooks observing operator calls is required
+
+    Returns:
+        The compiled function
 
-    cache[func] = result
+    """
 
-    #  Handle the delayed compilations now that we have populated the cache
-    for gen, call_id in delayed_compilations:
-        compiled_func = compile_func(gen, gen.func, strategy, with_hooks)
-        if gen.caching and isinstance(strategy, DfsStrategy):
-            #  Add instructions for using cached result if any
-            g[call_id] = cache_wrapper(compiled_func)
+    if isinstance(strategy, RecordingStrategy):
+        strategy = strategy.strategy
 
-        else:
-            g[call_id] = compiled_func
+    if isinstance(strategy, PartialReplayStrategy):
+        strategy = strategy.backup_strategy
 
-    return result
+    if isinstance(strategy, BestFirstStrategy):
+        #  The operators are rewritten for, and dispatched by, the base strategy
+        strategy = strategy.base_strategy
+
+    if inspect.ismethod(func):
+        #  Compile the underlying function so that the compiled code is shared by all the instances of the class
+        result = compile_func(gen, func.__func__, strategy, with_hooks)
+        return result.__get__(func.__self__, func.__self__.__class__)
+
+    if with_hooks:
+        cache = CompilationCache.WITH_HOOKS[strategy.__class__]
+    else:
+        cache = CompilationCache.WITHOUT_HOOKS[strategy.__class__]
+
+    if func in cache:
+        return cache[func]
+
+    #  Compilation is serialized so that concurrent executions never observe partially linked functions
+    with CompilationCache.LOCK:
+        if func in cache:
+            return cache[func]
+
+        artifact: Optional[CompilationArtifact] = None
+        persistent_key: Optional[str] = None
+        if CompilationCache.PERSISTENT_DIR is not None:
+            persistent_key = CompilationCache.get_persistent_key(gen, func, strategy, with_hooks)
+            if persistent_key is not None:
+                artifact = CompilationCache.load_persistent(persistent_key)
+
+        g: Optional[Dict[str, Any]] = None
+        if artifact is not None:
+            closure_vars = getclosurevars_recursive(func, annotation_names=list(artifact.annotation_names))
+            g = {**closure_vars.nonlocals.copy(), **closure_vars.globals.copy()}
+
+            #  The key only covers the source of ``func``, so the entry is stale if any called name now resolves
+            #  to something of a different kind e.g. a function in another module became a generator
+            if not all(_get_call_kind(resolve_qualified_name(name, g)) == kind for name, kind in artifact.call_kinds):
+                artifact = None
+
+        if artifact is None:
+            artifact = rewrite_func(gen, func, strategy, with_hooks)
+            closure_vars = getclosurevars_recursive(func, annotation_names=list(artifact.annotation_names))
+            g = {**closure_vars.nonlocals.copy(), **closure_vars.globals.copy()}
+            if persistent_key is not None:
+                CompilationCache.store_persistent(persistent_key, artifact)
+
+        #  New name so it doesn't clash with original
+        func_name = f"{_GEN_COMPILED_TARGET_ID}_{len(cache)}"
+
+        for op_info_var, handler_var, dispatcher_var, op_info in artifact.op_calls:
+            g[op_info_var] = op_info
+            g[handler_var] = handler = strategy.get_op_handler(op_info)
+            if dispatcher_var is not None:
+                g[dispatcher_var] = strategy.get_op_dispatcher(op_info, handler)
+
+        delayed_compilations: List[Tuple[Generator, str]] = [(resolve_qualified_name(name, g)[1], call_id)
+                                                             for call_id, name in artifact.compositions]
+
+        #  Passing ``g`` to exec allows us to execute all the new functions
+        #  we assigned to every operator call during the rewrite
+        filename = artifact.code.co_filename
+        exec(artifact.code, g)
+        result = g[func.__name__]
+        g["__name__"] = filename
+
+        #  Restore the correct namespace so that tracebacks contain actual function names.
+        #  Bound replicas are skipped as the compiled code is shared by all the instances
+        if gen.func is func:
+            g[gen.name] = gen
+
+        g[func_name] = result
+
+        cache[func] = result
+
+        #  Composed generators are compiled on their first invocation. This also handles mutually recursive generators
+        for gen, call_id in delayed_compilations:
+            g[call_id] = lazy_compilation_wrapper(gen, g, call_id, with_hooks)
+
+        return result
 
 
 class Generator:
@@ -281,6 +638,7 @@ class Generator:
                  group: str = None,
                  metadata: Dict[Any, Any] = None,
                  caching: bool = False,
+                 memoize: bool = False,
                  **kwargs):
 
         if not inspect.isfunction(func):
@@ -305,9 +663,15 @@ class Generator:
             self.metadata = metadata
 
         self.caching = caching
+        self.memoize = memoize
 
         self._default_exec_env: Optional[GeneratorExecEnvironment] = None
 
+        #  Bumped whenever the defaults change, so that cached bound replicas (see ``__get__``) can be refreshed
+        self._defaults_version: int = 0
+        #  Bound replicas of generators defined as methods, keyed by the instance they are bound to
+        self._bound_replicas: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
     def set_default_strategy(self, strategy: Union[str, Strategy], as_group: bool = True):
         """
         Set a new strategy for the generator. This is useful for exploring different behaviors of the generator
@@ -327,6 +691,7 @@ class Generator:
                     g.set_strategy(self.strategy, as_group=False)
 
         self._default_exec_env = None
+        self._defaults_version += 1
 
     def set_default_model(self, model: GeneratorModel):
         """
@@ -337,6 +702,7 @@ class Generator:
         """
         self.model = model
         self._default_exec_env = None
+        self._defaults_version += 1
 
     def register_default_hooks(self, *hooks: Hook, as_group: bool = True):
         """
@@ -349,6 +715,7 @@ class Generator:
 
         """
         self.hooks.extend(hooks)
+        self._defaults_version += 1
 
         if as_group and self.group is not None:
             for g in get_group_by_name(self.group):
@@ -372,6 +739,7 @@ class Generator:
 
         else:
             self.hooks.remove(hook)
+            self._defaults_version += 1
 
         if as_group and self.group is not None:
             for g in get_group_by_name(self.group):
@@ -393,12 +761,8 @@ class Generator:
             return _atlas_gen_exec_env.compositional_call(self, args, kwargs)
 
         #  Try to find the calling generator execution environment
-        frame = inspect.currentframe().f_back
-        while frame is not None and not ('self' in frame.f_locals and
-                                         isinstance(frame.f_locals['self'], GeneratorExecEnvironment)):
-            frame = frame.f_back
-
-        if frame is None:
+        _atlas_gen_exec_env = _ACTIVE_EXEC_ENV.get()
+        if _atlas_gen_exec_env is None:
             return self.call(*args, **kwargs)
 
         #  This is a compositional call so point out the performance problem.
@@ -409,16 +773,20 @@ class Generator:
                       "CallGenerator(...)",
                       PerformanceWarning, stacklevel=2)
 
-        _atlas_gen_exec_env = frame.f_locals['self']
         return _atlas_gen_exec_env.compositional_call(self, args, kwargs)
 
-    def generate(self, *args, **kwargs):
+    def generate(self, *args, resume_from: Optional[Sequence[int]] = None, budget: Optional[Budget] = None,
+                 **kwargs):
         """
         Create an iterator for the result of all possible executions (all possible combinations of
         operator choices) of the generator function for the given input i.e. ``(*args, **kwargs)``
 
         Args:
             *args: Positional arguments to the original function
+            resume_from: A choice vector returned by ``DfsStrategy.get_checkpoint``. If provided, enumeration
+                resumes after the execution it corresponds to.
+            budget: Limits on the work done by the enumeration. Use ``with_env`` to access the summary of the
+                enumeration once it stops.
             **kwargs: Keyword arguments to the original function
 
         Returns:
@@ -426,17 +794,7 @@ class Generator:
 
         """
 
-        if self._default_exec_env is None:
-            self._default_exec_env = GeneratorExecEnvironment(
-                gen=self,
-                strategy=self.strategy,
-                model=self.model,
-                tracing=False,
-                hooks=list(self.hooks),
-                replay=None
-            )
-
-        yield from self._default_exec_env.generate(*args, **kwargs)
+        yield from self.get_default_env().generate(*args, resume_from=resume_from, budget=budget, **kwargs)
 
     def call(self, *args, **kwargs):
         """
@@ -450,36 +808,205 @@ class Generator:
         Returns:
             Value returned by the first invocation of the generator
 
+        """
+        return self.get_default_env().call(*args, **kwargs)
+
+    def make_default_env(self) -> 'GeneratorExecEnvironment':
+        return GeneratorExecEnvironment(
+            gen=self,
+            strategy=self.strategy,
+            model=self.model,
+            tracing=False,
+            hooks=list(self.hooks),
+            replay=None
+        )
+
+    def get_default_env(self) -> 'GeneratorExecEnvironment':
+        """
+        Return the execution environment used by ``generate`` and ``call``, created on first use
         """
         if self._default_exec_env is None:
-            self._default_exec_env = GeneratorExecEnvironment(
-                gen=self,
-                strategy=self.strategy,
-                model=self.model,
-                tracing=False,
-                hooks=list(self.hooks),
-                replay=None
-            )
+            self._default_exec_env = self.make_default_env()
 
-        return self._default_exec_env.call(*args, **kwargs)
+        return self._default_exec_env
+
+    def sample(self, n: int, args: Sequence = (), kwargs: Optional[Dict[str, Any]] = None, seed: Optional[int] = None,
+               workers: Optional[int] = None, tracing: Union[bool, str, TraceStore, TraceTrie] = False) -> List:
+        """
+        Run ``n`` executions of the generator for the given input i.e. ``(*args, **kwargs)`` in a tight loop,
+        reusing a single execution environment, and return the results of the successful ones.
+        This is meant for randomized generators, and is much faster than calling ``call`` repeatedly.
+
+        Args:
+            n: Number of executions
+            args: Positional arguments to the original function
+            kwargs: Keyword arguments to the original function
+            seed: If provided, the random number generators are seeded so that the results are reproducible
+            workers: If provided, the executions are split evenly across a pool of ``workers`` processes, each
+                with an independent random stream derived from ``seed``
+            tracing: If set, a list of ``(result, trace)`` tuples is returned instead (see ``with_env``).
+                Traces are only recorded in a ``TraceStore`` or ``TraceTrie`` when not using ``workers``
+
+        Returns:
+            A list of at most ``n`` results, in a reproducible order if ``seed`` is provided
+
+        """
+        args = tuple(args)
+        kwargs = dict(kwargs or {})
+        if workers is None:
+            seed_seq = np.random.SeedSequence(seed) if seed is not None else None
+            with _seeded_sample_env(self, tracing, seed_seq) as env:
+                return env.sample(n, args, kwargs)
+
+        #  Worker processes inherit the state of the random number generators, so they need to be seeded explicitly
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        chunks = [n // workers + (1 if i < n % workers else 0) for i in range(workers)]
+        tracing = get_worker_tracing(tracing)
+        payloads = [cloudpickle.dumps((self, tracing, chunk, chunk_seed, args, kwargs))
+                    for chunk, chunk_seed in zip(chunks, seeds) if chunk > 0]
+
+        results = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_results in executor.map(_sample_worker_run, payloads):
+                results.extend(cloudpickle.loads(chunk_results))
+
+        return results
+
+    def replay_batch(self, traces: Iterable[Union[GeneratorTrace, ChoiceTrace]], strict: bool = False,
+                     strategy: Union[str, Strategy] = None, workers: Optional[int] = None,
+                     tracing: Union[bool, str, TraceStore, TraceTrie] = False,
+                     ignore_exceptions: bool = False) -> List:
+        """
+        Replay many traces in a single execution environment, with the inputs recorded in the traces.
+        The generator is compiled once, and only the replay tables are switched between the traces.
+
+        Args:
+            traces: The traces to replay
+            strict: If True, a KeyError is raised for operators without choices in the trace. Otherwise, such
+                operators are delegated to ``strategy``
+            strategy: The strategy to use for operators without choices in the trace. Defaults to the strategy
+                of the generator
+            workers: If provided, the traces are split evenly across a pool of ``workers`` processes
+            tracing: If set, a list of ``(result, trace)`` tuples is returned instead (see ``with_env``).
+                Traces are only recorded in a ``TraceStore`` or ``TraceTrie`` when not using ``workers``
+            ignore_exceptions: If True, exceptions raised by the generator are treated like ExceptionAsContinue
+
+        Returns:
+            A list with the result of every trace in order. The result is None for traces whose replay
+            raised ExceptionAsContinue
+
+        """
+        traces = list(traces)
+        strategy = BatchReplayStrategy(make_strategy(strategy or self.strategy), strict=strict)
+        if workers is None:
+            env = self.with_env(strategy=strategy, tracing=tracing, ignore_exceptions=ignore_exceptions)
+            return env.replay_batch(traces)
+
+        tracing = get_worker_tracing(tracing)
+        chunk_size = -(-len(traces) // workers)
+        payloads = [cloudpickle.dumps((self, strategy, tracing, ignore_exceptions, traces[i:i + chunk_size]))
+                    for i in range(0, len(traces), chunk_size)]
+
+        results = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_results in executor.map(_replay_worker_run, payloads):
+                results.extend(cloudpickle.loads(chunk_results))
+
+        return results
+
+    def reconstruct_trace(self, trace: ChoiceTrace) -> GeneratorTrace:
+        """
+        Reconstruct the full trace, including the domains and contexts of the operators, of the execution
+        recorded in ``trace`` by replaying it. The generator must be deterministic modulo operator choices.
+
+        Args:
+            trace: A trace recorded with ``tracing='choices'``
+
+        Returns:
+            The ``GeneratorTrace`` of the replayed execution
+
+        """
+        env = GeneratorExecEnvironment(
+            gen=self,
+            strategy=FullReplayStrategy(trace, make_strategy(self.strategy)),
+            model=None,
+            tracing=True,
+            hooks=list(self.hooks),
+            replay=None
+        )
+
+        args, kwargs = trace.f_inputs
+        _, full_trace = env.call(*args, **kwargs)
+        return full_trace
+
+    def estimate_search_space(self, *args, num_probes: int = 1000, confidence: float = 0.95,
+                              strategy: Optional[RandStrategy] = None,
+                              branching_funcs: Optional[Dict[str, Callable]] = None,
+                              **kwargs) -> SearchSpaceEstimate:
+        """
+        Estimate the number of executions explored by exhaustive DFS, and the operator calls made across them,
+        for the given input i.e. ``(*args, **kwargs)``. Every probe executes the generator once with random
+        choices, and weighs the execution by the inverse of the probability of the choices made (Knuth's estimator).
+
+        Operator calls skipped due to generator-level caching in DFS are included in the estimate.
+
+        Args:
+            *args: Positional arguments to the original function
+            num_probes: Number of random executions to perform
+            confidence: Confidence level of the returned intervals
+            strategy: The randomized strategy to use for probing. Defaults to ``RandStrategy``.
+                Must be provided if the generator uses operators not defined in ``RandStrategy``.
+            branching_funcs: Functions to compute the branching of choices made by custom operators
+                (see ``BranchingRecorder``)
+            **kwargs: Keyword arguments to the original function
+
+        Returns:
+            A ``SearchSpaceEstimate``
+
+        """
+        recorder = BranchingRecorder(branching_funcs)
+        env = self.with_env(strategy=strategy or RandStrategy(), hooks=[recorder], budget=Budget(max_runs=num_probes))
+        for _ in env.generate(*args, **kwargs):
+            pass
+
+        return make_estimate(recorder, confidence)
 
     def with_env(self,
                  *args,
                  strategy: Union[str, Strategy] = None,
                  model: GeneratorModel = None,
-                 tracing: bool = False, hooks: List[Hook] = None,
-                 replay: Union[Dict[str, List[Any]], GeneratorTrace] = None,
-                 ignore_exceptions: bool = False) -> 'GeneratorExecEnvironment':
+                 tracing: Union[bool, str, TraceStore, TraceTrie] = False, hooks: List[Hook] = None,
+                 replay: Union[Dict[str, List[Any]], GeneratorTrace, ChoiceTrace] = None,
+                 ignore_exceptions: bool = False,
+                 workers: Optional[int] = None,
+                 split_depth: int = 1,
+                 ordered: bool = True,
+                 budget: Optional[Budget] = None,
+                 memo: Optional[MemoCache] = None) -> 'GeneratorExecEnvironment':
         """
         Temporarily modify the config of the generator.
 
         Args:
             strategy:
             model:
-            tracing:
+            tracing: If True (or ``'full'``), ``generate`` returns tuples of the form ``(result, trace)``.
+                If ``'choices'``, the traces are ``ChoiceTrace`` objects recording only the choices made by the
+                operators, which can be expanded using ``reconstruct_trace``. If a ``TraceStore``, the traces are
+                recorded in the store in a compact form, and returned as views into the store. Similarly for
+                a ``TraceTrie``, which shares the common prefixes of traces of depth-first enumeration
             hooks:
             replay:
             ignore_exceptions:
+            workers: If set, ``generate`` enumerates in parallel using a pool of ``workers`` processes.
+                Only supported for ``DfsStrategy`` and its sub-classes.
+            split_depth: The search tree is split into sub-trees on the choices of the
+                first ``split_depth`` operators when enumerating in parallel
+            ordered: Whether the results of parallel enumeration are returned in DFS order,
+                or in the order the sub-trees finish
+            budget: Limits on the work done by every call to ``generate``. The summary of the last enumeration
+                is available as the ``summary`` attribute of the returned environment
+            memo: The cache used for calls to generators with ``memoize=True``. A new ``MemoCache`` with
+                the default bounds is used if not provided. It can be shared between environments
 
         Returns:
 
@@ -494,20 +1021,67 @@ class Generator:
             tracing=tracing,
             hooks=list(hooks or self.hooks),
             replay=replay,
-            ignore_exceptions=ignore_exceptions
+            ignore_exceptions=ignore_exceptions,
+            workers=workers,
+            split_depth=split_depth,
+            ordered=ordered,
+            budget=budget,
+            memo=memo
         )
 
+    def __getstate__(self):
+        #  Execution environments hold compiled code and are re-created on demand
+        state = self.__dict__.copy()
+        state['_default_exec_env'] = None
+        state.pop('_bound_replicas', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._bound_replicas = weakref.WeakKeyDictionary()
+
     def __get__(self, instance, owner):
         #  This is required to handle class methods that have been marked as generators.
         #  This helps us create "bound" generators
+        if instance is None:
+            return self
 
-        #  Create a replica with a different func
-        replica = Generator(self.func)
-        replica.__dict__ = self.__dict__.copy()
-        replica.func = self.func.__get__(instance, owner)
+        try:
+            replica_ref = self._bound_replicas.get(instance, None)
+
+        except TypeError:
+            #  Instances that are unhashable or do not support weak references are not cached
+            return _BoundGenerator(self, instance, owner)
+
+        #  Distinct instances may compare equal (e.g. copies of the instance)
+        replica = replica_ref() if replica_ref is not None else None
+        if replica is not None and replica.func.__self__ is instance and \
+                replica._defaults_version == self._defaults_version:
+            return replica
+
+        replica = _BoundGenerator(self, instance, owner)
+        self._bound_replicas[instance] = weakref.ref(replica)
         return replica
 
 
+class _BoundGenerator(Generator):
+    """
+    A generator defined as a method, bound to an instance of the class. The replica holds the instance, and caches
+    its default execution environment like any other generator. The generator only references the replicas weakly,
+    so a replica is reused for as long as it is in use, and neither the replica nor the instance are kept alive
+    by the generator.
+    """
+
+    def __init__(self, gen: Generator, instance: Any, owner: type):
+        self.__dict__.update(gen.__dict__)
+        del self.__dict__['_bound_replicas']
+        self._default_exec_env = None
+        self.func = gen.func.__get__(instance, owner)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
 class GeneratorExecEnvironment:
     """
     Execution environment for a generator. Provides isolation between simultaneous uses of the generator.
@@ -517,10 +1091,15 @@ class GeneratorExecEnvironment:
                  gen: Generator,
                  strategy: Strategy,
                  model: Optional[GeneratorModel],
-                 tracing: bool,
+                 tracing: Union[bool, str, TraceStore, TraceTrie],
                  hooks: List[Hook],
-                 replay: Optional[Union[Dict[str, List[Any]], GeneratorTrace]],
-                 ignore_exceptions: bool = False
+                 replay: Optional[Union[Dict[str, List[Any]], GeneratorTrace, ChoiceTrace]],
+                 ignore_exceptions: bool = False,
+                 workers: Optional[int] = None,
+                 split_depth: int = 1,
+                 ordered: bool = True,
+                 budget: Optional[Budget] = None,
+                 memo: Optional[MemoCache] = None
                  ):
 
         self.gen = gen
@@ -530,49 +1109,330 @@ class GeneratorExecEnvironment:
         self.hooks = hooks
         self.replay = replay
 
+        self.workers = workers
+        self.split_depth = split_depth
+        self.ordered = ordered
+
+        self.budget = budget
+        self.summary: Optional[EnumerationSummary] = None
+
+        self.memo: MemoCache = memo if memo is not None else MemoCache()
+
         self._compiled_func: Optional[Callable] = None
         self._compilation_cache: Dict[Generator, Callable] = {}
         self.tracer: Optional[DefaultTracer] = None
         self.ignore_exceptions = ignore_exceptions
 
+        #  Generators are only compiled with hook support if some hook observes operator calls
+        self.with_hooks: bool = False
+        self.hook_wrapper: Optional[Callable] = None
+        #  The methods the hook wrapper was created from. See ``refresh_hooks``
+        self._op_hooks: Optional[Tuple[List[Callable], List[Callable]]] = None
+
         self.init()
 
     def init(self):
-        if self.tracing:
-            self.tracer = DefaultTracer()
+        if self.workers is not None and (self.replay is not None or not isinstance(self.strategy, DfsStrategy)):
+            raise ValueError("Parallel enumeration is only supported for DfsStrategy without replay")
+
+        self.tracer = make_tracer(self.tracing)
+        if self.tracer is not None:
             self.hooks.append(self.tracer)
 
         if self.replay is not None:
             self.strategy = PartialReplayStrategy(self.replay, self.strategy)
 
+        self._op_hooks = get_op_hooks(self.hooks)
+        self.with_hooks = observes_ops(self.hooks)
+        self.hook_wrapper = make_hook_wrapper(self.hooks)
         self._compilation_cache = {}
-        self._compiled_func = compile_func(self.gen, self.gen.func, self.strategy, len(self.hooks) > 0)
+        self._compiled_func = compile_func(self.gen, self.gen.func, self.strategy, self.with_hooks)
+
+    def refresh_hooks(self):
+        """
+        Re-create the hook wrapper if the hooks observing operator calls changed since it was created, for
+        instance if a hook was appended to ``hooks`` or ``before_op`` was assigned on a hook. The generator is
+        re-compiled if hook support has to be added or dropped. This is done at the start of every enumeration,
+        so changes made while an enumeration is in progress only take effect in the next one.
+        """
+        op_hooks = get_op_hooks(self.hooks)
+        if op_hooks == self._op_hooks:
+            return
+
+        self._op_hooks = op_hooks
+        self.hook_wrapper = make_hook_wrapper(self.hooks)
+        with_hooks = observes_ops(self.hooks)
+        if with_hooks != self.with_hooks:
+            self.with_hooks = with_hooks
+            self._compilation_cache = {}
+            self._compiled_func = compile_func(self.gen, self.gen.func, self.strategy, self.with_hooks)
 
     def compositional_call(self, gen: Generator, args, kwargs):
         extra_kwargs = {_GEN_EXEC_ENV_VAR: self, _GEN_STRATEGY_VAR: self.strategy,
-                        _GEN_MODEL_VAR: self.model, _GEN_HOOK_VAR: self.hooks}
+                        _GEN_MODEL_VAR: self.model, _GEN_HOOK_VAR: self.hook_wrapper}
 
         if gen not in self._compilation_cache:
-            self._compilation_cache[gen] = compile_func(gen, gen.func, self.strategy, len(self.hooks) > 0)
+            self._compilation_cache[gen] = compile_func(gen, gen.func, self.strategy, self.with_hooks)
+
+        if gen.memoize and not self.with_hooks:
+            compiled_func = self._compilation_cache[gen]
+
+            def run(recorder: RecordingStrategy):
+                return self.run_recording(recorder, compiled_func, args,
+                                          {**kwargs, **extra_kwargs, _GEN_STRATEGY_VAR: recorder})
+
+            return self.memo.call(gen, args, kwargs, self.strategy, self.model, run)
 
         return self.strategy.gen_call(self._compilation_cache[gen], args, kwargs, extra_kwargs, self.gen)
 
-    def generate(self, *args, **kwargs):
-        if len(args) == 0 and len(kwargs) == 0 and isinstance(self.replay, GeneratorTrace):
+    def run_recording(self, recorder: RecordingStrategy, func: Callable, args, kwargs):
+        """
+        Run a memoized generator with the recording strategy standing in for the strategy of the environment,
+        so that composed generators invoked at runtime are recorded as well
+        """
+        strategy, self.strategy = self.strategy, recorder
+        try:
+            return func(*args, **kwargs)
+
+        finally:
+            self.strategy = strategy
+
+    def generate(self, *args, resume_from: Optional[Sequence[int]] = None, budget: Optional[Budget] = None,
+                 **kwargs):
+        if len(args) == 0 and len(kwargs) == 0 and isinstance(self.replay, (GeneratorTrace, ChoiceTrace)):
             args, kwargs = self.replay.f_inputs
 
+        self.refresh_hooks()
+
+        if resume_from is not None:
+            strategy = self.strategy
+            if isinstance(strategy, PartialReplayStrategy):
+                strategy = strategy.backup_strategy
+
+            if self.workers is not None or not isinstance(strategy, DfsStrategy):
+                raise ValueError("Resuming enumeration is only supported for sequential DfsStrategy")
+
+            strategy.resume_from = tuple(resume_from)
+
+        budget = budget or self.budget
+        budget_tracker = None
+        if budget is not None:
+            if self.workers is not None:
+                raise ValueError("Budgets are not supported for parallel enumeration")
+
+            budget_tracker = BudgetTracker(budget)
+            self.summary = budget_tracker.summary
+
+        if self.workers is not None:
+            yield from self.generate_parallel(args, kwargs)
+            return
+
         extra_kwargs = {_GEN_EXEC_ENV_VAR: self, _GEN_STRATEGY_VAR: self.strategy,
-                        _GEN_HOOK_VAR: self.hooks, _GEN_MODEL_VAR: self.model}
+                        _GEN_HOOK_VAR: self.hook_wrapper, _GEN_MODEL_VAR: self.model}
 
         iterator = self.strategy.gen_iterate(self._compiled_func, args, kwargs, extra_kwargs,
-                                             self.hooks, self.gen, ignore_exceptions=self.ignore_exceptions)
-        if self.tracer is None:
-            yield from iterator
+                                             self.hooks, self.gen, ignore_exceptions=self.ignore_exceptions,
+                                             budget_tracker=budget_tracker)
+        while True:
+            #  Publish the environment only while the generator is executing, so that interleaved iteration
+            #  over multiple environments, threads and asyncio tasks all see the correct environment
+            token = _ACTIVE_EXEC_ENV.set(self)
+            try:
+                result = next(iterator)
 
-        else:
-            for result in iterator:
+            except StopIteration:
+                return
+
+            finally:
+                _ACTIVE_EXEC_ENV.reset(token)
+
+            if self.tracer is None:
+                yield result
+
+            else:
                 yield result, self.tracer.get_last_trace()
 
+    def sample(self, n: int, args, kwargs) -> List:
+        """
+        Run ``n`` executions of the generator and return the results of the successful ones. Unlike ``generate``,
+        all the executions are performed in a single loop without suspending in between.
+        """
+        self.refresh_hooks()
+        strategy = self.strategy
+        hooks = self.hooks
+        func = self._compiled_func
+        tracer = self.tracer
+        extra_kwargs = {_GEN_EXEC_ENV_VAR: self, _GEN_STRATEGY_VAR: strategy,
+                        _GEN_HOOK_VAR: self.hook_wrapper, _GEN_MODEL_VAR: self.model}
+
+        results = []
+        for h in hooks:
+            h.init(args, kwargs)
+
+        token = _ACTIVE_EXEC_ENV.set(self)
+        try:
+            strategy.init()
+            for _ in range(n):
+                if strategy.is_finished():
+                    break
+
+                accepted, result = strategy.run_step(func, args, kwargs, extra_kwargs, hooks, self.ignore_exceptions)
+                if accepted:
+                    results.append(result if tracer is None else (result, tracer.get_last_trace()))
+
+                strategy.finish_step(hooks)
+
+            strategy.finish()
+
+        finally:
+            _ACTIVE_EXEC_ENV.reset(token)
+
+        for h in hooks:
+            h.finish()
+
+        return results
+
+    def get_checkpoint(self) -> Tuple[int, ...]:
+        """
+        Return the choice vector of the last execution, which can be passed as ``resume_from`` to ``generate``
+        to resume enumeration after it. Only supported for ``DfsStrategy`` and its sub-classes.
+        """
+        strategy = self.strategy
+        if isinstance(strategy, PartialReplayStrategy):
+            strategy = strategy.backup_strategy
+
+        if not isinstance(strategy, DfsStrategy):
+            raise ValueError("Checkpoints are only supported for DfsStrategy")
+
+        return strategy.get_checkpoint()
+
+    def replay_batch(self, traces: List[Union[GeneratorTrace, ChoiceTrace]]) -> List:
+        """
+        Replay the traces one after the other with the inputs recorded in them. The strategy of the environment
+        must be a ``BatchReplayStrategy``. See ``Generator.replay_batch``. The whole batch counts as a single
+        enumeration for hooks, which are initialized with the inputs of the first trace.
+        """
+        strategy: BatchReplayStrategy = self.strategy
+        if not isinstance(strategy, BatchReplayStrategy):
+            raise ValueError("Batch replay requires a BatchReplayStrategy")
+
+        self.refresh_hooks()
+        hooks = self.hooks
+        func = self._compiled_func
+        tracer = self.tracer
+        extra_kwargs = {_GEN_EXEC_ENV_VAR: self, _GEN_STRATEGY_VAR: strategy,
+                        _GEN_HOOK_VAR: self.hook_wrapper, _GEN_MODEL_VAR: self.model}
+
+        results = []
+        if len(traces) == 0:
+            return results
+
+        for h in hooks:
+            h.init(*traces[0].f_inputs)
+
+        token = _ACTIVE_EXEC_ENV.set(self)
+        try:
+            strategy.init()
+            for trace in traces:
+                args, kwargs = trace.f_inputs
+                strategy.set_trace(trace)
+                accepted, result = strategy.run_step(func, args, kwargs, extra_kwargs, hooks, self.ignore_exceptions)
+                if accepted and tracer is not None:
+                    result = (result, tracer.get_last_trace())
+
+                results.append(result)
+                strategy.finish_step(hooks)
+
+            strategy.finish()
+
+        finally:
+            _ACTIVE_EXEC_ENV.reset(token)
+
+        for h in hooks:
+            h.finish()
+
+        return results
+
+    def generate_split_prefixes(self, args, kwargs) -> Iterator[Tuple[int, ...]]:
+        """
+        Enumerate the roots of the sub-trees of the search tree when it is split on the choices of the first
+        ``split_depth`` operators. Every root is represented by the indices of the choices made by the operators.
+        Runs that finish before reaching ``split_depth`` operators are sub-trees with a single execution.
+        """
+        strategy: DfsStrategy = self.strategy
+        extra_kwargs = {_GEN_EXEC_ENV_VAR: self, _GEN_STRATEGY_VAR: strategy,
+                        _GEN_HOOK_VAR: make_hook_wrapper([]), _GEN_MODEL_VAR: self.model}
+
+        strategy.depth_limit = self.split_depth
+        try:
+            strategy.init()
+            while not strategy.is_finished():
+                strategy.init_run()
+                completed = False
+                token = _ACTIVE_EXEC_ENV.set(self)
+                try:
+                    self._compiled_func(*args, **kwargs, **extra_kwargs)
+                    completed = True
+
+                except ExceptionAsContinue:
+                    pass
+
+                except Exception:
+                    if not self.ignore_exceptions:
+                        raise
+
+                finally:
+                    _ACTIVE_EXEC_ENV.reset(token)
+
+                if completed or strategy.depth_limit_reached:
+                    yield tuple(strategy.op_indices)
+
+                strategy.finish_run()
+
+        finally:
+            strategy.depth_limit = None
+
+    def generate_parallel(self, args, kwargs):
+        """
+        Enumerate the sub-trees rooted at the prefixes returned by ``generate_split_prefixes`` in a pool of
+        ``workers`` processes. The generator is assumed to be deterministic modulo operator choices, and
+        the operators are assumed to produce values in the same order in every process.
+        """
+        payload = cloudpickle.dumps((self.gen, self.strategy, self.model, get_worker_tracing(self.tracing),
+                                     [h for h in self.hooks if h is not self.tracer], self.ignore_exceptions,
+                                     args, kwargs))
+
+        #  Bound the number of sub-trees in flight so that the prefixes are enumerated lazily
+        window = 4 * self.workers
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers,
+                                                          initializer=_parallel_worker_init, initargs=(payload,))
+        try:
+            if self.ordered:
+                pending = collections.deque()
+                for prefix in self.generate_split_prefixes(args, kwargs):
+                    pending.append(executor.submit(_parallel_worker_run, prefix))
+                    while len(pending) >= window:
+                        yield from cloudpickle.loads(pending.popleft().result())
+
+                while pending:
+                    yield from cloudpickle.loads(pending.popleft().result())
+
+            else:
+                pending = set()
+                for prefix in self.generate_split_prefixes(args, kwargs):
+                    pending.add(executor.submit(_parallel_worker_run, prefix))
+                    while len(pending) >= window:
+                        done, pending = concurrent.futures.wait(pending,
+                                                                return_when=concurrent.futures.FIRST_COMPLETED)
+                        for future in done:
+                            yield from cloudpickle.loads(future.result())
+
+                for future in concurrent.futures.as_completed(pending):
+                    yield from cloudpickle.loads(future.result())
+
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
     def call(self, *args, **kwargs):
         return next(self.generate(*args, **kwargs))
 
@@ -580,7 +1440,74 @@ class GeneratorExecEnvironment:
         return next(self.generate(*args, **kwargs))
 
 
-def generator(func=None, strategy='dfs', name=None, group=None, caching=None, metadata=None) -> Generator:
+#  The execution environment of a worker process used for parallel enumeration
+_PARALLEL_WORKER_STATE: Optional[Tuple[GeneratorExecEnvironment, tuple, dict]] = None
+
+
+def _parallel_worker_init(payload: bytes):
+    global _PARALLEL_WORKER_STATE
+    gen, strategy, model, tracing, hooks, ignore_exceptions, args, kwargs = cloudpickle.loads(payload)
+    env = GeneratorExecEnvironment(gen=gen, strategy=strategy, model=model, tracing=tracing, hooks=hooks,
+                                   replay=None, ignore_exceptions=ignore_exceptions)
+    _PARALLEL_WORKER_STATE = (env, args, kwargs)
+
+
+def _parallel_worker_run(prefix: Tuple[int, ...]) -> bytes:
+    env, args, kwargs = _PARALLEL_WORKER_STATE
+    env.strategy.forced_prefix = prefix
+    return cloudpickle.dumps(list(env.generate(*args, **kwargs)))
+
+
+@contextlib.contextmanager
+def _seeded_random_state(seed: Optional[int]):
+    """
+    Seed the global random number generators used by randomized strategies, restoring their state on exit
+    """
+    if seed is None:
+        yield
+        return
+
+    state, np_state = random.getstate(), np.random.get_state()
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    try:
+        yield
+
+    finally:
+        random.setstate(state)
+        np.random.set_state(np_state)
+
+
+@contextlib.contextmanager
+def _seeded_sample_env(gen: 'Generator', tracing: Union[bool, str, TraceStore, TraceTrie],
+                       seed_seq: Optional[np.random.SeedSequence]):
+    """
+    Create an execution environment for sampling. Randomized strategies get a copy seeded with ``seed_seq``,
+    whereas other strategies fall back to seeding the global random number generators
+    """
+    if seed_seq is not None and isinstance(gen.strategy, RandStrategy):
+        yield gen.with_env(tracing=tracing, strategy=gen.strategy.reseeded(seed_seq))
+        return
+
+    seed = int(seed_seq.generate_state(1, dtype=np.uint64)[0]) if seed_seq is not None else None
+    with _seeded_random_state(seed):
+        yield gen.with_env(tracing=tracing)
+
+
+def _sample_worker_run(payload: bytes) -> bytes:
+    gen, tracing, n, seed_seq, args, kwargs = cloudpickle.loads(payload)
+    with _seeded_sample_env(gen, tracing, seed_seq) as env:
+        return cloudpickle.dumps(env.sample(n, args, kwargs))
+
+
+def _replay_worker_run(payload: bytes) -> bytes:
+    gen, strategy, tracing, ignore_exceptions, traces = cloudpickle.loads(payload)
+    env = gen.with_env(strategy=strategy, tracing=tracing, ignore_exceptions=ignore_exceptions)
+    return cloudpickle.dumps(env.replay_batch(traces))
+
+
+def generator(func=None, strategy='dfs', name=None, group=None, caching=None, metadata=None,
+              memoize=False) -> Generator:
     """Define a generator from a function
 
     Args:
@@ -599,6 +1526,9 @@ def generator(func=None, strategy='dfs', name=None, group=None, caching=None, me
         metadata (Dict[Any, Any]): A dictionary containing arbitrary metadata
             to carry around in the generator object.
 
+        memoize (bool): Whether calls to this generator from other generators are memoized across executions
+            using the ``MemoCache`` of the execution environment. See ``MemoCache`` for the requirements.
+
     Examples:
 
     .. code-block:: python
@@ -631,7 +1561,8 @@ def generator(func=None, strategy='dfs', name=None, group=None, caching=None, me
 
     """
     def wrapper(func):
-        return Generator(func, strategy=strategy, name=name, group=group, caching=caching, metadata=metadata)
+        return Generator(func, strategy=strategy, name=name, group=group, caching=caching, metadata=metadata,
+                         memoize=memoize)
 
     if func:
         return wrapper(func)
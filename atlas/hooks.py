@@ -11,6 +11,13 @@ class Hook(ABC):
     def init_run(self, f_args, f_kwargs, **kwargs):
         pass
 
+    def after_run(self, success: bool):
+        """
+        Called as soon as the generator returns or raises in a run, before the result (if any) is produced.
+        ``success`` is False if the run raised an exception, including ExceptionAsContinue.
+        """
+        pass
+
     def finish_run(self):
         pass
 
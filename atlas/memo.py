@@ -0,0 +1,332 @@
+import collections
+import sys
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from atlas.exceptions import ExceptionAsContinue
+from atlas.utils.hashing import ValueHasher
+
+#  Used in place of a value for operator calls that raised ExceptionAsContinue
+_RAISED = object()
+
+
+class _ArgRef(NamedTuple):
+    """
+    Stands for an argument of the memoized call in the recorded arguments of an operator call
+    """
+    is_kwarg: bool
+    key: Any
+
+
+class _DictRef(NamedTuple):
+    """
+    A dict in the recorded arguments of an operator call containing arguments of the memoized call
+    """
+    items: Tuple
+
+
+def _externalize(value: Any, arg_refs: Dict[int, _ArgRef], depth: int = 1) -> Any:
+    #  Arguments are referred to by position, so that replayed operator calls use the arguments of the current call.
+    #  Otherwise they would see mutations made to the arguments of the recorded call after it returned
+    ref = arg_refs.get(id(value), None)
+    if ref is not None:
+        return ref
+
+    #  Only dicts are searched, which covers contexts and keyword arguments forwarded to operators.
+    #  Searching domains would be too expensive
+    if depth > 0 and type(value) is dict:
+        items = tuple((k, _externalize(v, arg_refs, depth - 1)) for k, v in value.items())
+        if any(type(v) is _ArgRef or type(v) is _DictRef for _, v in items):
+            return _DictRef(items)
+
+    return value
+
+
+def _internalize(value: Any, args, kwargs) -> Any:
+    t = type(value)
+    if t is _ArgRef:
+        return kwargs[value.key] if value.is_kwarg else args[value.key]
+
+    if t is _DictRef:
+        return {k: _internalize(v, args, kwargs) for k, v in value.items}
+
+    return value
+
+
+def _estimate_size(obj: Any, depth: int = 2) -> int:
+    #  Avoid ``sys.getsizeof`` for array-likes, as it inspects every element of object arrays in pandas
+    nbytes = getattr(obj, 'nbytes', None)
+    if isinstance(nbytes, int):
+        #  numpy arrays, and pandas series and indexes
+        return nbytes
+
+    num_elements = getattr(obj, 'size', None)
+    if isinstance(num_elements, int) and hasattr(obj, 'shape'):
+        #  pandas data-frames, assuming 8 bytes per element
+        return 8 * num_elements
+
+    #  Other objects may compute their size using expensive methods (e.g. pandas group-by objects), so only
+    #  the size of the object itself is counted for non built-in objects
+    size = sys.getsizeof(obj) if type(obj).__module__ == 'builtins' else object.__sizeof__(obj)
+    if depth > 0:
+        if isinstance(obj, (list, tuple, set, frozenset)):
+            size += sum(_estimate_size(v, depth - 1) for v in obj)
+
+        elif isinstance(obj, dict):
+            size += sum(_estimate_size(k, depth - 1) + _estimate_size(v, depth - 1) for k, v in obj.items())
+
+    return size
+
+
+class _MemoNode:
+    __slots__ = ('op_call', 'children', 'outcome')
+
+    def __init__(self):
+        #  The arguments (domain, context, op_info, handler, kwargs, has_refs) of the operator called at this point,
+        #  if known. ``has_refs`` is set if the arguments refer to the arguments of the memoized call
+        self.op_call: Optional[Tuple] = None
+        #  Maps fingerprints of the values returned by the operator to the nodes for the rest of the execution
+        self.children: Dict[Any, '_MemoNode'] = {}
+        #  A tuple (is_exception, value) if the generator returned (or raised) at this point
+        self.outcome: Optional[Tuple[bool, Any]] = None
+
+
+class _MemoRoot:
+    def __init__(self, key: Any):
+        self.key = key
+        self.node = _MemoNode()
+        #  Objects fingerprinted by identity in the key or the tree, which are kept alive by the entry
+        self.refs: List[Any] = []
+        self.ref_ids: Set[int] = set()
+        self.num_entries: int = 0
+        self.num_bytes: int = 0
+
+    def add_refs(self, refs: List[Any]) -> int:
+        """
+        Keep the objects in ``refs`` alive, and return the estimated size of the objects not already kept
+        """
+        size = 0
+        for obj in refs:
+            if id(obj) not in self.ref_ids:
+                self.ref_ids.add(id(obj))
+                self.refs.append(obj)
+                size += _estimate_size(obj)
+
+        return size
+
+
+class RecordingStrategy:
+    """
+    Stands in for the strategy while a memoized generator executes. The values of the first few operator calls
+    are taken from ``forced``, as they were already obtained from the strategy while looking up the cache.
+    The remaining calls are delegated to the strategy. All the calls are recorded in ``path``.
+
+    Positional caching of composed generators (see ``DfsStrategy``) is disabled, since the executions served from
+    the cache skip the composed generator calls.
+    """
+
+    def __init__(self, strategy, forced: List[Tuple[Any, Any]], refs: List[Any], hasher: ValueHasher):
+        self.strategy = strategy
+        self.hasher = hasher
+        #  Tuples of the form (value, fingerprint of the value)
+        self.forced = forced
+        #  Tuples of the form (domain, context, op_info, handler, kwargs, fingerprint of the value)
+        self.path: List[Tuple] = []
+        self.refs = refs
+        #  Unset if the strategy raised an exception other than ExceptionAsContinue
+        self.complete: bool = True
+
+    def generic_op(self, domain=None, context=None, model=None, op_info=None, handler: Optional[Callable] = None,
+                   **kwargs):
+        idx = len(self.path)
+        if idx < len(self.forced):
+            value, value_key = self.forced[idx]
+
+        else:
+            try:
+                value = self.strategy.generic_op(domain, context=context, model=model, op_info=op_info,
+                                                 handler=handler, **kwargs)
+                value_key = self.hasher.hash_value(value, self.refs)
+
+            except ExceptionAsContinue:
+                value = value_key = _RAISED
+
+            except Exception:
+                self.complete = False
+                raise
+
+        self.path.append((domain, context, op_info, handler, kwargs, value_key))
+        if value is _RAISED:
+            raise ExceptionAsContinue
+
+        return value
+
+    def cached_generator_invocation(self):
+        return False, False
+
+    def generator_invoked(self):
+        return 0
+
+    def generator_returned(self, gen_call_id: int, result: Any):
+        pass
+
+    def gen_call(self, func: Callable, args, kwargs, atlas_kwargs, gen):
+        return func(*args, **kwargs, **atlas_kwargs)
+
+    def __getattr__(self, item):
+        return getattr(self.strategy, item)
+
+
+class MemoCache:
+    """
+    A bounded LRU cache of the results of calls to composed generators marked with ``memoize=True``, keyed by
+    the generator, the fingerprint of the arguments and the values returned by the operators during the call.
+    Unlike the positional caching of ``DfsStrategy``, results are reused across executions and work with any
+    strategy.
+
+    Values are fingerprinted by content using ``atlas.utils.hashing.ValueHasher``, which covers built-in
+    containers, hashable objects, numpy arrays and pandas objects by default. Other values are fingerprinted by
+    identity, and are kept alive (and counted towards ``max_bytes``) as long as the entries referring to them.
+
+    Since the values returned by the operators are only known while executing the generator, the cache stores,
+    for every generator and arguments, a tree of the operator calls made by the generator. A cached call asks
+    the strategy for the value of every operator call in the tree, without running the generator, until
+    it reaches a result. If it reaches an operator value not seen before, the generator is executed, re-using
+    the values already obtained from the strategy.
+
+    This is correct if and only if the generator is deterministic modulo operator choices, does not mutate
+    its arguments or any other state, and its arguments are not mutated after the call. Results (including
+    exceptions) are shared between calls, so they must not be mutated either.
+
+    Args:
+        max_entries (Optional[int]): Maximum number of results to keep. Unbounded if None.
+        max_bytes (Optional[int]): Maximum estimated size of the results to keep. Unbounded if None.
+        hashers (Optional[Dict[type, Callable]]): Additional hashers used to fingerprint values by content.
+            See ``atlas.utils.hashing.ValueHasher``.
+    """
+
+    def __init__(self, max_entries: Optional[int] = 100000, max_bytes: Optional[int] = 2 ** 28,
+                 hashers: Optional[Dict[type, Callable]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.value_hasher = ValueHasher(hashers)
+
+        self.roots: 'collections.OrderedDict[Any, _MemoRoot]' = collections.OrderedDict()
+        self.num_entries: int = 0
+        self.num_bytes: int = 0
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def clear(self):
+        self.roots.clear()
+        self.num_entries = 0
+        self.num_bytes = 0
+
+    def call(self, gen, args, kwargs, strategy, model, run: Callable[[RecordingStrategy], Any]):
+        """
+        Return the result of calling the generator ``gen`` with ``(*args, **kwargs)``, using the cache if possible.
+        ``run`` is called with a ``RecordingStrategy`` to execute the generator if the result is not cached.
+        """
+        hasher = self.value_hasher
+        refs: List[Any] = []
+        key = (gen, hasher.hash_value(args, refs), hasher.hash_value(kwargs, refs))
+        root = self.roots.get(key, None)
+        if root is None:
+            root = self.roots[key] = _MemoRoot(key)
+            size = root.add_refs(refs)
+            root.num_bytes += size
+            self.num_bytes += size
+
+        else:
+            self.roots.move_to_end(key)
+
+        node = root.node
+        values: List[Tuple[Any, Any]] = []
+        lookup_refs: List[Any] = []
+        while node.outcome is None and node.op_call is not None:
+            domain, context, op_info, handler, op_kwargs, has_refs = node.op_call
+            if has_refs:
+                domain = _internalize(domain, args, kwargs)
+                context = _internalize(context, args, kwargs)
+                op_kwargs = {k: _internalize(v, args, kwargs) for k, v in op_kwargs.items()}
+
+            try:
+                value = strategy.generic_op(domain, context=context, model=model, op_info=op_info, handler=handler,
+                                            **op_kwargs)
+                value_key = hasher.hash_value(value, lookup_refs)
+
+            except ExceptionAsContinue:
+                value = value_key = _RAISED
+
+            values.append((value, value_key))
+            node = node.children.get(value_key, None)
+            if node is None:
+                break
+
+        if node is not None and node.outcome is not None:
+            self.hits += 1
+            is_exception, result = node.outcome
+            if is_exception:
+                raise result.with_traceback(None)
+
+            return result
+
+        self.misses += 1
+        recorder = RecordingStrategy(strategy, values, lookup_refs, hasher)
+        try:
+            result = run(recorder)
+
+        except Exception as e:
+            if recorder.complete:
+                self._insert(root, recorder, args, kwargs, (True, e))
+
+            raise
+
+        self._insert(root, recorder, args, kwargs, (False, result))
+        return result
+
+    def _insert(self, root: _MemoRoot, recorder: RecordingStrategy, args, kwargs, outcome: Tuple[bool, Any]):
+        if self.roots.get(root.key, None) is not root:
+            #  Evicted during the call
+            return
+
+        arg_refs: Optional[Dict[int, _ArgRef]] = None
+        node = root.node
+        for domain, context, op_info, handler, op_kwargs, value_key in recorder.path:
+            if node.op_call is None:
+                if arg_refs is None:
+                    arg_refs = {id(v): _ArgRef(False, i) for i, v in enumerate(args)}
+                    arg_refs.update((id(v), _ArgRef(True, k)) for k, v in kwargs.items())
+
+                domain = _externalize(domain, arg_refs)
+                context = _externalize(context, arg_refs)
+                op_kwargs = {k: _externalize(v, arg_refs) for k, v in op_kwargs.items()}
+                has_refs = any(type(v) is _ArgRef or type(v) is _DictRef
+                               for v in (domain, context, *op_kwargs.values()))
+                node.op_call = (domain, context, op_info, handler, op_kwargs, has_refs)
+
+            child = node.children.get(value_key, None)
+            if child is None:
+                child = node.children[value_key] = _MemoNode()
+
+            node = child
+
+        if node.outcome is not None:
+            return
+
+        node.outcome = outcome
+        size = _estimate_size(outcome[1]) + root.add_refs(recorder.refs)
+        root.num_entries += 1
+        root.num_bytes += size
+        self.num_entries += 1
+        self.num_bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self.roots and ((self.max_entries is not None and self.num_entries > self.max_entries) or
+                              (self.max_bytes is not None and self.num_bytes > self.max_bytes)):
+            _, root = self.roots.popitem(last=False)
+            self.num_entries -= root.num_entries
+            self.num_bytes -= root.num_bytes
+            self.evictions += 1
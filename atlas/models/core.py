@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Iterable, Optional, Tuple
 
 from atlas.operators import OpInfo
 
@@ -32,3 +32,17 @@ class GeneratorModel(ABC):
     @abstractmethod
     def infer(self, domain: Any, context: Any = None, op_info: OpInfo = None, **kwargs):
         pass
+
+    def infer_scored(self, domain: Any, context: Any = None, op_info: OpInfo = None,
+                     **kwargs) -> Optional[Iterable[Tuple[Any, float]]]:
+        """
+        Same as ``infer``, but returns ``(value, probability)`` pairs in non-increasing order of probabilities.
+        Used by strategies that rank partial executions such as ``BestFirstStrategy``. By default, every value
+        returned by ``infer`` is assigned the probability 1.0 i.e. the model does not influence the ranking
+        beyond the order of the values.
+        """
+        result = self.infer(domain, context=context, op_info=op_info, **kwargs)
+        if result is None:
+            return None
+
+        return ((val, 1.0) for val in result)
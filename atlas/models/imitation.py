@@ -50,6 +50,16 @@ class IndependentOperatorsModel(TraceImitationModel, SerializableModel, OpResolv
 
         return self.model_map[op_info].infer(domain, context=context, op_info=op_info, **kwargs)
 
+    def infer_scored(self, domain: Any, context: Any = None, op_info: OpInfo = None, **kwargs):
+        if op_info not in self.model_map:
+            return None
+
+        model = self.model_map[op_info]
+        if not hasattr(model, 'infer_scored'):
+            return super().infer_scored(domain, context=context, op_info=op_info, **kwargs)
+
+        return model.infer_scored(domain, context=context, op_info=op_info, **kwargs)
+
     def train(self,
               traces: Collection[GeneratorTrace],
               val_traces: Collection[GeneratorTrace] = None,
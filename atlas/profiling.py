@@ -0,0 +1,248 @@
+import csv
+import io
+import json
+import time
+from typing import Any, Dict, Optional
+
+from atlas.hooks import Hook
+from atlas.models import GeneratorModel
+from atlas.operators import OpInfo
+
+
+class OpProfile:
+    """
+    Statistics of the calls to the operator with the given sid. Times are in nanoseconds.
+
+    ``op_ns`` is the time spent inside the operator calls (strategy, handler and model), of which ``model_ns``
+    was spent in the model if it was wrapped with ``ProfilingHook.wrap_model``. ``body_ns`` is the time spent
+    in the generator body after the operator returned, up to the next operator call or the end of the run.
+    ``num_raised`` counts the calls that raised an exception (e.g. for an empty domain), and ``num_failed_runs``
+    counts the runs that failed while this operator was the last one called.
+    """
+    __slots__ = ('sid', 'num_calls', 'num_sized', 'total_domain_size', 'max_domain_size',
+                 'op_ns', 'model_ns', 'body_ns', 'num_raised', 'num_failed_runs')
+
+    def __init__(self, sid: str):
+        self.sid = sid
+        self.num_calls: int = 0
+        #  Number of calls with a domain supporting ``len``
+        self.num_sized: int = 0
+        self.total_domain_size: int = 0
+        self.max_domain_size: int = 0
+        self.op_ns: int = 0
+        self.model_ns: int = 0
+        self.body_ns: int = 0
+        self.num_raised: int = 0
+        self.num_failed_runs: int = 0
+
+    def __repr__(self):
+        return f"OpProfile(sid={self.sid!r}, num_calls={self.num_calls}, op_ns={self.op_ns}, " \
+               f"body_ns={self.body_ns}, num_failed_runs={self.num_failed_runs})"
+
+    def get_handler_ns(self) -> int:
+        return self.op_ns - self.model_ns
+
+    def get_mean_domain_size(self) -> Optional[float]:
+        return self.total_domain_size / self.num_sized if self.num_sized > 0 else None
+
+    def get_failure_rate(self) -> float:
+        """
+        Return the fraction of calls that raised, or after which the run failed
+        """
+        return (self.num_raised + self.num_failed_runs) / self.num_calls if self.num_calls > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'sid': self.sid,
+            'num_calls': self.num_calls,
+            'mean_domain_size': self.get_mean_domain_size(),
+            'max_domain_size': self.max_domain_size,
+            'op_ns': self.op_ns,
+            'handler_ns': self.get_handler_ns(),
+            'model_ns': self.model_ns,
+            'body_ns': self.body_ns,
+            'num_raised': self.num_raised,
+            'num_failed_runs': self.num_failed_runs,
+            'failure_rate': self.get_failure_rate(),
+        }
+
+
+class _ProfiledModel(GeneratorModel):
+    def __init__(self, model: GeneratorModel, hook: 'ProfilingHook'):
+        self.model = model
+        self.hook = hook
+
+    def infer(self, domain: Any, context: Any = None, op_info: OpInfo = None, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return self.model.infer(domain, context=context, op_info=op_info, **kwargs)
+
+        finally:
+            self.hook.get_profile(op_info.sid).model_ns += time.perf_counter_ns() - start
+
+    def infer_scored(self, domain: Any, context: Any = None, op_info: OpInfo = None, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return self.model.infer_scored(domain, context=context, op_info=op_info, **kwargs)
+
+        finally:
+            self.hook.get_profile(op_info.sid).model_ns += time.perf_counter_ns() - start
+
+    def __getattr__(self, item):
+        if item == 'model':
+            raise AttributeError(item)
+
+        return getattr(self.model, item)
+
+
+class ProfilingHook(Hook):
+    """
+    Records per-operator statistics of the runs of a generator, keyed by ``OpInfo.sid``. See ``OpProfile``
+    for the statistics recorded. Times are measured with ``time.perf_counter_ns``. The statistics accumulate
+    across enumerations until ``reset`` is called.
+
+    The time spent in the model is only recorded for models wrapped using ``wrap_model``. Models returning
+    lazy iterables are only timed until they return, the values being computed as the strategy consumes them.
+
+    Example:
+        hook = ProfilingHook()
+        results = list(gen.with_env(hooks=[hook], model=hook.wrap_model(model)).generate(*args))
+        hook.to_csv("profile.csv")
+    """
+
+    def __init__(self):
+        self.profiles: Dict[str, OpProfile] = {}
+        self.num_runs: int = 0
+        self.num_failed_runs: int = 0
+        #  Time spent in the generator body before the first operator call of every run
+        self.entry_ns: int = 0
+        self.total_ns: int = 0
+
+        self._run_start: int = 0
+        self._mark: int = 0
+        self._last: Optional[OpProfile] = None
+        self._pending: Optional[OpProfile] = None
+
+    def reset(self):
+        self.profiles = {}
+        self.num_runs = 0
+        self.num_failed_runs = 0
+        self.entry_ns = 0
+        self.total_ns = 0
+
+    def get_profile(self, sid: str) -> OpProfile:
+        profile = self.profiles.get(sid, None)
+        if profile is None:
+            profile = self.profiles[sid] = OpProfile(sid)
+
+        return profile
+
+    def wrap_model(self, model: GeneratorModel) -> GeneratorModel:
+        """
+        Return a model delegating to ``model`` that records the time spent in inference
+        """
+        return _ProfiledModel(model, self)
+
+    def _end_segment(self, now: int):
+        if self._last is None:
+            self.entry_ns += now - self._mark
+
+        else:
+            self._last.body_ns += now - self._mark
+
+    def init_run(self, f_args, f_kwargs, **kwargs):
+        self._last = None
+        self._pending = None
+        self._run_start = self._mark = time.perf_counter_ns()
+
+    def _close_raised(self, now: int):
+        #  The pending operator raised an exception, which may have been caught inside the generator
+        self._pending.op_ns += now - self._mark
+        self._pending.num_raised += 1
+        self._last = self._pending
+        self._pending = None
+
+    def before_op(self, domain=None, context=None, op_info: OpInfo = None, **kwargs):
+        now = time.perf_counter_ns()
+        if self._pending is not None:
+            self._close_raised(now)
+
+        else:
+            self._end_segment(now)
+
+        profile = self.get_profile(op_info.sid)
+        profile.num_calls += 1
+        try:
+            size = len(domain)
+
+        except TypeError:
+            pass
+
+        else:
+            profile.num_sized += 1
+            profile.total_domain_size += size
+            if size > profile.max_domain_size:
+                profile.max_domain_size = size
+
+        self._pending = profile
+        #  Exclude the time taken by the bookkeeping above
+        self._mark = time.perf_counter_ns()
+
+    def after_op(self, domain=None, context=None, op_info: OpInfo = None, retval: Any = None, **kwargs):
+        now = time.perf_counter_ns()
+        self._pending.op_ns += now - self._mark
+        self._last = self._pending
+        self._pending = None
+        self._mark = now
+
+    def after_run(self, success: bool):
+        now = time.perf_counter_ns()
+        self.num_runs += 1
+        self.total_ns += now - self._run_start
+        if self._pending is not None:
+            #  The failure of the run, if any, is accounted for by the operator raising
+            self._close_raised(now)
+
+        else:
+            self._end_segment(now)
+            if not success and self._last is not None:
+                self._last.num_failed_runs += 1
+
+        if not success:
+            self.num_failed_runs += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'num_runs': self.num_runs,
+            'num_failed_runs': self.num_failed_runs,
+            'total_ns': self.total_ns,
+            'entry_ns': self.entry_ns,
+            'ops': [p.as_dict() for p in sorted(self.profiles.values(), key=lambda p: -p.op_ns - p.body_ns)],
+        }
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        """
+        Return the statistics as a JSON string, writing it to ``path`` if provided
+        """
+        data = json.dumps(self.as_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(data)
+
+        return data
+
+    def to_csv(self, path: Optional[str] = None) -> str:
+        """
+        Return the per-operator statistics as CSV, with a row per operator, writing it to ``path`` if provided
+        """
+        rows = self.as_dict()['ops']
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(OpProfile('').as_dict().keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+        data = buffer.getvalue()
+        if path is not None:
+            with open(path, 'w', newline='') as f:
+                f.write(data)
+
+        return data
@@ -1,3 +1,5 @@
-from atlas.strategies.dfs import DfsStrategy
+from atlas.strategies.dfs import DfsStrategy, DfsStatistics
 from atlas.strategies.randomized import RandStrategy
-from atlas.strategies.replay import PartialReplayStrategy, FullReplayStrategy
+from atlas.strategies.replay import PartialReplayStrategy, FullReplayStrategy, BatchReplayStrategy
+from atlas.strategies.best_first import BestFirstStrategy
+from atlas.strategies.unique import UniqueRandStrategy
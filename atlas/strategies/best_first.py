@@ -0,0 +1,149 @@
+import bisect
+import heapq
+import itertools
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from atlas import Strategy
+from atlas.exceptions import ExceptionAsContinue
+from atlas.models import GeneratorModel
+from atlas.operators import OpInfo
+from atlas.strategies.dfs import DfsStrategy
+
+
+class BestFirstStrategy(Strategy):
+    """
+    Explores the executions of a generator in the order of their cumulative probabilities, as determined by the
+    ``(value, probability)`` pairs returned by ``GeneratorModel.infer_scored``. Operators without a model are
+    enumerated using the operators of the base strategy, and their values are assigned the probability 1.0.
+
+    The frontier is a priority queue of partial executions, each represented by the values returned by
+    the operators. Every run pops the most probable partial execution, replays its values and then greedily
+    picks the most probable value for every new operator, adding the next-best alternative of every such
+    operator to the frontier. The alternatives are added lazily so infinite operator domains are supported.
+    Ties are broken in favour of the most recently added partial execution, so the strategy explores
+    in DFS order in the absence of a model.
+
+    Like DFS, this assumes that the generator is deterministic modulo operator choices. Generators are compiled
+    for the base strategy, whose handlers are called with the base strategy itself. Attributes not defined by
+    this strategy, such as the known methods, are looked up on the base strategy.
+
+    Args:
+        base_strategy (Strategy): The strategy whose operators are used to enumerate operator domains.
+            Defaults to ``DfsStrategy``.
+        max_frontier_size (Optional[int]): Maximum number of partial executions to keep in the frontier.
+            The least probable ones are discarded when the frontier grows beyond this size.
+    """
+
+    def __init__(self, base_strategy: Strategy = None, max_frontier_size: Optional[int] = None):
+        super().__init__()
+        self.base_strategy = base_strategy or DfsStrategy()
+        self.known_ops = self.base_strategy.known_ops
+        self.max_frontier_size = max_frontier_size
+
+        self.call_id: int = 0
+        #  The frontier contains tuples of the form (-score, -counter, prefix, parent_score, rest) representing
+        #  the partial execution ``prefix`` with cumulative probability ``score``. The cumulative probability
+        #  excluding the last value in ``prefix`` is ``parent_score``, and ``rest`` is an iterator over
+        #  the remaining alternatives for it. The frontier is a heap if it is unbounded, and a sorted list
+        #  otherwise so that the least probable entry can be dropped in constant time
+        self.frontier: List[Tuple[float, int, Tuple, float, Iterator[Tuple[Any, float]]]] = []
+        self.counter = itertools.count()
+        self.started: bool = False
+
+        #  The values returned by operators in the current run, and their cumulative probability
+        self.choices: List[Any] = []
+        self.prefix_len: int = 0
+        self.score: float = 1.0
+
+    def init(self):
+        self.call_id = 0
+        self.frontier = []
+        self.counter = itertools.count()
+        self.started = False
+        self.choices = []
+        self.prefix_len = 0
+        self.score = 1.0
+
+    def init_run(self):
+        self.call_id = 0
+        if not self.started:
+            self.started = True
+            self.choices = []
+            self.prefix_len = 0
+            self.score = 1.0
+            return
+
+        if self.max_frontier_size is None:
+            neg_score, _, prefix, parent_score, rest = heapq.heappop(self.frontier)
+
+        else:
+            neg_score, _, prefix, parent_score, rest = self.frontier.pop(0)
+
+        self.push_alternative(prefix[:-1], parent_score, rest)
+        self.choices = list(prefix)
+        self.prefix_len = len(prefix)
+        self.score = -neg_score
+
+    def is_finished(self):
+        return self.started and len(self.frontier) == 0
+
+    def get_num_op_calls(self) -> int:
+        return self.call_id
+
+    def push_alternative(self, prefix: Tuple, score: float, rest: Iterator[Tuple[Any, float]]):
+        """
+        Add the next alternative in ``rest`` for the operator following ``prefix`` to the frontier.
+        """
+        for val, prob in rest:
+            entry = (-(score * prob), -next(self.counter), prefix + (val,), score, rest)
+            if self.max_frontier_size is None:
+                heapq.heappush(self.frontier, entry)
+
+            else:
+                bisect.insort(self.frontier, entry)
+                if len(self.frontier) > self.max_frontier_size:
+                    self.frontier.pop()
+
+            return
+
+    def generic_op(self, domain=None, context=None, model: GeneratorModel = None,
+                   op_info: OpInfo = None, handler: Optional[Callable] = None,
+                   **kwargs):
+        t = self.call_id
+        self.call_id += 1
+
+        if t < self.prefix_len:
+            return self.choices[t]
+
+        candidates = None
+        if model is not None:
+            try:
+                result = model.infer_scored(domain=domain, context=context, op_info=op_info, **kwargs)
+                if result is not None:
+                    candidates = iter(result)
+
+            except NotImplementedError:
+                pass
+
+        if candidates is None:
+            candidates = ((val, 1.0) for val in handler(self.base_strategy, domain=domain, context=context,
+                                                          op_info=op_info, **kwargs))
+
+        try:
+            val, prob = next(candidates)
+
+        except StopIteration:
+            #  Operator received an empty domain
+            raise ExceptionAsContinue
+
+        self.push_alternative(tuple(self.choices), self.score, candidates)
+        self.choices.append(val)
+        self.score *= prob
+        return val
+
+    def __getattr__(self, item):
+        if item == 'base_strategy':
+            #  Not set yet while unpickling
+            raise AttributeError(item)
+
+        return getattr(self.base_strategy, item)
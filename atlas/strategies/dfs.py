@@ -1,71 +1,295 @@
 import itertools
-from typing import Dict, Any, Callable, Collection, Optional, Iterator, Tuple
+from typing import Dict, Any, Callable, Collection, Optional, Iterator, Tuple, List
 
 from atlas import Strategy
 from atlas.exceptions import ExceptionAsContinue
 from atlas.models import GeneratorModel
 from atlas.operators import OpInfo, operator
+from atlas.utils.combinatorics import CombinatorialDomain, Combinations, Permutations, Sequences, CartesianProduct
+from atlas.utils.hashing import ValueHasher
+
+#  The value of operators on the frontier that raised ExceptionAsContinue in the run that reached them. Replaying
+#  them raises the exception again, as the generator may catch it and continue with the operators after them
+_RAISED = object()
+
+
+class DfsStatistics:
+    """
+    Counters of the search performed by a ``DfsStrategy``. They are updated as the search progresses, so they
+    can be read while ``generate`` is running, and accumulate across enumerations until reset.
+
+    ``backtracks_per_depth[t]`` counts the times the search backtracked to the operator with call-id ``t``
+    i.e. moved on to its next value. ``max_frontier_depth`` is the largest number of operators on the
+    frontier at the end of a run. The generator cache statistics refer to the positional caching of composed
+    generators with ``caching=True``.
+    """
+
+    def __init__(self):
+        self.num_runs: int = 0
+        self.num_completed_runs: int = 0
+        #  Runs aborted by ExceptionAsContinue, including the runs pruned for observational-equivalence
+        self.num_aborted_runs: int = 0
+        #  Runs that raised any other exception (only possible if exceptions are ignored)
+        self.num_failed_runs: int = 0
+        self.num_op_calls: int = 0
+        self.backtracks_per_depth: List[int] = []
+        self.max_frontier_depth: int = 0
+        self.gen_cache_hits: int = 0
+        self.gen_cache_misses: int = 0
+        self.num_model_calls: int = 0
+        self.num_pruned: int = 0
+
+    def __repr__(self):
+        return f"DfsStatistics(num_runs={self.num_runs}, num_completed_runs={self.num_completed_runs}, " \
+               f"num_aborted_runs={self.num_aborted_runs}, num_failed_runs={self.num_failed_runs}, " \
+               f"max_frontier_depth={self.max_frontier_depth})"
+
+    def get_num_backtracks(self) -> int:
+        return sum(self.backtracks_per_depth)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'num_runs': self.num_runs,
+            'num_completed_runs': self.num_completed_runs,
+            'num_aborted_runs': self.num_aborted_runs,
+            'num_failed_runs': self.num_failed_runs,
+            'num_op_calls': self.num_op_calls,
+            'num_backtracks': self.get_num_backtracks(),
+            'backtracks_per_depth': list(self.backtracks_per_depth),
+            'max_frontier_depth': self.max_frontier_depth,
+            'gen_cache_hits': self.gen_cache_hits,
+            'gen_cache_misses': self.gen_cache_misses,
+            'num_model_calls': self.num_model_calls,
+            'num_pruned': self.num_pruned,
+        }
 
 
 class DfsStrategy(Strategy):
-    def __init__(self, operator_iterator_bound: Optional[int] = None):
+    """
+    Enumerates the executions of a generator in depth-first order of the choices made by the operators.
+
+    Args:
+        operator_iterator_bound (Optional[int]): Bound on the number of values explored for every operator
+        prune_equivalent (bool): Enables observational-equivalence pruning. If a composed generator with
+            ``caching=True`` returns a result equivalent to a result it returned for different choices with
+            the same choices before the call, the rest of the execution is skipped, as it would repeat
+            the executions already explored for the earlier result. This is only correct if the rest of the
+            execution depends on the result of the call only through its equivalence key.
+        equivalence_key (Optional[Callable]): Maps the results of composed generators to the values compared
+            for equivalence. Defaults to the results themselves.
+        hashers (Optional[Dict[type, Callable]]): Additional hashers used to fingerprint the values compared
+            for equivalence. See ``atlas.utils.hashing.ValueHasher``.
+
+    The statistics of the search are available as ``stats`` (see ``DfsStatistics``), and are reset using
+    ``reset_statistics``.
+    """
+
+    def __init__(self, operator_iterator_bound: Optional[int] = None, prune_equivalent: bool = False,
+                 equivalence_key: Optional[Callable[[Any], Any]] = None,
+                 hashers: Optional[Dict[type, Callable]] = None):
         super().__init__()
         self.call_id: int = 0
-        self.op_iter_map: Dict[int, Iterator] = {}
-        self.val_map: Dict[int, Any] = {}
+
+        #  The DFS frontier. The iterator and the current value of the operator with call-id ``t``
+        #  are at index ``t``. Backtracking truncates both in place.
+        self.op_iters: List[Iterator] = []
+        self.op_vals: List[Any] = []
+        #  Index of the current value of every operator in the frontier in the sequence of values of the operator
+        self.op_indices: List[int] = []
         self.finished: bool = False
 
+        #  Used to split the search tree into independent sub-trees. The operator with call-id ``t`` only
+        #  explores the value at index ``forced_prefix[t]`` for ``t < len(forced_prefix)``. If ``depth_limit``
+        #  is set, runs are aborted (with ``depth_limit_reached`` set) when reaching the operator with that call-id
+        self.forced_prefix: Tuple[int, ...] = ()
+        self.depth_limit: Optional[int] = None
+        self.depth_limit_reached: bool = False
+
+        #  Used to resume enumeration after the execution with the given choice vector (see ``get_checkpoint``).
+        #  The first run after ``init`` positions the operator with call-id ``t`` at index ``resume_prefix[t]``
+        #  of its sequence of values, without giving up the values after it.
+        self.resume_from: Optional[Tuple[int, ...]] = None
+        self.resume_prefix: Tuple[int, ...] = ()
+
         #  This optimization is semantically correct if and only if the generator is deterministic modulo
         #  operator choices and side-effect free i.e. the generator follows the same execution path and
         #  returns the same result if all the operators make the same choices and does not mutate any object
 
         #  The cache contains tuples as values with the first two elements being the start and end call-id,
-        #  and the third being the value returned by the generator
+        #  and the third being the value returned by the generator. The stack contains the keys of the cache
+        #  in the order the generators returned, which is also in non-decreasing order of end call-ids,
+        #  so backtracking only needs to pop entries off the top of the stack.
         self.gen_call_id = 0
         self.gen_result_cache: Dict[int, Tuple[int, int, Any]] = {}
+        self.gen_result_stack: List[int] = []
+        self.gen_pending_starts: Dict[int, int] = {}
 
         #  Bound on number of values to return for each operator
         self.operator_iterator_bound = operator_iterator_bound
 
+        #  Observational-equivalence pruning. Maps the (generator call id, start call id) of composed generator
+        #  calls to a dict from the fingerprints of their results to the choices made inside the call that first
+        #  produced them. The choices before the start call-id are the same for all the results in an entry,
+        #  so entries are dropped when backtracking to an operator before the start call-id.
+        self.prune_equivalent = prune_equivalent
+        self.equivalence_key = equivalence_key
+        self.value_hasher: Optional[ValueHasher] = ValueHasher(hashers) if prune_equivalent else None
+        self.equivalent_results: Dict[Tuple[int, int], Dict[Any, Tuple[int, ...]]] = {}
+        self.num_pruned: int = 0
+
+        self.stats = DfsStatistics()
+
+    def get_statistics(self) -> DfsStatistics:
+        return self.stats
+
+    def reset_statistics(self):
+        self.stats = DfsStatistics()
+
     def init(self):
         self.call_id = 0
         self.gen_call_id = 0
-        self.op_iter_map = {}
+        self.op_iters = []
+        self.op_vals = []
+        self.op_indices = []
         self.gen_result_cache = {}
+        self.gen_result_stack = []
+        self.gen_pending_starts = {}
+        self.equivalent_results = {}
+        self.num_pruned = 0
         self.finished = False
 
+        self.resume_prefix = ()
+        if self.resume_from is not None:
+            #  Advancing the last operator of the checkpoint moves to the next execution. If it has no values left,
+            #  the run aborts with an empty domain and the usual backtracking in ``finish_run`` takes over.
+            #  An empty checkpoint corresponds to a generator without operators, which has a single execution
+            if len(self.resume_from) == 0:
+                self.finished = True
+
+            else:
+                self.resume_prefix = (*self.resume_from[:-1], self.resume_from[-1] + 1)
+
+            self.resume_from = None
+
     def init_run(self):
         self.call_id = 0
         self.gen_call_id = 0
+        self.depth_limit_reached = False
+
+    def after_run(self, exception: Optional[Exception]):
+        stats = self.stats
+        if exception is None:
+            stats.num_completed_runs += 1
+
+        elif isinstance(exception, ExceptionAsContinue):
+            stats.num_aborted_runs += 1
+
+        else:
+            stats.num_failed_runs += 1
 
     def finish_run(self):
-        for t in range(max(self.op_iter_map.keys(), default=-1), -1, -1):
+        self.resume_prefix = ()
+        op_iters = self.op_iters
+        stats = self.stats
+        stats.num_runs += 1
+        stats.num_op_calls += self.call_id
+        if len(op_iters) > stats.max_frontier_depth:
+            stats.max_frontier_depth = len(op_iters)
+
+        for t in range(len(op_iters) - 1, -1, -1):
             try:
-                self.val_map[t] = next(self.op_iter_map[t])
-                self.val_map = {k: v for k, v in self.val_map.items() if k <= t}
-                self.op_iter_map = {k: v for k, v in self.op_iter_map.items() if k <= t}
-
-                #  The call id of the last operator in the generator <= t for it to be cached correctly
-                self.gen_result_cache = {k: v for k, v in self.gen_result_cache.items() if 0 <= v[1] <= t}
-                return
+                self.op_vals[t] = next(op_iters[t])
 
             except StopIteration:
                 continue
 
+            self.op_indices[t] += 1
+            backtracks = stats.backtracks_per_depth
+            if len(backtracks) <= t:
+                backtracks.extend([0] * (t + 1 - len(backtracks)))
+
+            backtracks[t] += 1
+            del op_iters[t + 1:]
+            del self.op_vals[t + 1:]
+            del self.op_indices[t + 1:]
+
+            #  The call id of the last operator in the generator <= t for it to be cached correctly
+            gen_result_cache = self.gen_result_cache
+            gen_result_stack = self.gen_result_stack
+            while gen_result_stack and gen_result_cache[gen_result_stack[-1]][1] > t:
+                del gen_result_cache[gen_result_stack.pop()]
+
+            #  Generators that did not return in this run are not cached
+            self.gen_pending_starts.clear()
+
+            if self.equivalent_results:
+                for key in [key for key in self.equivalent_results if key[1] > t]:
+                    del self.equivalent_results[key]
+
+            return
+
+        #  Release the exhausted frontier
         self.finished = True
+        self.op_iters.clear()
+        self.op_vals.clear()
+        self.op_indices.clear()
+        self.gen_result_cache.clear()
+        self.gen_result_stack.clear()
+        self.gen_pending_starts.clear()
+        self.equivalent_results.clear()
 
     def is_finished(self):
         return self.finished
 
+    def get_num_op_calls(self) -> int:
+        return self.call_id
+
+    def get_checkpoint(self) -> Tuple[int, ...]:
+        """
+        Return the position of the last execution as a choice vector, containing the index of the value
+        returned by every operator in its sequence of values, in the order of the call-ids of the operators.
+        Enumeration can be resumed after this execution by passing the choice vector as ``resume_from`` to
+        ``generate``, which re-creates only the operator iterators on the path to the execution.
+
+        Returns:
+            A tuple of ints. The empty tuple is returned once the enumeration is finished.
+        """
+        return tuple(self.op_indices)
+
     def generator_invoked(self):
         k = self.gen_call_id
         self.gen_call_id += 1
-        self.gen_result_cache[k] = (self.call_id, -1, None)
+        self.gen_pending_starts[k] = self.call_id
         return k
 
     def generator_returned(self, gen_call_id: int, result: Any):
-        start, _, _ = self.gen_result_cache[gen_call_id]
+        start = self.gen_pending_starts.pop(gen_call_id)
+        if self.prune_equivalent:
+            self.check_equivalence(gen_call_id, start, result)
+
         self.gen_result_cache[gen_call_id] = (start, self.call_id, result)
+        self.gen_result_stack.append(gen_call_id)
+
+    def check_equivalence(self, gen_call_id: int, start: int, result: Any):
+        """
+        Raise ExceptionAsContinue if the composed generator call with the given ids returned a result equivalent
+        to the result returned for different choices inside the call
+        """
+        fingerprint = self.value_hasher(result if self.equivalence_key is None else self.equivalence_key(result))
+        if fingerprint is None:
+            return
+
+        choices = tuple(self.op_indices[start:self.call_id])
+        seen = self.equivalent_results.get((gen_call_id, start), None)
+        if seen is None:
+            self.equivalent_results[gen_call_id, start] = {fingerprint: choices}
+            return
+
+        first_choices = seen.setdefault(fingerprint, choices)
+        if first_choices != choices:
+            self.num_pruned += 1
+            self.stats.num_pruned += 1
+            raise ExceptionAsContinue
 
     def cached_generator_invocation(self):
         if self.gen_call_id in self.gen_result_cache:
@@ -73,8 +297,10 @@ class DfsStrategy(Strategy):
             assert entry[0] == self.call_id
             self.gen_call_id += 1
             self.call_id = entry[1]
+            self.stats.gen_cache_hits += 1
             return True, entry[2]
 
+        self.stats.gen_cache_misses += 1
         return False, False
 
     def gen_call(self, func: Callable, args, kwargs, atlas_kwargs, gen: 'Generator'):
@@ -96,38 +322,89 @@ class DfsStrategy(Strategy):
         t = self.call_id
         self.call_id += 1
 
-        if t not in self.op_iter_map:
-            try:
-                iterator = None
-                if model is not None:
-                    try:
-                        result = model.infer(domain=domain, context=context, op_info=op_info, **kwargs)
-                        if result is not None:
-                            iterator = iter(result)
+        if t < len(self.op_iters):
+            val = self.op_vals[t]
+            if val is _RAISED:
+                raise ExceptionAsContinue
 
-                    except NotImplementedError:
-                        pass
+            return val
 
-                if iterator is None:
-                    iterator = handler(self, domain=domain, context=context, op_info=op_info, **kwargs)
+        if self.depth_limit is not None and t >= self.depth_limit:
+            self.depth_limit_reached = True
+            raise ExceptionAsContinue
 
-                if self.operator_iterator_bound:
-                    op_iter = itertools.islice(iter(iterator), self.operator_iterator_bound)
-                else:
-                    op_iter = iter(iterator)
+        try:
+            iterator = None
+            if model is not None:
+                self.stats.num_model_calls += 1
+                try:
+                    result = model.infer(domain=domain, context=context, op_info=op_info, **kwargs)
+                    if result is not None:
+                        iterator = iter(result)
 
-                self.op_iter_map[t] = op_iter
-                val = self.val_map[t] = next(op_iter)
+                except NotImplementedError:
+                    pass
 
-            except StopIteration:
-                #  Operator received an empty domain
-                raise ExceptionAsContinue
+            if iterator is None:
+                iterator = handler(self, domain=domain, context=context, op_info=op_info, **kwargs)
 
-        else:
-            val = self.val_map[t]
+            op_index = 0
+            stop = self.operator_iterator_bound or None
+            if t < len(self.forced_prefix):
+                op_index = self.forced_prefix[t]
+                stop = op_index + 1 if stop is None else min(stop, op_index + 1)
+
+            elif t < len(self.resume_prefix):
+                op_index = self.resume_prefix[t]
+
+            if op_index == 0 and stop is None:
+                op_iter = iter(iterator)
+
+            elif isinstance(iterator, CombinatorialDomain):
+                #  Jump to the value directly instead of iterating over the values before it
+                op_iter = iter(iterator[op_index:stop])
+
+            else:
+                op_iter = itertools.islice(iterator, op_index, stop)
+
+            #  Operators that raised before creating an iterator in this run (the exception having been caught
+            #  inside the generator) have nothing to explore, and raise again when replayed
+            while len(self.op_iters) < t:
+                self.op_iters.append(iter(()))
+                self.op_vals.append(_RAISED)
+                self.op_indices.append(0)
+
+            self.op_iters.append(op_iter)
+            self.op_vals.append(_RAISED)
+            self.op_indices.append(op_index)
+            val = self.op_vals[t] = next(op_iter)
+
+        except StopIteration:
+            #  Operator received an empty domain
+            raise ExceptionAsContinue
 
         return val
 
+    def get_op_dispatcher(self, op_info: OpInfo, handler: Callable) -> Optional[Callable]:
+        strategy_cls = self.__class__
+        if strategy_cls.generic_op is not DfsStrategy.generic_op:
+            return None
+
+        def dispatcher(strategy, model, domain=None, context=None, **kwargs):
+            if strategy.__class__ is strategy_cls:
+                #  Fast path for operators that have already made a choice in a previous run
+                t = strategy.call_id
+                if t < len(strategy.op_iters):
+                    val = strategy.op_vals[t]
+                    if val is not _RAISED:
+                        strategy.call_id = t + 1
+                        return val
+
+            return strategy.generic_op(domain, context=context, model=model, op_info=op_info, handler=handler,
+                                       **kwargs)
+
+        return dispatcher
+
     @operator
     def Select(self, domain: Any, context: Any = None, **kwargs):
         yield from domain
@@ -145,8 +422,7 @@ class DfsStrategy(Strategy):
         if lengths is None:
             lengths = range(0 if include_empty else 1, len(domain) + 1)
 
-        for l in lengths:
-            yield from itertools.combinations(domain, l)
+        return Combinations(domain, lengths)
 
     @operator
     def OrderedSubset(self, domain: Any, context: Any = None,
@@ -155,12 +431,11 @@ class DfsStrategy(Strategy):
         if lengths is None:
             lengths = range(0 if include_empty else 1, len(domain) + 1)
 
-        for l in lengths:
-            yield from itertools.permutations(domain, l)
+        return Permutations(domain, lengths)
 
     @operator
     def Product(self, domain: Any, context: Any = None, **kwargs):
-        yield from itertools.product(*domain)
+        return CartesianProduct(domain)
 
     @operator
     def Sequence(self, domain: Any, context: Any = None, max_len: int = None,
@@ -172,10 +447,7 @@ class DfsStrategy(Strategy):
             raise SyntaxError("Sequence takes only *one* of the 'max_len' and 'lengths' keyword arguments")
 
         if max_len is not None:
-            for l in range(1, max_len + 1):
-                yield from itertools.product(domain, repeat=l)
+            lengths = range(1, max_len + 1)
 
-        elif lengths is not None:
-            for l in list(lengths):
-                yield from itertools.product(domain, repeat=l)
+        return Sequences(domain, lengths)
 
@@ -1,49 +1,184 @@
+import copy
 import random
-from typing import Callable, Optional, Collection, Any
+from typing import Callable, Optional, Collection, Any, List, Union
+
+import numpy as np
 
 from atlas import Strategy
+from atlas.exceptions import ExceptionAsContinue
 from atlas.operators import OpInfo, operator
 
 
+def get_subset_lengths(domain: Any, lengths: Optional[Collection[int]], include_empty: bool) -> Collection[int]:
+    """
+    Return the lengths of the subsets of ``domain`` that ``Subset`` and ``OrderedSubset`` choose from
+    """
+    if lengths is None:
+        return range(0 if include_empty else 1, len(domain) + 1)
+
+    return [length for length in lengths if length <= len(domain)]
+
+
+def get_sequence_lengths(domain: Any, lengths: Collection[int]) -> Collection[int]:
+    """
+    Return the lengths of the sequences of elements of ``domain`` that ``Sequence`` chooses from
+    """
+    if len(domain) == 0:
+        return [length for length in lengths if length == 0]
+
+    return lengths
+
+
 class RandStrategy(Strategy):
+    """
+    Makes random choices using random number generators owned by the strategy, seeded from a
+    ``numpy.random.SeedSequence``. The generators are seeded from fresh entropy if no seed is provided.
+    Independent streams for workers can be obtained using ``spawn``.
+
+    Args:
+        seed: An int or a ``numpy.random.SeedSequence``
+    """
+
+    def __init__(self, seed: Optional[Union[int, np.random.SeedSequence]] = None):
+        super().__init__()
+        self.call_id: int = 0
+
+        self.seed_sequence: Optional[np.random.SeedSequence] = None
+        #  Used for scalar draws, which are much cheaper with ``random`` than with numpy
+        self.rng: Optional[random.Random] = None
+        #  Used for vectorized draws
+        self.np_rng: Optional[np.random.Generator] = None
+        self.seed(seed)
+
+    def seed(self, seed: Optional[Union[int, np.random.SeedSequence]] = None):
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+
+        self.seed_sequence = seed
+        py_seq, np_seq = seed.spawn(2)
+        self.rng = random.Random(int.from_bytes(py_seq.generate_state(4).tobytes(), 'little'))
+        self.np_rng = np.random.default_rng(np_seq)
+
+    def reseeded(self, seed: Optional[Union[int, np.random.SeedSequence]] = None) -> 'RandStrategy':
+        """
+        Return a copy of the strategy with its random number generators seeded with ``seed``
+        """
+        strategy = copy.copy(self)
+        strategy.seed(seed)
+        return strategy
+
+    def spawn(self, n: int) -> List['RandStrategy']:
+        """
+        Return ``n`` copies of the strategy with independent random streams derived from the seed of this strategy
+        """
+        return [self.reseeded(seq) for seq in self.seed_sequence.spawn(n)]
+
+    def init_run(self):
+        self.call_id = 0
+
     def generic_op(self, domain=None, context=None, op_info: OpInfo = None, handler: Optional[Callable] = None,
                    **kwargs):
+        self.call_id += 1
         return handler(self, domain=domain, context=context, op_info=op_info, **kwargs)
 
+    def get_op_dispatcher(self, op_info: OpInfo, handler: Callable) -> Optional[Callable]:
+        strategy_cls = self.__class__
+        if strategy_cls.generic_op is not RandStrategy.generic_op:
+            return None
+
+        def dispatcher(strategy, model, domain=None, context=None, **kwargs):
+            if strategy.__class__ is strategy_cls:
+                strategy.call_id += 1
+                return handler(strategy, domain=domain, context=context, op_info=op_info, model=model, **kwargs)
+
+            return strategy.generic_op(domain, context=context, model=model, op_info=op_info, handler=handler,
+                                       **kwargs)
+
+        return dispatcher
+
     def is_finished(self):
         return False
 
+    def get_num_op_calls(self) -> int:
+        return self.call_id
+
+    #  Like the DFS operators, operators raise ExceptionAsContinue if there is nothing to choose from
+
     @operator
     def Select(self, domain: Any, **kwargs):
-        return random.choice(domain)
+        try:
+            return self.rng.choice(domain)
+
+        except IndexError:
+            if len(domain) == 0:
+                raise ExceptionAsContinue
+
+            raise
+
+    def choose_subset_indices(self, domain: Any, lengths: Optional[Collection[int]],
+                              include_empty: bool) -> List[int]:
+        """
+        Return the indices of a random subset of ``domain``, in random order, as chosen by ``Subset``
+        and ``OrderedSubset``
+        """
+        lengths = get_subset_lengths(domain, lengths, include_empty)
+        if len(lengths) == 0:
+            raise ExceptionAsContinue
+
+        return self.np_rng.choice(len(domain), size=self.rng.choice(lengths), replace=False).tolist()
+
+    def choose_sequence_indices(self, domain: Any, max_len: Optional[int],
+                                lengths: Optional[Collection[int]]) -> List[int]:
+        """
+        Return the indices of the elements of a random sequence over ``domain``, as chosen by ``Sequence``
+        """
+        if max_len is None and lengths is None:
+            raise SyntaxError("Sequence requires the explicit keyword argument 'max_len' or 'lengths'")
+
+        if max_len is not None and lengths is not None:
+            raise SyntaxError("Sequence takes only *one* of the 'max_len' and 'lengths' keyword arguments")
+
+        if lengths is None:
+            lengths = range(1, max_len + 1)
+
+        lengths = get_sequence_lengths(domain, lengths)
+        if len(lengths) == 0:
+            raise ExceptionAsContinue
+
+        length = self.rng.choice(lengths)
+        if length == 0:
+            return []
+
+        return self.np_rng.integers(len(domain), size=length).tolist()
 
     @operator
     def Subset(self, domain: Any, context: Any = None, lengths: Collection[int] = None,
                include_empty: bool = False, **kwargs):
-        if lengths is None:
-            lengths = range(0 if include_empty else 1, len(domain) + 1)
-
-        return random.sample(domain, random.choice(lengths))
+        return [domain[i] for i in self.choose_subset_indices(domain, lengths, include_empty)]
 
     @operator
     def OrderedSubset(self, domain: Any, context: Any = None,
                       lengths: Collection[int] = None, include_empty: bool = False, **kwargs):
-        if lengths is None:
-            lengths = range(0 if include_empty else 1, len(domain) + 1)
-
-        return random.sample(domain, random.choice(lengths))
+        return [domain[i] for i in self.choose_subset_indices(domain, lengths, include_empty)]
 
     @operator
     def Sequence(self, domain: Any, context: Any = None, max_len: int = None,
                  lengths: Collection[int] = None, **kwargs):
-        if max_len is None and lengths is None:
-            raise SyntaxError("Sequence requires the explicit keyword argument 'max_len' or 'lengths'")
+        return [domain[i] for i in self.choose_sequence_indices(domain, max_len, lengths)]
 
-        if max_len is not None and lengths is not None:
-            raise SyntaxError("Sequence takes only *one* of the 'max_len' and 'lengths' keyword arguments")
+    @operator
+    def Substr(self, domain: Any, context: Any = None, **kwargs):
+        if not isinstance(domain, str) or len(domain) == 0:
+            raise ExceptionAsContinue
 
-        if lengths is None:
-            lengths = range(1, max_len + 1)
+        i, j = sorted(self.rng.sample(range(len(domain) + 1), 2))
+        return domain[i: j]
 
-        return random.choices(domain, k=random.choice(lengths))
+    @operator
+    def Product(self, domain: Any, context: Any = None, **kwargs):
+        domain = [list(d) for d in domain]
+        if any(len(d) == 0 for d in domain):
+            raise ExceptionAsContinue
 
+        rng = self.rng
+        return tuple(rng.choice(d) for d in domain)
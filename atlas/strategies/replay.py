@@ -1,26 +1,30 @@
 import collections
-from typing import Callable, Optional, List, Union, Dict, Iterator
+from typing import Any, Callable, Optional, List, Union, Dict, Iterator
 
 from atlas import Strategy
 from atlas.operators import OpInfo, operator
-from atlas.tracing import GeneratorTrace
+from atlas.tracing import GeneratorTrace, ChoiceTrace, DomainIndex
 
 
 class FullReplayStrategy(Strategy):
     """
-    Replay a full GeneratorTrace. Throws an error if the trace and the generator execution
+    Replay a full GeneratorTrace or ChoiceTrace. Throws an error if the trace and the generator execution
     are inconsistent at any point of time. This restriction is not imposed by the PartialReplayStrategy below.
     FullReplayStrategy is used when `replay` is called on a `Generator` object.
     The base strategy is used to add a basis for the operators in order to compile the generator.
     However the strategy itself will never be called.
     """
-    def __init__(self, trace: GeneratorTrace, base_strategy: Strategy):
+    def __init__(self, trace: Union[GeneratorTrace, ChoiceTrace], base_strategy: Strategy):
         super().__init__()
         self.trace = trace
         self.known_ops = base_strategy.known_ops
         self.op_choices = collections.defaultdict(list)
-        for t in trace.op_traces:
-            self.op_choices[t.op_info.sid].append(t.choice)
+        if isinstance(trace, ChoiceTrace):
+            self.op_choices = trace.get_op_choices()
+
+        else:
+            for t in trace.op_traces:
+                self.op_choices[t.op_info.sid].append(t.choice)
 
         self.op_choice_iter_map: Dict[str, Iterator] = {}
 
@@ -34,7 +38,8 @@ class FullReplayStrategy(Strategy):
                    *args, **kwargs):
 
         if op_info.sid in self.op_choice_iter_map:
-            return next(self.op_choice_iter_map[op_info.sid])
+            choice = next(self.op_choice_iter_map[op_info.sid])
+            return domain[choice.index] if type(choice) is DomainIndex else choice
 
         raise KeyError(f"Generator and trace are inconsistent. "
                        f"Choice could not be made for operator with sid {op_info.sid}")
@@ -42,13 +47,13 @@ class FullReplayStrategy(Strategy):
 
 class PartialReplayStrategy(Strategy):
     """
-    Replay a GeneratorTrace or a Mapping from sid/uids to return values of operators.
+    Replay a GeneratorTrace, a ChoiceTrace or a Mapping from sid/uids to return values of operators.
     It also takes a backup strategy as an argument to consult if an operator is encountered
     for which no replay information is available. Consequently, it does not throws an error
     if the trace and the generator execution are inconsistent at any point of time.
     PartialReplayStrategy is used when `with_replay` is called on a `GeneratorExecEnvironment` object.
     """
-    def __init__(self, trace: Union[Dict[str, List], GeneratorTrace], backup_strategy: Strategy):
+    def __init__(self, trace: Union[Dict[str, List], GeneratorTrace, ChoiceTrace], backup_strategy: Strategy):
         super().__init__()
         self.trace = trace
         self.backup_strategy = backup_strategy
@@ -61,6 +66,9 @@ class PartialReplayStrategy(Strategy):
             for t in trace.op_traces:
                 self.op_choices[t.op_info.sid].append(t.choice)
 
+        elif isinstance(trace, ChoiceTrace):
+            self.op_choices = trace.get_op_choices()
+
         else:
             self.uid_choices = trace.copy()
 
@@ -73,6 +81,15 @@ class PartialReplayStrategy(Strategy):
     def is_finished(self):
         return self.backup_strategy.is_finished()
 
+    def get_num_op_calls(self) -> int:
+        return self.backup_strategy.get_num_op_calls()
+
+    def accept_run(self) -> bool:
+        return self.backup_strategy.accept_run()
+
+    def after_run(self, exception: Optional[Exception]):
+        self.backup_strategy.after_run(exception)
+
     def init(self):
         self.backup_strategy.init()
 
@@ -90,7 +107,8 @@ class PartialReplayStrategy(Strategy):
     def generic_op(self, domain=None, context=None, op_info: OpInfo = None, handler: Optional[Callable] = None,
                    *args, **kwargs):
         if op_info.sid in self.op_choice_map:
-            return next(self.op_choice_map[op_info.sid])
+            choice = next(self.op_choice_map[op_info.sid])
+            return domain[choice.index] if type(choice) is DomainIndex else choice
 
         if op_info.uid in self.uid_choice_map:
             return next(self.uid_choice_map[op_info.uid])
@@ -99,4 +117,73 @@ class PartialReplayStrategy(Strategy):
                                                handler=handler, **kwargs)
 
     def __getattr__(self, item):
+        if item == 'backup_strategy':
+            #  Not set yet while unpickling
+            raise AttributeError(item)
+
         return self.backup_strategy.__getattribute__(item)
+
+
+class BatchReplayStrategy(PartialReplayStrategy):
+    """
+    Replay many traces one after the other in a single execution environment, so that the generator is compiled
+    once. The trace to replay is switched with ``set_trace`` before every run. Every operator sid is assigned
+    an integer slot shared by all the traces, and the choices of the current trace are kept in a table of lists
+    indexed by slot, along with the position of the next choice to replay in every list.
+
+    Operators for which the trace has no (more) choices are delegated to the backup strategy, unless ``strict``
+    is set in which case a KeyError is raised as in FullReplayStrategy.
+    """
+    def __init__(self, backup_strategy: Strategy, strict: bool = False):
+        super().__init__({}, backup_strategy)
+        self.strict = strict
+
+        self.sid_slots: Dict[str, int] = {}
+        self.slot_choices: List[List[Any]] = []
+        self.slot_positions: List[int] = []
+
+    def set_trace(self, trace: Union[GeneratorTrace, ChoiceTrace]):
+        self.trace = trace
+        sid_slots = self.sid_slots
+        slot_choices: List[List[Any]] = [[] for _ in range(len(sid_slots))]
+        if isinstance(trace, ChoiceTrace):
+            sid_choices = ((op_info.sid, trace.get_choice(t)) for t, op_info in enumerate(trace.op_infos))
+
+        else:
+            sid_choices = ((t.op_info.sid, t.choice) for t in trace.op_traces)
+
+        for sid, choice in sid_choices:
+            slot = sid_slots.get(sid, None)
+            if slot is None:
+                slot = sid_slots[sid] = len(slot_choices)
+                slot_choices.append([])
+
+            slot_choices[slot].append(choice)
+
+        self.slot_choices = slot_choices
+
+    def init_run(self):
+        self.slot_positions = [0] * len(self.slot_choices)
+        self.backup_strategy.init_run()
+
+    def accept_run(self) -> bool:
+        #  Every trace produces a result, even if the backup strategy would discard it e.g. as a duplicate
+        return True
+
+    def generic_op(self, domain=None, context=None, op_info: OpInfo = None, handler: Optional[Callable] = None,
+                   *args, **kwargs):
+        slot = self.sid_slots.get(op_info.sid, None)
+        if slot is not None and slot < len(self.slot_choices):
+            pos = self.slot_positions[slot]
+            choices = self.slot_choices[slot]
+            if pos < len(choices):
+                self.slot_positions[slot] = pos + 1
+                choice = choices[pos]
+                return domain[choice.index] if type(choice) is DomainIndex else choice
+
+        if self.strict:
+            raise KeyError(f"Generator and trace are inconsistent. "
+                           f"Choice could not be made for operator with sid {op_info.sid}")
+
+        return self.backup_strategy.generic_op(domain, context=context, op_info=op_info,
+                                               handler=handler, **kwargs)
@@ -0,0 +1,171 @@
+import hashlib
+from typing import Any, Callable, Collection, List, Optional, Set, Union
+
+import numpy as np
+
+from atlas.exceptions import ExceptionAsContinue
+from atlas.operators import OpInfo, operator
+from atlas.strategies.randomized import RandStrategy
+from atlas.utils.bloom import BloomFilter
+from atlas.utils.hashing import ValueHasher, Unhashable
+
+
+def _encode_fingerprint(fingerprint: Any) -> str:
+    #  Fingerprints returned by ``ValueHasher`` are nested tuples and frozensets of types and hashable values.
+    #  The elements of frozensets are sorted, and types spelled out, so that the encoding does not depend on
+    #  the iteration order or the process
+    t = type(fingerprint)
+    if t is tuple:
+        return '(' + ','.join(_encode_fingerprint(v) for v in fingerprint) + ')'
+
+    if t is frozenset:
+        return '{' + ','.join(sorted(_encode_fingerprint(v) for v in fingerprint)) + '}'
+
+    if isinstance(fingerprint, type):
+        return f"{fingerprint.__module__}.{fingerprint.__qualname__}"
+
+    return repr(fingerprint)
+
+
+def _digest(data: str) -> bytes:
+    return hashlib.blake2b(data.encode(), digest_size=16).digest()
+
+
+def _choices_key(choices: List[Any]) -> bytes:
+    #  The choices only contain ints, tuples of ints and digests, whose representation is canonical
+    return _digest(repr(choices))
+
+
+class UniqueRandStrategy(RandStrategy):
+    """
+    A randomized strategy that samples executions without replacement. The sequence of choices made by the
+    operators in every successful run is hashed into a 128-bit key, and runs whose key has been seen before
+    are discarded. This assumes that the generator is deterministic modulo operator choices.
+
+    The built-in operators record the indices of the elements they choose, which makes the key cheap to compute
+    and independent of the values in the domains. Other operators record a fingerprint of the value they return,
+    computed with ``ValueHasher`` (or from its representation if it cannot be fingerprinted).
+
+    The keys are kept in a set by default. If ``bloom_capacity`` is provided, a Bloom filter with bounded memory
+    is used instead, which may occasionally discard a new execution as a duplicate.
+
+    Since the size of the search space is not known, the strategy finishes after ``max_consecutive_duplicates``
+    duplicate runs in a row, which indicates that the search space is (close to being) exhausted.
+
+    Args:
+        seed: An int or a ``numpy.random.SeedSequence``
+        max_consecutive_duplicates (Optional[int]): Number of consecutive duplicate runs after which the strategy
+            finishes. If None, the strategy never finishes.
+        bloom_capacity (Optional[int]): Expected number of unique executions, if a Bloom filter should be used
+        bloom_error_rate (float): The false-positive rate of the Bloom filter at capacity
+    """
+
+    def __init__(self, seed: Optional[Union[int, np.random.SeedSequence]] = None,
+                 max_consecutive_duplicates: Optional[int] = 1000,
+                 bloom_capacity: Optional[int] = None, bloom_error_rate: float = 0.001):
+        super().__init__(seed=seed)
+        self.max_consecutive_duplicates = max_consecutive_duplicates
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+
+        self.seen: Union[Set[bytes], BloomFilter] = self._make_seen_set()
+        self.choices: List[Any] = []
+        self.hasher = ValueHasher()
+
+        self.num_unique: int = 0
+        self.num_duplicates: int = 0
+        self.consecutive_duplicates: int = 0
+
+    def _make_seen_set(self):
+        if self.bloom_capacity is not None:
+            return BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+
+        return set()
+
+    def get_duplicate_rate(self) -> float:
+        """
+        Return the fraction of successful runs that were discarded as duplicates
+        """
+        total = self.num_unique + self.num_duplicates
+        return self.num_duplicates / total if total > 0 else 0.0
+
+    def init(self):
+        self.seen = self._make_seen_set()
+        self.num_unique = 0
+        self.num_duplicates = 0
+        self.consecutive_duplicates = 0
+
+    def init_run(self):
+        super().init_run()
+        self.choices = []
+
+    def is_finished(self):
+        return (self.max_consecutive_duplicates is not None and
+                self.consecutive_duplicates >= self.max_consecutive_duplicates)
+
+    def accept_run(self) -> bool:
+        key = _choices_key(self.choices)
+        if isinstance(self.seen, BloomFilter):
+            duplicate = self.seen.add(key)
+
+        else:
+            duplicate = key in self.seen
+            self.seen.add(key)
+
+        if duplicate:
+            self.num_duplicates += 1
+            self.consecutive_duplicates += 1
+            return False
+
+        self.num_unique += 1
+        self.consecutive_duplicates = 0
+        return True
+
+    def generic_op(self, domain=None, context=None, op_info: OpInfo = None, handler: Optional[Callable] = None,
+                   **kwargs):
+        num_choices = len(self.choices)
+        retval = super().generic_op(domain=domain, context=context, op_info=op_info, handler=handler, **kwargs)
+        if len(self.choices) == num_choices:
+            #  The operator did not record the indices of its choice
+            try:
+                data = _encode_fingerprint(self.hasher.hash_value(retval))
+
+            except Unhashable:
+                data = repr(retval)
+
+            self.choices.append(('value', _digest(data)))
+
+        return retval
+
+    #  The operators below make the same random draws as the ones of RandStrategy
+
+    @operator
+    def Select(self, domain: Any, **kwargs):
+        if len(domain) == 0:
+            raise ExceptionAsContinue
+
+        index = self.rng.randrange(len(domain))
+        self.choices.append(index)
+        return domain[index]
+
+    @operator
+    def Subset(self, domain: Any, context: Any = None, lengths: Collection[int] = None,
+               include_empty: bool = False, **kwargs):
+        indices = self.choose_subset_indices(domain, lengths, include_empty)
+        #  The order of the elements of a subset is immaterial
+        self.choices.append(tuple(sorted(indices)))
+        return [domain[i] for i in indices]
+
+    @operator
+    def OrderedSubset(self, domain: Any, context: Any = None,
+                      lengths: Collection[int] = None, include_empty: bool = False, **kwargs):
+        indices = self.choose_subset_indices(domain, lengths, include_empty)
+        self.choices.append(tuple(indices))
+        return [domain[i] for i in indices]
+
+    @operator
+    def Sequence(self, domain: Any, context: Any = None, max_len: int = None,
+                 lengths: Collection[int] = None, **kwargs):
+        indices = self.choose_sequence_indices(domain, max_len, lengths)
+        self.choices.append(tuple(indices))
+        return [domain[i] for i in indices]
@@ -1,7 +1,8 @@
 import collections
 from abc import abstractmethod, ABC
-from typing import Callable, Optional, Set, List
+from typing import Any, Callable, Optional, Set, List, Tuple
 
+from atlas.budget import BudgetTracker
 from atlas.exceptions import ExceptionAsContinue
 from atlas.hooks import Hook
 from atlas.models import GeneratorModel
@@ -17,6 +18,25 @@ class Strategy(ABC, OpResolvable):
     def get_op_handler(self, op_info: OpInfo):
         return resolve_operator(self.known_ops, op_info)
 
+    def get_op_dispatcher(self, op_info: OpInfo, handler: Callable) -> Optional[Callable]:
+        """
+        Return a callable specialized for a single operator call-site, to be used by compiled generators in place
+        of ``generic_op``. It is called as ``dispatcher(strategy, model, *args, **kwargs)`` where ``args`` and
+        ``kwargs`` are the arguments passed to the operator at the call-site.
+
+        Compiled generators are shared between all the instances of the strategy class, so the dispatcher
+        must not capture ``self`` and should fall back to ``generic_op`` if called with a strategy of another class.
+
+        Args:
+            op_info (OpInfo): The operator info of the call-site
+            handler (Callable): The handler resolved for the call-site
+
+        Returns:
+            A callable, or None if calls should be routed through ``generic_op``
+
+        """
+        return None
+
     def init(self):
         pass
 
@@ -33,6 +53,27 @@ class Strategy(ABC, OpResolvable):
     def is_finished(self):
         pass
 
+    def accept_run(self) -> bool:
+        """
+        Called after a run finishes successfully, before its result is produced. Returning False discards the
+        result, which can be used to filter out runs such as duplicates.
+        """
+        return True
+
+    def after_run(self, exception: Optional[Exception]):
+        """
+        Called as soon as the generator returns or raises in a run, before ``accept_run``. ``exception`` is
+        the exception raised by the run (including ExceptionAsContinue), or None if the run completed.
+        """
+        pass
+
+    def get_num_op_calls(self) -> int:
+        """
+        Return the number of operator calls made in the current run. Used to enforce budgets on the number
+        of operator calls. Strategies that do not track operator calls return 0.
+        """
+        return 0
+
     def get_known_ops(self):
         return self.known_ops
 
@@ -44,31 +85,86 @@ class Strategy(ABC, OpResolvable):
                    **kwargs):
         pass
 
+    def run_step(self, func: Callable, args, kwargs, atlas_kwargs, hooks: List[Hook],
+                 ignore_exceptions: bool = False) -> Tuple[bool, Any]:
+        """
+        Perform a single run of the generator, notifying the strategy and the hooks of its start and outcome.
+        Every enumeration loop goes through this method, followed by ``finish_step`` once the result is consumed.
+
+        Args:
+            func (Callable): The compiled generator function
+            args: Positional arguments to the generator
+            kwargs: Keyword arguments to the generator
+            atlas_kwargs: The execution environment, strategy, hook and model arguments of the compiled function
+            hooks (List[Hook]): The hooks of the execution environment
+            ignore_exceptions (bool): If False, exceptions other than ExceptionAsContinue are re-raised
+
+        Returns:
+            A tuple (accepted, result). ``accepted`` is False if the run raised or was rejected by ``accept_run``
+
+        """
+        for h in hooks:
+            h.init_run(args, kwargs)
+
+        self.init_run()
+        try:
+            result = func(*args, **kwargs, **atlas_kwargs)
+
+        except ExceptionAsContinue as e:
+            self.after_run(e)
+            for h in hooks:
+                h.after_run(False)
+
+        except Exception as e:
+            self.after_run(e)
+            for h in hooks:
+                h.after_run(False)
+
+            if not ignore_exceptions:
+                raise
+
+        else:
+            self.after_run(None)
+            for h in hooks:
+                h.after_run(True)
+
+            if self.accept_run():
+                return True, result
+
+        return False, None
+
+    def finish_step(self, hooks: List[Hook]):
+        """
+        Finish the run performed by the last call to ``run_step``
+        """
+        self.finish_run()
+        for h in hooks:
+            h.finish_run()
+
     def gen_iterate(self, func: Callable, args, kwargs, atlas_kwargs, hooks: List[Hook], gen: 'Generator',
-                    ignore_exceptions: bool = False):
+                    ignore_exceptions: bool = False, budget_tracker: Optional[BudgetTracker] = None):
         for h in hooks:
             h.init(args, kwargs)
 
+        if budget_tracker is not None:
+            budget_tracker.start()
+
         self.init()
         while not self.is_finished():
-            for h in hooks:
-                h.init_run(args, kwargs)
-
-            self.init_run()
-            try:
-                yield func(*args, **kwargs, **atlas_kwargs)
+            if budget_tracker is not None and budget_tracker.exhausted():
+                break
 
-            except ExceptionAsContinue:
-                pass
+            accepted, result = self.run_step(func, args, kwargs, atlas_kwargs, hooks, ignore_exceptions)
+            if accepted:
+                yield result
 
-            except Exception:
-                if not ignore_exceptions:
-                    raise
+            if budget_tracker is not None:
+                budget_tracker.record_run(self.get_num_op_calls())
 
-            self.finish_run()
+            self.finish_step(hooks)
 
-            for h in hooks:
-                h.finish_run()
+        if budget_tracker is not None:
+            budget_tracker.finish()
 
         self.finish()
 
@@ -93,16 +93,16 @@ class DfConfig(NamedTuple):
 class RandDfStrategy(RandStrategy):
     @operator
     def SelectRange(self, low: int, high: int, **kwargs):
-        return random.randint(low, high)
+        return self.rng.randint(low, high)
 
     @operator
     def CoinToss(self, bias: float = 0.5, **kwargs):
-        return np.random.choice([0, 1], p=[1 - bias, bias])
+        return int(self.rng.random() < bias)
 
     @operator
     def Shuffle(self, domain, **kwargs):
         res = list(domain)
-        random.shuffle(res)
+        self.rng.shuffle(res)
         return res
 
 
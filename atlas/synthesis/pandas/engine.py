@@ -7,7 +7,7 @@ from atlas.synthesis.pandas.strategies import PandasSynthesisStrategy
 from atlas.utils import get_group_by_name
 from atlas.synthesis.pandas.stubs import *
 import atlas.synthesis.pandas.api
-from typing import List, Set
+from typing import Any, List
 
 api_gens = {
     gen.name: gen for gen in get_group_by_name('pandas')
@@ -29,7 +29,9 @@ def sequential_enumerator(inputs, output,
     func_seq: List[str] = Sequence(list(api_gens.keys()), max_len=3, tags=['function_sequence_prediction'])
     func_args = []
     intermediates = []
-    unused_intermediates: Set[int] = set()
+    #  Intermediates not used as arguments so far. Passed as objects rather than ids so that the arguments of
+    #  the API generators only depend on the values of the intermediates, which allows memoizing them
+    unused_intermediates: List[Any] = []
 
     for idx, func in enumerate(func_seq, 1):
         func_gen = api_gens[func]
@@ -43,17 +45,13 @@ def sequential_enumerator(inputs, output,
 
             raise ExceptionAsContinue
 
-        for obj in args.values():
-            unused_intermediates.discard(id(obj))
+        #  Re-created instead of mutated, as the list was passed to the generator
+        unused_intermediates = [i for i in unused_intermediates if all(i is not obj for obj in args.values())]
 
         if (not allow_unused_intermediates) and idx == len(func_seq) and len(unused_intermediates) != 0:
             raise ExceptionAsContinue
 
-        #  Using `id(val)` only works because DfsStrategy (and therefore PandasSynthesisStrategy) caches results
-        #  at the generator call level. Therefore it won't recompute the `val` above. If this is not the case, in the
-        #  subsequent generator runs, the `val` computed above will be a different object than the one in the previous
-        #  run, even though the arguments may be the same.
-        unused_intermediates.add(id(val))
+        unused_intermediates = unused_intermediates + [val]
         intermediates.append(val)
         func_args.append(args)
 
@@ -58,9 +58,12 @@ class PandasSelect(SelectGGNN):
         super().train(encoded_train, encoded_valid, *args, **kwargs)
 
     def infer(self, domain, context: Any = None, op_info: OpInfo = None, **kwargs):
+        return [val for val, prob in self.infer_scored(domain, context=context, op_info=op_info, **kwargs)]
+
+    def infer_scored(self, domain, context: Any = None, op_info: OpInfo = None, **kwargs):
         encoding = self.encoder.get_encoder(self.op_info)(domain, context, mode='inference', op_info=op_info)
         inference = super().infer([encoding])[0]
-        return [val for val, prob in sorted(inference, key=lambda x: -x[1])]
+        return sorted(inference, key=lambda x: -x[1])
 
 
 class PandasSelectFixed(SelectFixedGGNN):
@@ -87,9 +90,12 @@ class PandasSelectFixed(SelectFixedGGNN):
         super().train(encoded_train, encoded_valid, *args, **kwargs)
 
     def infer(self, domain, context: Any = None, op_info: OpInfo = None, **kwargs):
+        return [val for val, prob in self.infer_scored(domain, context=context, op_info=op_info, **kwargs)]
+
+    def infer_scored(self, domain, context: Any = None, op_info: OpInfo = None, **kwargs):
         encoding = self.encoder.get_encoder(self.op_info)(domain, context, mode='inference', op_info=op_info)
         inference = super().infer([encoding])[0]
-        return [val for val, prob in sorted(inference, key=lambda x: -x[1])]
+        return sorted(inference, key=lambda x: -x[1])
 
 
 class PandasSubset(SubsetGGNN):
@@ -115,9 +121,12 @@ class PandasSubset(SubsetGGNN):
         super().train(encoded_train, encoded_valid, *args, **kwargs)
 
     def infer(self, domain, context: Any = None, op_info: OpInfo = None, **kwargs):
+        return [val for val, prob in self.infer_scored(domain, context=context, op_info=op_info, **kwargs)]
+
+    def infer_scored(self, domain, context: Any = None, op_info: OpInfo = None, **kwargs):
         encoding = self.encoder.get_encoder(self.op_info)(domain, context, mode='inference', op_info=op_info)
         inference = super().infer([encoding], top_k=100)[0]
-        return [val for val, prob in sorted(inference, key=lambda x: -x[1])]
+        return sorted(inference, key=lambda x: -x[1])
 
 
 class PandasOrderedSubset(OrderedSubsetGGNN):
@@ -143,9 +152,12 @@ class PandasOrderedSubset(OrderedSubsetGGNN):
         super().train(encoded_train, encoded_valid, *args, **kwargs)
 
     def infer(self, domain, context: Any = None, op_info: OpInfo = None, **kwargs):
+        return [val for val, prob in self.infer_scored(domain, context=context, op_info=op_info, **kwargs)]
+
+    def infer_scored(self, domain, context: Any = None, op_info: OpInfo = None, **kwargs):
         encoding = self.encoder.get_encoder(self.op_info)(domain, context, mode='inference', op_info=op_info)
         inference = super().infer([encoding], top_k=100)[0]
-        return [val for val, prob in sorted(inference, key=lambda x: -x[1])]
+        return sorted(inference, key=lambda x: -x[1])
 
 
 class PandasFuncSequence(SequenceFixedGGNN):
@@ -173,9 +185,12 @@ class PandasFuncSequence(SequenceFixedGGNN):
         super().train(encoded_train, encoded_valid, *args, **kwargs)
 
     def infer(self, domain, context: Any = None, op_info: OpInfo = None, **kwargs):
+        return [val for val, prob in self.infer_scored(domain, context=context, op_info=op_info, **kwargs)]
+
+    def infer_scored(self, domain, context: Any = None, op_info: OpInfo = None, **kwargs):
         encoding = self.encoder.get_encoder(self.op_info)(domain, context, mode='inference', op_info=op_info)
         inference = super().infer([encoding], top_k=100)[0]
-        return [val for val, prob in sorted(inference, key=lambda x: -x[1])]
+        return sorted(inference, key=lambda x: -x[1])
 
 
 class PandasModelBasic(IndependentOperatorsModel):
@@ -21,13 +21,14 @@ class PandasSynthesisStrategy(DfsStrategy):
         if kwargs is None:
             kwargs = {}
 
-        unused_intermediates: Set[int] = kwargs.get('unused_intermediates', None)
+        unused_intermediates: Optional[List[Any]] = kwargs.get('unused_intermediates', None)
         if unused_intermediates is not None:
+            unused_ids: Set[int] = {id(i) for i in unused_intermediates}
             #  Try to yield from these first
             yield from (i for i in domain
-                        if id(i) in unused_intermediates and isinstance(i, dtype) and all(p(i) for p in preds))
+                        if id(i) in unused_ids and isinstance(i, dtype) and all(p(i) for p in preds))
             yield from (i for i in domain
-                        if (id(i) not in unused_intermediates) and isinstance(i, dtype) and all(p(i) for p in preds))
+                        if (id(i) not in unused_ids) and isinstance(i, dtype) and all(p(i) for p in preds))
 
         else:
             yield from (i for i in domain if isinstance(i, dtype))
@@ -154,7 +155,7 @@ class PandasSequentialDataGenerationStrategy(DfsStrategy):
         if kwargs is None:
             kwargs = {}
 
-        unused_intermediates: Set[int] = kwargs.get('unused_intermediates', {})
+        unused_intermediates: Set[int] = {id(i) for i in kwargs.get('unused_intermediates', [])}
         unused_domain = [i for i in domain
                          if id(i) in unused_intermediates and isinstance(i, dtype) and all(p(i) for p in preds)]
         used_domain = [i for i in domain
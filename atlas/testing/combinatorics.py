@@ -0,0 +1,42 @@
+import itertools
+import unittest
+
+from atlas.utils.combinatorics import Combinations, Permutations, Sequences, CartesianProduct
+
+
+class TestCombinatorialDomains(unittest.TestCase):
+    def check_domain(self, domain, expected):
+        self.assertEqual(len(domain), len(expected))
+        self.assertEqual(list(domain), expected)
+        self.assertEqual([domain[k] for k in range(len(domain))], expected)
+        self.assertEqual(domain[-1], expected[-1])
+        for start in range(len(expected) + 1):
+            self.assertEqual(list(domain.iterate(start)), expected[start:])
+
+        self.assertEqual(list(domain[3:17:2]), expected[3:17:2])
+        self.assertEqual(list(domain[2:][1:5]), expected[2:][1:5])
+        self.assertRaises(IndexError, lambda: domain[len(expected)])
+
+    def test_combinations(self):
+        for lengths in [[0, 1, 2, 3], [2], [5, 3, 7]]:
+            self.check_domain(Combinations("abcde", lengths),
+                              [c for l in lengths for c in itertools.combinations("abcde", l)])
+
+    def test_permutations(self):
+        for lengths in [[0, 1, 2, 3], [2], [5, 3, 7]]:
+            self.check_domain(Permutations("abcde", lengths),
+                              [c for l in lengths for c in itertools.permutations("abcde", l)])
+
+    def test_sequences(self):
+        for lengths in [[0, 1, 2, 3], [2], [3, 1]]:
+            self.check_domain(Sequences("abcd", lengths),
+                              [c for l in lengths for c in itertools.product("abcd", repeat=l)])
+
+        domain = Sequences(range(133), range(1, 4))
+        self.assertEqual(len(domain), 133 + 133 ** 2 + 133 ** 3)
+        self.assertEqual(domain[133 + 133 ** 2 + 5], (0, 0, 5))
+
+    def test_cartesian_product(self):
+        self.check_domain(CartesianProduct([[1, 2, 3], "xy", [7, 8]]),
+                          list(itertools.product([1, 2, 3], "xy", [7, 8])))
+        self.assertEqual(list(CartesianProduct([[1, 2], [], [3]])), [])
@@ -1,12 +1,31 @@
+import copy
+import gc
 import itertools
+import json
+import os
+import pickle
+import tempfile
+import threading
+import types
 import unittest
+import warnings
+import weakref
 from typing import Any
+from unittest import mock
+
+import cloudpickle
 
 from atlas import generator
+from atlas.budget import Budget, StopReason
 from atlas.exceptions import ExceptionAsContinue
+from atlas.generators import CompilationCache, compile_func
+from atlas.hooks import Hook
+from atlas.memo import MemoCache
 from atlas.models import GeneratorModel
 from atlas.operators import operator, method, OpInfo
-from atlas.strategies import DfsStrategy
+from atlas.profiling import ProfilingHook
+from atlas.strategies import DfsStrategy, RandStrategy, UniqueRandStrategy
+from atlas.tracing import TraceStore, TraceTrie, GeneratorTrace, OpTrace
 from atlas.utils.stubs import stub
 from atlas.warnings import PerformanceWarning
 from atlas.wrappers import CallGenerator
@@ -17,6 +36,16 @@ def Select(*args, **kwargs):
     pass
 
 
+@stub
+def Subset(*args, **kwargs):
+    pass
+
+
+@stub
+def Sequence(*args, **kwargs):
+    pass
+
+
 @stub
 def SelectReversed(*args, **kwargs):
     pass
@@ -27,6 +56,16 @@ def SomeRandomMethod(*args, **kwargs):
     pass
 
 
+class OffsetGenerators:
+    #  Defined at module level so that instances can be pickled
+    def __init__(self, offset: int):
+        self.o = offset
+
+    @generator(strategy='dfs')
+    def g(self):
+        return Select([1, 2]) + self.o
+
+
 class TestBasicGeneratorFunctionality(unittest.TestCase):
     def test_gen_single_1(self):
         @generator(strategy='dfs')
@@ -295,6 +334,301 @@ class TestBasicGeneratorFunctionality(unittest.TestCase):
                               r"which may incur a performance penalty.",
                               upper_bit.call)
 
+    def test_gen_composition_runtime_env_1(self):
+        """ Runtime compositional calls should find the environment that is executing, even when interleaved """
+        class ReversedDFS(DfsStrategy):
+            @operator
+            def Select(self, domain, *args, **kwargs):
+                yield from reversed(domain)
+
+        @generator
+        def upper_bit():
+            dummy = lower_bit
+            return Select(["0", "1"]) + dummy()
+
+        @generator
+        def lower_bit():
+            return Select(["0", "1"])
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", PerformanceWarning)
+            results = list(zip(upper_bit.generate(), upper_bit.with_env(strategy=ReversedDFS()).generate()))
+
+        self.assertEqual(results, list(zip(["00", "01", "10", "11"], ["11", "10", "01", "00"])))
+
+    def test_gen_composition_runtime_env_2(self):
+        @generator
+        def upper_bit():
+            dummy = lower_bit
+            return Select(["0", "1"]) + dummy()
+
+        @generator
+        def lower_bit():
+            return Select(["0", "1"])
+
+        results = {}
+
+        def run(idx: int):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", PerformanceWarning)
+                results[idx] = list(upper_bit.with_env(strategy=DfsStrategy()).generate())
+
+        threads = [threading.Thread(target=run, args=(idx,)) for idx in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, {idx: ["00", "01", "10", "11"] for idx in range(4)})
+
+    def test_parallel_dfs_1(self):
+        @generator(strategy='dfs')
+        def triples(length: int):
+            a = Select(range(length))
+            b = Select(range(a, length))
+            if a == b:
+                raise ExceptionAsContinue
+            return a, b, Select(["x", "y"])
+
+        expected = list(triples.generate(4))
+        for split_depth in [1, 2, 5]:
+            self.assertEqual(expected, list(triples.with_env(workers=2, split_depth=split_depth).generate(4)))
+
+        unordered = list(triples.with_env(workers=2, split_depth=2, ordered=False).generate(4))
+        self.assertEqual(sorted(expected), sorted(unordered))
+
+    def test_resume_dfs_1(self):
+        @generator(strategy='dfs', caching=True)
+        def bit():
+            return Select(["0", "1"])
+
+        @generator(strategy='dfs')
+        def bits(length: int):
+            s = "".join(bit() for _ in range(Select(range(1, length + 1))))
+            if s.endswith("10"):
+                raise ExceptionAsContinue
+            return s
+
+        expected = list(bits.generate(3))
+        env = bits.with_env()
+        for idx, result in enumerate(env.generate(3)):
+            self.assertEqual(expected[idx], result)
+            checkpoint = json.loads(json.dumps(env.get_checkpoint()))
+            self.assertEqual(expected[idx + 1:], list(bits.generate(3, resume_from=checkpoint)))
+
+        self.assertEqual([], list(bits.generate(3, resume_from=env.get_checkpoint())))
+
+    def test_resume_dfs_2(self):
+        @generator(strategy='randomized')
+        def binary():
+            return Select([0, 1])
+
+        self.assertRaises(ValueError, lambda: list(binary.generate(resume_from=(0,))))
+
+    def test_budget_1(self):
+        @generator(strategy='dfs')
+        def binary(length: int):
+            return "".join(Select(["0", "1"]) for _ in range(length))
+
+        env = binary.with_env(budget=Budget(max_runs=3))
+        self.assertEqual(list(env.generate(3)), ["000", "001", "010"])
+        self.assertEqual(env.summary.stop_reason, StopReason.MAX_RUNS)
+        self.assertEqual(env.summary.num_runs, 3)
+        self.assertEqual(env.summary.num_op_calls, 9)
+
+        self.assertEqual(len(list(env.generate(3, budget=Budget(max_op_calls=10)))), 4)
+        self.assertEqual(env.summary.stop_reason, StopReason.MAX_OP_CALLS)
+
+        self.assertEqual(len(list(env.generate(3, budget=Budget(max_runs=100)))), 8)
+        self.assertEqual(env.summary.stop_reason, StopReason.FINISHED)
+
+    def test_budget_2(self):
+        @generator(strategy='randomized')
+        def binary(length: int):
+            return "".join(Select(["0", "1"]) for _ in range(length))
+
+        env = binary.with_env(budget=Budget(time_limit=0.05))
+        self.assertGreater(len(list(env.generate(3))), 0)
+        self.assertEqual(env.summary.stop_reason, StopReason.TIME_LIMIT)
+        self.assertEqual(env.summary.num_op_calls, 3 * env.summary.num_runs)
+
+        env = binary.with_env(budget=Budget(max_rss=1))
+        self.assertEqual(list(env.generate(3)), [])
+        self.assertEqual(env.summary.stop_reason, StopReason.MAX_RSS)
+        self.assertGreater(env.summary.rss, 0)
+
+    def test_estimate_search_space_1(self):
+        @generator(strategy='dfs')
+        def binary(length: int):
+            return "".join(Select(["0", "1"]) for _ in range(length))
+
+        estimate = binary.estimate_search_space(5, num_probes=10)
+        self.assertEqual(estimate.num_executions, 32)
+        self.assertEqual(estimate.num_executions_interval, (32, 32))
+        self.assertEqual(estimate.num_op_calls, 5 * 32)
+        self.assertEqual(estimate.num_probes, 10)
+
+    def test_estimate_search_space_2(self):
+        @generator(strategy='dfs')
+        def subsets(n: int):
+            k = Select(range(1, n + 1))
+            return Subset(list(range(k)))
+
+        expected = len(list(subsets.generate(4)))
+        estimate = subsets.estimate_search_space(4, num_probes=2000, strategy=RandStrategy(seed=0))
+
+        low, high = estimate.num_executions_interval
+        self.assertLessEqual(low, expected)
+        self.assertGreaterEqual(high, expected)
+
+    def test_estimate_search_space_3(self):
+        @generator(strategy='dfs')
+        def dead_ends(n: int):
+            a = Select(range(n))
+            b = Select(list(range(a)))
+            return a, b, Subset(list(range(a - 1))), Sequence(list(range(a - 1)), max_len=2)
+
+        #  Probes reaching an empty domain are dead ends, which DFS explores as runs as well
+        strategy = DfsStrategy()
+        self.assertEqual(len(list(dead_ends.with_env(strategy=strategy).generate(4))), 58)
+        self.assertEqual(strategy.get_statistics().num_runs, 60)
+
+        estimate = dead_ends.estimate_search_space(4, num_probes=4000, strategy=RandStrategy(seed=1))
+        low, high = estimate.num_executions_interval
+        self.assertLessEqual(low, 60)
+        self.assertGreaterEqual(high, 60)
+
+    def test_sample_1(self):
+        @generator(strategy='randomized')
+        def binary(length: int):
+            s = "".join(Select(["0", "1"]) for _ in range(length))
+            if s == "000":
+                raise ExceptionAsContinue
+            return s
+
+        samples = binary.sample(200, (3,), seed=0)
+        self.assertLessEqual(len(samples), 200)
+        self.assertGreater(len(samples), 100)
+        self.assertNotIn("000", samples)
+        self.assertEqual(samples, binary.sample(200, (3,), seed=0))
+
+        traced = binary.sample(10, (3,), seed=0, tracing=True)
+        self.assertEqual([s for s, _ in traced], samples[:len(traced)])
+        self.assertEqual(len(traced[0][1].op_traces), 3)
+
+    def test_sample_2(self):
+        @generator(strategy='randomized')
+        def binary(length: int):
+            return "".join(Select(["0", "1"]) for _ in range(length))
+
+        samples = binary.sample(100, (8,), seed=1, workers=2)
+        self.assertEqual(len(samples), 100)
+        self.assertEqual(samples, binary.sample(100, (8,), seed=1, workers=2))
+        #  The workers use independent random streams
+        self.assertNotEqual(samples[:50], samples[50:])
+
+    def test_sample_3(self):
+        @generator(strategy='randomized')
+        def offset(seed: int, workers: int = 0):
+            return seed + workers + Select([0, 1])
+
+        #  Inputs named like the options of ``sample`` are passed through ``kwargs``
+        samples = offset.sample(50, kwargs={'seed': 10, 'workers': 5}, seed=0)
+        self.assertEqual(len(samples), 50)
+        self.assertEqual(set(samples), {15, 16})
+
+    def test_memoize_1(self):
+        calls = []
+
+        @generator(memoize=True)
+        def pair(n: int):
+            a = Select(range(n))
+            b = Select(range(a, n))
+            calls.append((a, b))
+            return a, b
+
+        @generator(strategy='dfs')
+        def outer(n: int):
+            return Select(["x", "y", "z"]), pair(n)
+
+        expected = [(c, (a, b)) for c in "xyz" for a in range(3) for b in range(a, 3)]
+        env = outer.with_env(memo=MemoCache())
+        self.assertEqual(list(env.generate(3)), expected)
+        #  Only the executions for "x" run the body of ``pair``
+        self.assertEqual(len(calls), 6)
+        self.assertEqual(env.memo.hits, 12)
+        self.assertEqual(env.memo.num_entries, 6)
+
+        #  Every environment uses a new cache by default
+        calls.clear()
+        self.assertEqual(list(outer.generate(3)), expected)
+        self.assertEqual(len(calls), 6)
+
+    def test_memoize_2(self):
+        calls = []
+
+        @generator(memoize=True)
+        def odd(n: int):
+            calls.append(n)
+            if n % 2 == 0:
+                raise ExceptionAsContinue
+
+            return n
+
+        @generator(strategy='dfs')
+        def outer():
+            Select([1, 2])
+            return odd(Select(range(4)))
+
+        memo = MemoCache(max_entries=2)
+        self.assertEqual(list(outer.with_env(memo=memo).generate()), [1, 3, 1, 3])
+        #  Both the results and the exceptions count as entries
+        self.assertLessEqual(memo.num_entries, 2)
+        self.assertGreater(memo.evictions, 0)
+        self.assertEqual(len(calls), 8)
+
+        calls.clear()
+        memo = MemoCache()
+        self.assertEqual(list(outer.with_env(memo=memo).generate()), [1, 3, 1, 3])
+        self.assertEqual(calls, [0, 1, 2, 3])
+        self.assertEqual(memo.hits, 4)
+
+    def test_memoize_3(self):
+        import numpy as np
+        calls = []
+
+        class Opaque:
+            __hash__ = None
+            nbytes = 10 ** 6
+
+        opaque = Opaque()
+
+        @generator(memoize=True)
+        def total(arr, extra):
+            calls.append(arr)
+            return int(arr.sum()) + Select([0, 1])
+
+        @generator(strategy='dfs')
+        def outer():
+            #  Equal arrays built through different paths share an entry
+            arr = np.arange(Select([3, 4])) if Select([True, False]) else np.arange(3)
+            return total(arr, opaque)
+
+        memo = MemoCache()
+        self.assertEqual(list(outer.with_env(memo=memo).generate()), [3, 4, 6, 7, 3, 4])
+        self.assertEqual(memo.misses, 4)
+        self.assertEqual(memo.hits, 2)
+        self.assertEqual(len(calls), 4)
+        #  Values that cannot be fingerprinted are held by identity, and count towards the size
+        self.assertGreater(memo.num_bytes, 10 ** 6)
+
+    def test_parallel_dfs_2(self):
+        @generator(strategy='randomized')
+        def binary():
+            return Select([0, 1])
+
+        self.assertRaises(ValueError, binary.with_env, workers=2)
+
     def test_gen_composition_with_wrapper(self):
         @generator
         def upper_bit():
@@ -329,6 +663,164 @@ class TestBasicGeneratorFunctionality(unittest.TestCase):
 
         self.assertEqual([i[0] for i in list(binary.with_env(tracing=True).generate(2))], ["00", "01", "10", "11"])
 
+    def test_gen_hooks_dispatch_1(self):
+        events = []
+
+        class BeforeHook(Hook):
+            def before_op(self, domain=None, context=None, op_info=None, **kwargs):
+                events.append(("before", domain, context))
+
+        class AfterHook(Hook):
+            def after_op(self, domain=None, context=None, op_info=None, retval=None, **kwargs):
+                events.append(("after", domain, retval))
+
+        @generator(strategy='dfs')
+        def pairs():
+            return Select([1, 2]), Select(domain="ab", context=0)
+
+        env = pairs.with_env(hooks=[AfterHook(), Hook(), BeforeHook()])
+        self.assertTrue(env.with_hooks)
+        self.assertEqual(list(env.generate()), [(1, "a"), (1, "b"), (2, "a"), (2, "b")])
+        self.assertEqual(events[:4], [("before", [1, 2], None), ("after", [1, 2], 1),
+                                      ("before", "ab", 0), ("after", "ab", "a")])
+        self.assertEqual(len(events), 16)
+
+    def test_gen_hooks_dispatch_2(self):
+        runs = []
+
+        class RunHook(Hook):
+            def init_run(self, f_args, f_kwargs, **kwargs):
+                runs.append(f_args)
+
+        @generator(strategy='dfs', memoize=True)
+        def bit():
+            return Select(["0", "1"])
+
+        @generator(strategy='dfs')
+        def bits(n: int):
+            return "".join(bit() for _ in range(n))
+
+        #  Hooks that do not observe operator calls do not need hook support in the compiled code
+        env = bits.with_env(hooks=[RunHook()])
+        self.assertFalse(env.with_hooks)
+        self.assertIs(env._compiled_func, compile_func(bits, bits.func, env.strategy, False))
+        self.assertEqual(len(list(env.generate(3))), 8)
+        self.assertEqual(runs, [(3,)] * 8)
+        self.assertGreater(env.memo.hits, 0)
+
+    def test_gen_hooks_dispatch_3(self):
+        events = []
+
+        class OpHook(Hook):
+            def after_op(self, domain=None, context=None, op_info=None, retval=None, **kwargs):
+                events.append(retval)
+
+        @generator(strategy='dfs')
+        def bit():
+            return Select(["0", "1"])
+
+        #  Hooks appended after the environment is created take effect in the next enumeration
+        env = bit.with_env()
+        self.assertFalse(env.with_hooks)
+        env.hooks.append(OpHook())
+        self.assertEqual(list(env.generate()), ["0", "1"])
+        self.assertTrue(env.with_hooks)
+        self.assertEqual(events, ["0", "1"])
+
+        #  As do methods assigned on instances
+        hook = Hook()
+        env = bit.with_env(hooks=[hook])
+        self.assertFalse(env.with_hooks)
+        hook.before_op = lambda domain=None, **kwargs: events.append(domain)
+        events.clear()
+        self.assertEqual(env.sample(1, (), {}), ["0"])
+        self.assertEqual(events, [["0", "1"]])
+
+        #  Hook support is dropped again once no hook observes operator calls
+        env.hooks.clear()
+        self.assertEqual(list(env.generate()), ["0", "1"])
+        self.assertFalse(env.with_hooks)
+
+    def test_gen_hooks_dispatch_4(self):
+        events = []
+
+        class RunHook(Hook):
+            def init(self, f_args, f_kwargs, **kwargs):
+                events.append(("init", f_args))
+
+            def init_run(self, f_args, f_kwargs, **kwargs):
+                events.append("init_run")
+
+            def after_run(self, success: bool):
+                events.append(("after_run", success))
+
+            def finish_run(self):
+                events.append("finish_run")
+
+            def finish(self):
+                events.append("finish")
+
+        @generator(strategy='dfs')
+        def odd(n: int):
+            i = Select(range(n))
+            if i % 2 == 0:
+                raise ExceptionAsContinue
+
+            return i
+
+        #  Hooks observing only runs are notified as before, for successful and failed runs alike
+        self.assertEqual(list(odd.with_env(hooks=[RunHook()]).generate(3)), [1])
+        run_events = [["init_run", ("after_run", i % 2 == 1), "finish_run"] for i in range(3)]
+        self.assertEqual(events, [("init", (3,)), *itertools.chain(*run_events), "finish"])
+
+    def test_profiling_hook_1(self):
+        @generator(strategy='dfs')
+        def pairs(n: int):
+            a = Select(range(n), uid="first")
+            try:
+                Select([])
+
+            except ExceptionAsContinue:
+                pass
+
+            b = Select(["x", "y"], uid="second")
+            if a == 0 and b == "x":
+                raise ExceptionAsContinue
+
+            return a, b
+
+        hook = ProfilingHook()
+        self.assertEqual(len(list(pairs.with_env(hooks=[hook]).generate(3))), 5)
+        first, empty, second = (hook.profiles[sid] for sid in sorted(hook.profiles, key=lambda sid: sid[-1]))
+        self.assertEqual((first.num_calls, empty.num_calls, second.num_calls), (6, 6, 6))
+        self.assertEqual((first.get_mean_domain_size(), first.max_domain_size), (3, 3))
+        self.assertEqual((empty.num_raised, second.num_raised), (6, 0))
+        self.assertEqual((second.num_failed_runs, hook.num_failed_runs, hook.num_runs), (1, 1, 6))
+        self.assertTrue(all(p.op_ns > 0 and p.body_ns > 0 for p in (first, second)))
+        self.assertLessEqual(sum(p.op_ns + p.body_ns for p in hook.profiles.values()) + hook.entry_ns, hook.total_ns)
+
+    def test_profiling_hook_2(self):
+        class TestModel(GeneratorModel):
+            def infer(self, domain, context=None, op_info=None, **kwargs):
+                return list(reversed(domain))
+
+        @generator(strategy='dfs')
+        def binary(length: int):
+            return "".join(Select(["0", "1"]) for _ in range(length))
+
+        hook = ProfilingHook()
+        env = binary.with_env(hooks=[hook], model=hook.wrap_model(TestModel()))
+        self.assertEqual(list(env.generate(1)), ["1", "0"])
+        profile, = hook.profiles.values()
+        self.assertGreater(profile.model_ns, 0)
+        self.assertEqual(profile.get_handler_ns(), profile.op_ns - profile.model_ns)
+
+        data = json.loads(hook.to_json())
+        self.assertEqual((data['num_runs'], data['ops'][0]['num_calls']), (2, 2))
+        rows = hook.to_csv().splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(rows[0].startswith("sid,num_calls,"))
+
     def test_gen_replay_basic_1(self):
         @generator(strategy='dfs')
         def binary(length: int):
@@ -364,6 +856,161 @@ class TestBasicGeneratorFunctionality(unittest.TestCase):
         #  Arguments to call omitted
         self.assertEqual([binary.with_env(replay=t).call() for t in traces], list(values))
 
+    def test_trace_store_1(self):
+        @generator(strategy='dfs')
+        def binary(length: int):
+            ctx = {"length": length}
+            s = "".join(Select(["0", "1"], context=ctx) for _ in range(length))
+            if s == "01":
+                raise ExceptionAsContinue
+
+            return s
+
+        store = TraceStore()
+        stored = list(binary.with_env(tracing=store).generate(2))
+        traced = list(binary.with_env(tracing=True).generate(2))
+        self.assertEqual([r for r, _ in stored], ["00", "10", "11"])
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.get_num_op_calls(), 6)
+        for (_, s), (_, t) in zip(stored, traced):
+            self.assertEqual(s.f_inputs, t.f_inputs)
+            self.assertEqual([(o.choice, o.domain, o.context, o.op_info) for o in s.op_traces],
+                             [(o.choice, o.domain, o.context, o.op_info) for o in t.op_traces])
+
+        #  Traces in the store can be replayed
+        self.assertEqual([binary.with_env(replay=t).call() for t in store], ["00", "10", "11"])
+
+    def test_trace_store_2(self):
+        domain = [[i] for i in range(3)]
+
+        @generator(strategy='dfs')
+        def pairs():
+            return Select(domain), Sequence(domain, max_len=2)
+
+        store = TraceStore()
+        results = [r for r, _ in pairs.with_env(tracing=store).generate()]
+        self.assertEqual(len(store), len(results))
+        self.assertEqual([(t.op_traces[0].choice, t.op_traces[1].choice) for t in store], results)
+        #  The domain, context and inputs are stored once, and choices found in the domain are stored as indices
+        self.assertEqual(len(store.op_infos), 2)
+        self.assertEqual(len(store.objects), 4 + len(results))
+        self.assertEqual(sum(c >= 0 for c in store.choice_col), len(results))
+
+        #  Views are pickled as standalone traces
+        trace = pickle.loads(pickle.dumps(store[-1]))
+        self.assertEqual([o.choice for o in trace.op_traces], list(results[-1]))
+
+    def test_trace_trie_1(self):
+        @generator(strategy='dfs')
+        def binary(length: int):
+            s = "".join(Select(["0", "1"]) for _ in range(length))
+            if s == "010":
+                raise ExceptionAsContinue
+
+            return s
+
+        trie = TraceTrie()
+        stored = list(binary.with_env(tracing=trie).generate(3))
+        traced = list(binary.with_env(tracing=True).generate(3))
+        self.assertEqual(len(trie), 7)
+        #  The full binary tree of depth 3 has 14 nodes excluding the root
+        self.assertEqual(trie.num_nodes, 14)
+        for (_, s), (_, t) in zip(stored, traced):
+            self.assertEqual(s.f_inputs, t.f_inputs)
+            self.assertEqual([(o.choice, o.domain, o.op_info) for o in s.op_traces],
+                             [(o.choice, o.domain, o.op_info) for o in t.op_traces])
+
+        self.assertEqual([binary.with_env(replay=t).call() for t in trie], [r for r, _ in stored])
+
+    def test_trace_trie_2(self):
+        @generator(strategy='dfs')
+        def pairs():
+            a = Select([0, 1])
+            return a, Select(["x", "y"]) if a == 0 else Sequence([1, 2], max_len=2)
+
+        trie = TraceTrie()
+        results = [r for r, _ in pairs.with_env(tracing=trie).generate()]
+        self.assertEqual([tuple(o.choice for o in t.op_traces) for t in trie], results)
+        self.assertEqual(trie.num_nodes, 2 + len(results))
+        self.assertIs(trie[0].op_traces[0], trie[1].op_traces[0])
+        self.assertIsNot(trie[0].op_traces[0], trie[-1].op_traces[0])
+
+        trace = pickle.loads(pickle.dumps(trie[-1]))
+        self.assertEqual(tuple(o.choice for o in trace.op_traces), results[-1])
+
+    def test_choice_tracing_1(self):
+        @generator(strategy='dfs')
+        def pick(n: int):
+            return [Select(list(range(3)), context=i) for i in range(n)], Subset(["a", "b"])
+
+        traced = list(pick.with_env(tracing=True).generate(2))
+        choice_traced = list(pick.with_env(tracing='choices').generate(2))
+        self.assertEqual([r for r, _ in choice_traced], [r for r, _ in traced])
+
+        #  Choices found in the domain are stored as indices
+        _, trace = choice_traced[-1]
+        self.assertEqual(list(trace.choice_indices), [2, 2, -1])
+        self.assertEqual(trace.values, {2: ("a", "b")})
+
+        for (_, t), (_, full) in zip(choice_traced, traced):
+            reconstructed = pick.reconstruct_trace(t)
+            self.assertEqual([(o.choice, o.domain, o.context, o.op_info) for o in reconstructed.op_traces],
+                             [(o.choice, o.domain, o.context, o.op_info) for o in full.op_traces])
+
+    def test_choice_tracing_2(self):
+        @generator(strategy='randomized')
+        def binary(length: int):
+            return "".join(Select("01") for _ in range(length))
+
+        samples = binary.sample(20, (4,), seed=0, tracing='choices')
+        self.assertEqual([binary.with_env(replay=t).call() for _, t in samples], [s for s, _ in samples])
+        self.assertRaises(ValueError, binary.with_env, tracing='domains')
+
+    def test_replay_batch_1(self):
+        @generator(strategy='randomized')
+        def binary(length: int):
+            s = "".join(Select(["0", "1"]) for _ in range(length))
+            if s == "000":
+                raise ExceptionAsContinue
+
+            return s
+
+        values, traces = zip(*binary.sample(30, (3,), seed=0, tracing=True))
+        _, choice_traces = zip(*binary.sample(30, (4,), seed=1, tracing='choices'))
+        self.assertEqual(binary.replay_batch(traces, strict=True), list(values))
+        self.assertEqual(binary.replay_batch(choice_traces, strict=True),
+                         [binary.with_env(replay=t).call() for t in choice_traces])
+        #  Replayed runs are not discarded by the backup strategy
+        self.assertEqual(binary.replay_batch(traces, strategy=UniqueRandStrategy(seed=0)), list(values))
+
+        #  Traces of length 3 do not have enough choices for length 4
+        longer = [GeneratorTrace(((4,), {})) for _ in range(2)]
+        for trace, original in zip(longer, traces):
+            trace.op_traces = original.op_traces
+
+        self.assertRaises(KeyError, binary.replay_batch, longer, strict=True)
+        self.assertTrue(all(len(r) == 4 and r.startswith(v) for r, v in zip(binary.replay_batch(longer), values)))
+
+    def test_replay_batch_2(self):
+        @generator(strategy='dfs')
+        def pairs(n: int):
+            a = Select(range(n))
+            if a == 1:
+                raise ExceptionAsContinue
+
+            return a, Select(["x", "y"])
+
+        traced = list(pairs.with_env(tracing=True).generate(3))
+        results, traces = zip(*traced)
+        #  The replay of a trace with a rejected choice fails
+        traces = list(traces) + [GeneratorTrace(((3,), {}))]
+        traces[-1].op_traces = [OpTrace(1, range(3), None, traces[0].op_traces[0].op_info)]
+
+        self.assertEqual(pairs.replay_batch(traces), list(results) + [None])
+        replayed = pairs.replay_batch(traces[:-1], tracing='choices', workers=2)
+        self.assertEqual([r for r, _ in replayed], list(results))
+        self.assertEqual([list(t.choice_indices) for _, t in replayed], [[0, 0], [0, 1], [2, 0], [2, 1]])
+
     def test_gen_replay_with_labels(self):
         @generator(strategy='dfs')
         def binary(length: int):
@@ -397,6 +1044,76 @@ class TestBasicGeneratorFunctionality(unittest.TestCase):
         t = TestClass()
         self.assertEqual(list(t.gen_method1.generate()), [1, 2, 3])
 
+    def test_gen_class_method_3(self):
+        class TestClass:
+            def __init__(self, offset: int):
+                self.offset = offset
+
+            @generator
+            def gen_method1(self):
+                return Select([1, 2, 3]) + self.offset
+
+        t1 = TestClass(0)
+        t2 = TestClass(10)
+        self.assertIs(t1.gen_method1, t1.gen_method1)
+        self.assertEqual(list(t1.gen_method1.generate()), [1, 2, 3])
+        self.assertEqual(list(t2.gen_method1.generate()), [11, 12, 13])
+
+        #  The compiled code is shared between instances
+        cache = CompilationCache.WITHOUT_HOOKS[DfsStrategy]
+        self.assertIn(TestClass.gen_method1.func, cache)
+        self.assertNotIn(t1.gen_method1.func, cache)
+
+        #  Replicas are refreshed if the defaults change
+        class ReversedDFS(DfsStrategy):
+            @operator
+            def Select(self, domain, *args, **kwargs):
+                yield from reversed(domain)
+
+        TestClass.gen_method1.set_default_strategy(ReversedDFS())
+        self.assertEqual(list(t1.gen_method1.generate()), [3, 2, 1])
+
+        #  Replicas do not keep the instances alive
+        t1_ref = weakref.ref(t1)
+        del t1
+        gc.collect()
+        self.assertIsNone(t1_ref())
+
+    def test_gen_class_method_4(self):
+        t1 = OffsetGenerators(0)
+        self.assertEqual(list(t1.g.generate()), [1, 2])
+
+        #  Copies compare equal to nothing but themselves, yet must not reuse the replica bound to the original
+        t2 = copy.copy(t1)
+        t2.o = 100
+        self.assertEqual(list(t2.g.generate()), [101, 102])
+        self.assertEqual(list(t1.g.generate()), [1, 2])
+        self.assertNotIn('g', vars(t1))
+        self.assertEqual(set(vars(t1)), {'o'})
+
+        t3 = pickle.loads(pickle.dumps(t2))
+        self.assertEqual(list(t3.g.generate()), [101, 102])
+        #  Generators are sent to worker processes using cloudpickle
+        replica = cloudpickle.loads(cloudpickle.dumps(t2.g))
+        self.assertEqual(list(replica.generate()), [101, 102])
+
+
+    def test_gen_class_method_5(self):
+        #  Replicas keep temporary instances alive
+        self.assertEqual(OffsetGenerators(5).g.call(), 6)
+        self.assertEqual(list(OffsetGenerators(7).g.generate()), [8, 9])
+
+        #  Replicas are reused while in use, along with their execution environment
+        t = OffsetGenerators(0)
+        replica = t.g
+        self.assertIs(t.g, replica)
+        self.assertIs(replica.get_default_env(), t.g.get_default_env())
+
+        #  The generator does not keep the replica or the instance alive
+        instance_ref = weakref.ref(t)
+        del t, replica
+        gc.collect()
+        self.assertIsNone(instance_ref())
 
 class TestGeneratorCompilation(unittest.TestCase):
     def test_arg_handling_1(self):
@@ -410,6 +1127,159 @@ class TestGeneratorCompilation(unittest.TestCase):
 
         self.assertEqual(list(binary.generate(2, 'dummy')), ["00", "01", "10", "11"])
 
+    def test_composition_resolution_1(self):
+        """ Composition detection should not evaluate the called expressions """
+        factory_calls = []
+
+        def factory():
+            factory_calls.append(1)
+            return lambda x: x
+
+        @generator
+        def bit():
+            return factory()(Select(["0", "1"]))
+
+        compile_func(bit, bit.func, DfsStrategy())
+        self.assertEqual(factory_calls, [])
+        self.assertEqual(list(bit.generate()), ["0", "1"])
+
+    def test_composition_resolution_2(self):
+        module = types.ModuleType("bits")
+
+        @generator
+        def lower_bit():
+            return Select(["0", "1"])
+
+        module.lower_bit = lower_bit
+
+        @generator
+        def upper_bit():
+            return Select(["0", "1"]) + module.lower_bit()
+
+        self.assertEqual(list(upper_bit.generate()), ["00", "01", "10", "11"])
+
+    def test_composition_resolution_3(self):
+        @generator
+        def lower_bit():
+            return Select(["0", "1"])
+
+        class Bits:
+            lower = lower_bit
+
+            @property
+            def evaluated(self):
+                raise AssertionError("Properties should not be evaluated during compilation")
+
+        bits = Bits()
+        offsets = OffsetGenerators(10)
+
+        @generator
+        def upper_bit():
+            return Select(["0", "1"]) + Bits.lower()
+
+        @generator
+        def offset_pair():
+            return Select([0, 100]) + offsets.g()
+
+        @generator
+        def evaluated():
+            return bits.evaluated()
+
+        #  The calls are composed at compile time instead of being discovered at runtime
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", PerformanceWarning)
+            self.assertEqual(list(upper_bit.generate()), ["00", "01", "10", "11"])
+            self.assertEqual(list(offset_pair.generate()), [11, 12, 111, 112])
+
+        compile_func(evaluated, evaluated.func, DfsStrategy())
+
+    def test_lazy_composition_1(self):
+        @generator
+        def lower_bit():
+            return Select(["0", "1"])
+
+        @generator
+        def upper_bit(compose: bool):
+            if compose:
+                return Select(["0", "1"]) + lower_bit()
+
+            return Select(["0", "1"])
+
+        cache = CompilationCache.WITHOUT_HOOKS[DfsStrategy]
+        self.assertEqual(list(upper_bit.generate(False)), ["0", "1"])
+        self.assertIn(upper_bit.func, cache)
+        self.assertNotIn(lower_bit.func, cache)
+
+        self.assertEqual(list(upper_bit.generate(True)), ["00", "01", "10", "11"])
+        self.assertIn(lower_bit.func, cache)
+
+    def test_persistent_cache_1(self):
+        @generator
+        def lower_bit():
+            return Select(["0", "1"])
+
+        @generator
+        def upper_bit():
+            return Select(["0", "1"]) + lower_bit()
+
+        prev_cache_dir = CompilationCache.PERSISTENT_DIR
+        with tempfile.TemporaryDirectory() as cache_dir:
+            CompilationCache.enable_persistence(cache_dir)
+            try:
+                self.assertEqual(list(upper_bit.generate()), ["00", "01", "10", "11"])
+                self.assertEqual(len([f for f in os.listdir(cache_dir) if f.endswith('.atlas')]), 2)
+                self.assertEqual([i[0] for i in upper_bit.with_env(tracing=True).generate()], ["00", "01", "10", "11"])
+                self.assertEqual(len([f for f in os.listdir(cache_dir) if f.endswith('.atlas')]), 4)
+
+                #  A warm start should not require the source code
+                CompilationCache.clear()
+                with mock.patch('atlas.generators.inspect.getsourcelines', side_effect=AssertionError):
+                    self.assertEqual(list(upper_bit.with_env().generate()), ["00", "01", "10", "11"])
+                    self.assertEqual([i[0] for i in upper_bit.with_env(tracing=True).generate()],
+                                     ["00", "01", "10", "11"])
+
+            finally:
+                CompilationCache.PERSISTENT_DIR = prev_cache_dir
+                CompilationCache.clear()
+
+
+    def test_persistent_cache_2(self):
+        def suffix():
+            return "0"
+
+        @generator
+        def bits():
+            return Select(["0", "1"]) + suffix()
+
+        prev_cache_dir = CompilationCache.PERSISTENT_DIR
+        with tempfile.TemporaryDirectory() as cache_dir:
+            CompilationCache.enable_persistence(cache_dir)
+            try:
+                self.assertEqual(list(bits.generate()), ["00", "10"])
+
+                #  The source of ``bits`` is unchanged, but the called name now refers to a generator
+                CompilationCache.clear()
+
+                @generator
+                def suffix():
+                    return Select(["0", "1"])
+
+                #  The call is composed statically instead of being discovered at runtime
+                with warnings.catch_warnings():
+                    warnings.simplefilter("error", PerformanceWarning)
+                    self.assertEqual(list(bits.with_env().generate()), ["00", "01", "10", "11"])
+
+                #  And back to a regular function
+                CompilationCache.clear()
+
+                def suffix():
+                    return "1"
+
+                self.assertEqual(list(bits.with_env().generate()), ["01", "11"])
+
+            finally:
+                CompilationCache.PERSISTENT_DIR = prev_cache_dir
+                CompilationCache.clear()
 
 class TestGeneratorModels(unittest.TestCase):
     def test_model_1(self):
@@ -2,8 +2,10 @@ import itertools
 import unittest
 
 from atlas import generator
+from atlas.exceptions import ExceptionAsContinue
 from atlas.operators import operator
-from atlas.strategies import DfsStrategy
+from atlas.models import GeneratorModel
+from atlas.strategies import DfsStrategy, RandStrategy, BestFirstStrategy, UniqueRandStrategy
 from atlas.utils.stubs import stub
 
 
@@ -144,6 +146,325 @@ class TestBasicStrategyFunctionality(unittest.TestCase):
 
         self.assertRaisesRegex(ValueError, r"Could not resolve \.*", lambda x: list(binary.generate(x)), 2)
 
+    def test_dfs_frontier_1(self):
+        @generator(strategy='dfs', caching=True)
+        def bit():
+            return Select(["0", "1"])
+
+        @generator(strategy=DfsStrategy())
+        def binary(l: int):
+            return "".join(bit() for _ in range(l))
+
+        self.assertEqual(list(binary.generate(3)), ["".join(i) for i in itertools.product("01", repeat=3)])
+        self.assertEqual(binary.strategy.op_iters, [])
+        self.assertEqual(binary.strategy.gen_result_stack, [])
+
+    def test_dfs_frontier_2(self):
+        @generator(strategy='dfs')
+        def skip_empty():
+            try:
+                Select([])
+            except ExceptionAsContinue:
+                pass
+
+            return Select([1, 2])
+
+        self.assertEqual(list(skip_empty.generate()), [1, 2])
+
+    def test_dfs_frontier_3(self):
+        class TestStrategy(DfsStrategy):
+            @operator
+            def Fail(self, domain, context=None, **kwargs):
+                raise ExceptionAsContinue
+
+        @generator(strategy=TestStrategy())
+        def caught(fail_op: bool):
+            a = Select([1, 2])
+            try:
+                b = Fail(None) if fail_op else Select([])
+
+            except ExceptionAsContinue:
+                b = "caught"
+
+            return a, b, Select(["x", "y"])
+
+        expected = [(a, "caught", c) for a in [1, 2] for c in "xy"]
+        #  The operator raising is replayed when backtracking to the operator after it
+        self.assertEqual(list(caught.generate(False)), expected)
+        self.assertEqual(list(caught.generate(True)), expected)
+
+    def test_dfs_equivalence_pruning_1(self):
+        @generator(strategy='dfs', caching=True)
+        def total():
+            return Select([0, 1, 2]) + Select([0, 1, 2])
+
+        @generator(strategy='dfs')
+        def pairs():
+            return total(), Select(["x", "y"])
+
+        strategy = DfsStrategy(prune_equivalent=True)
+        results = list(pairs.with_env(strategy=strategy).generate())
+        self.assertEqual(results, [(s, c) for s in range(5) for c in "xy"])
+        self.assertEqual(strategy.num_pruned, 4)
+        self.assertEqual(len(list(pairs.generate())), 18)
+
+    def test_dfs_equivalence_pruning_2(self):
+        import numpy as np
+
+        @generator(strategy='dfs', caching=True)
+        def array():
+            shape = Select([(2, 2), (4,), (2, 2)])
+            return np.zeros(shape), shape
+
+        @generator(strategy='dfs')
+        def arrays():
+            return [array() for _ in range(2)]
+
+        strategy = DfsStrategy(prune_equivalent=True, equivalence_key=lambda result: result[0])
+        self.assertEqual([[a.shape for a, _ in r] for r in arrays.with_env(strategy=strategy).generate()],
+                         [[(2, 2), (2, 2)], [(2, 2), (4,)], [(4,), (2, 2)], [(4,), (4,)]])
+
+        #  Custom hashers take precedence over the defaults
+        strategy = DfsStrategy(prune_equivalent=True, equivalence_key=lambda result: result[0],
+                               hashers={np.ndarray: lambda value, hasher: value.size})
+        self.assertEqual(len(list(arrays.with_env(strategy=strategy).generate())), 1)
+
+    def test_dfs_statistics_1(self):
+        @generator(strategy='dfs')
+        def pairs():
+            a = Select([1, 2, 3])
+            return a, Select([] if a == 2 else ["x", "y"])
+
+        strategy = DfsStrategy()
+        results = pairs.with_env(strategy=strategy).generate()
+        self.assertEqual(next(results), (1, "x"))
+        #  Statistics are updated while enumerating
+        self.assertEqual(strategy.get_statistics().num_completed_runs, 1)
+        self.assertEqual(list(results), [(1, "y"), (3, "x"), (3, "y")])
+
+        stats = strategy.get_statistics()
+        self.assertEqual((stats.num_runs, stats.num_completed_runs, stats.num_aborted_runs), (5, 4, 1))
+        self.assertEqual(stats.backtracks_per_depth, [2, 2])
+        self.assertEqual(stats.max_frontier_depth, 2)
+        self.assertEqual(stats.num_op_calls, 10)
+
+        strategy.reset_statistics()
+        self.assertEqual(strategy.get_statistics().num_runs, 0)
+        self.assertEqual(len(list(pairs.with_env(strategy=strategy).generate())), 4)
+        self.assertEqual(strategy.get_statistics().num_runs, 5)
+
+    def test_dfs_statistics_2(self):
+        @generator(strategy='dfs', caching=True)
+        def bit():
+            return Select(["0", "1"])
+
+        @generator(strategy='dfs')
+        def bits():
+            return bit() + bit() + Select("ab")
+
+        class ReversedModel(GeneratorModel):
+            def infer(self, domain, context=None, op_info=None, **kwargs):
+                return list(domain)[::-1]
+
+        strategy = DfsStrategy()
+        self.assertEqual(len(list(bits.with_env(strategy=strategy, model=ReversedModel()).generate())), 8)
+        stats = strategy.get_statistics().as_dict()
+        self.assertEqual(stats['backtracks_per_depth'], [1, 2, 4])
+        self.assertEqual((stats['gen_cache_hits'], stats['gen_cache_misses']), (10, 6))
+        #  The model is called once for every operator iterator created
+        self.assertEqual(stats['num_model_calls'], 7)
+
+    def test_dfs_combinatorial_1(self):
+        @generator(strategy='dfs')
+        def sequences():
+            return Sequence(range(133), max_len=3)
+
+        size = 133 + 133 ** 2 + 133 ** 3
+        self.assertEqual(list(sequences.generate(resume_from=(size - 3,))), [(132, 132, 131), (132, 132, 132)])
+
+    def test_op_dispatcher_1(self):
+        class TestStrategy(RandStrategy):
+            @operator
+            def Select(self, domain, **kwargs):
+                return domain[-1]
+
+        @generator(strategy=TestStrategy())
+        def binary(l: int):
+            s = ""
+            for i in range(l):
+                s += Select(["0", "1"], uid="bit")
+
+            return s
+
+        self.assertIsNotNone(TestStrategy().get_op_dispatcher(None, TestStrategy.Select))
+        self.assertEqual(binary.call(2), "11")
+        self.assertEqual(binary.with_env(replay={"bit": ["0", "0"]}).call(2), "00")
+
+    def test_op_dispatcher_2(self):
+        class TestStrategy(RandStrategy):
+            def generic_op(self, domain=None, context=None, op_info=None, handler=None, **kwargs):
+                return domain[0]
+
+        @generator(strategy=TestStrategy())
+        def binary(l: int):
+            s = ""
+            for i in range(l):
+                s += Select(["0", "1"])
+
+            return s
+
+        self.assertIsNone(TestStrategy().get_op_dispatcher(None, RandStrategy.Select))
+        self.assertEqual(binary.call(2), "00")
+
+    def test_best_first_1(self):
+        @generator(strategy=BestFirstStrategy())
+        def triples(length: int):
+            a = Select(range(length))
+            b = Select(range(a, length))
+            if a == b:
+                raise ExceptionAsContinue
+            return a, b, Select(["x", "y"])
+
+        self.assertEqual(list(triples.generate(4)), list(triples.with_env(strategy='dfs').generate(4)))
+
+    def test_best_first_2(self):
+        class TestModel(GeneratorModel):
+            def infer(self, domain, context=None, op_info=None, **kwargs):
+                return [val for val, prob in self.infer_scored(domain, context=context, op_info=op_info)]
+
+            def infer_scored(self, domain, context=None, op_info=None, **kwargs):
+                #  Strongly prefers '1' for the first bit, and '0' for the rest
+                if context == 0:
+                    return [("1", 0.9), ("0", 0.1)]
+
+                if context == 1:
+                    return [("0", 0.8), ("1", 0.2)]
+
+                return [("0", 0.6), ("1", 0.4)]
+
+        @generator(strategy=BestFirstStrategy())
+        def binary(l: int):
+            return "".join(Select(["0", "1"], context=i) for i in range(l))
+
+        results = list(binary.with_env(model=TestModel()).generate(3))
+        self.assertEqual(sorted(results), ["".join(i) for i in itertools.product("01", repeat=3)])
+        #  The partial execution "0" (0.1) is more probable than "111" (0.9 * 0.2 * 0.4)
+        self.assertEqual(results[:4], ["100", "101", "110", "000"])
+
+        results = list(binary.with_env(model=TestModel(), strategy=BestFirstStrategy(max_frontier_size=1)).generate(3))
+        self.assertEqual(results, ["100", "101"])
+
+    def test_best_first_3(self):
+        class ShiftedStrategy(DfsStrategy):
+            def __init__(self, shift: int):
+                super().__init__()
+                self.shift = shift
+
+            @operator
+            def Select(self, domain, context=None, **kwargs):
+                for val in domain:
+                    yield val + self.shift
+
+        @generator(strategy=BestFirstStrategy())
+        def pairs():
+            return Select([0, 1]), Select([0, 1])
+
+        expected = [(0, 0), (0, 1), (1, 0), (1, 1)]
+        self.assertEqual(list(pairs.generate()), expected)
+        #  The operators are compiled for the base strategy, and handled by it
+        shifted = [(a + 10, b + 10) for a, b in expected]
+        self.assertEqual(list(pairs.with_env(strategy=BestFirstStrategy(ShiftedStrategy(10))).generate()), shifted)
+        self.assertEqual(list(pairs.with_env(strategy=BestFirstStrategy()).generate()), expected)
+        self.assertEqual(BestFirstStrategy(ShiftedStrategy(10)).shift, 10)
+
+    def test_randomized_seeding_1(self):
+        @generator(strategy='randomized')
+        def all_ops():
+            domain = list(range(10))
+            return Select(domain), Sequence(domain, max_len=4), Subset(domain), OrderedSubset(domain)
+
+        def run(strategy):
+            return [all_ops.with_env(strategy=strategy).call() for _ in range(20)]
+
+        self.assertEqual(run(RandStrategy(seed=3)), run(RandStrategy(seed=3)))
+        self.assertNotEqual(run(RandStrategy(seed=3)), run(RandStrategy(seed=4)))
+
+        env = all_ops.with_env(strategy=RandStrategy(seed=5))
+        results = [env.call() for _ in range(20)]
+        env = all_ops.with_env(strategy=RandStrategy(seed=5))
+        self.assertEqual(results, [env.call() for _ in range(20)])
+
+    def test_randomized_seeding_2(self):
+        @generator(strategy='randomized')
+        def bits():
+            return "".join(Select("01") for _ in range(16))
+
+        def run(strategy):
+            env = bits.with_env(strategy=strategy)
+            return [env.call() for _ in range(10)]
+
+        streams = [run(s) for s in RandStrategy(seed=7).spawn(3)]
+        self.assertEqual(streams, [run(s) for s in RandStrategy(seed=7).spawn(3)])
+        self.assertEqual(len(set(map(tuple, streams))), 3)
+
+    def test_unique_randomized_1(self):
+        @generator(strategy=UniqueRandStrategy(seed=0, max_consecutive_duplicates=200))
+        def binary(l: int):
+            return "".join(Select(["0", "1"]) for _ in range(l))
+
+        results = list(binary.generate(4))
+        self.assertEqual(sorted(results), ["".join(i) for i in itertools.product("01", repeat=4)])
+        self.assertGreater(binary.strategy.num_duplicates, 0)
+        self.assertEqual(binary.strategy.num_unique, 16)
+        self.assertGreater(binary.strategy.get_duplicate_rate(), 0.0)
+
+    def test_unique_randomized_2(self):
+        strategy = UniqueRandStrategy(seed=0, max_consecutive_duplicates=None, bloom_capacity=1000)
+
+        @generator(strategy=strategy)
+        def pairs():
+            return Select(range(5)), Subset(list(range(3)))
+
+        results = list(itertools.islice(pairs.generate(), 20))
+        self.assertEqual(len(set((a, tuple(b)) for a, b in results)), 20)
+        self.assertEqual(len(strategy.seen), 20)
+
+    def test_unique_randomized_3(self):
+        import pandas as pd
+
+        class TestStrategy(UniqueRandStrategy):
+            @operator
+            def Pair(self, domain, context=None, **kwargs):
+                #  1 and 9 collide in a small set, so the iteration order depends on the insertion order
+                return set(self.rng.sample(domain, 2))
+
+        @generator(strategy=TestStrategy(seed=0, max_consecutive_duplicates=100))
+        def pairs():
+            return Pair([1, 9]), Select(["x", "y"])
+
+        #  Equal values are duplicates even if they are not equal byte-wise when serialized
+        self.assertEqual(sorted(r[1] for r in pairs.generate()), ["x", "y"])
+
+        #  Values are recorded as 128-bit digests of their fingerprints, which do not depend on the hash seed
+        strategy = TestStrategy(seed=0)
+        strategy.init_run()
+        strategy.generic_op(["b", "a"], handler=lambda s, domain, **kwargs: frozenset(domain))
+        recorded = strategy.choices[-1]
+        strategy.generic_op(["a", "b"], handler=lambda s, domain, **kwargs: frozenset(domain))
+        self.assertEqual(strategy.choices[-1], recorded)
+        self.assertEqual(recorded[0], 'value')
+        self.assertEqual(len(recorded[1]), 16)
+
+        frames = [pd.DataFrame({"a": [i]}) for i in range(3)]
+
+        @generator(strategy=UniqueRandStrategy(seed=0, max_consecutive_duplicates=100))
+        def frame_pairs():
+            return Select(frames)["a"][0], Subset(frames, lengths=[2])
+
+        #  Data-frames are distinguished by their position in the domain
+        results = [(a, sorted(f["a"][0] for f in b)) for a, b in frame_pairs.generate()]
+        self.assertEqual(sorted(results), [(a, b) for a in range(3) for b in [[0, 1], [0, 2], [1, 2]]])
+
     def test_randomized_operators(self):
         @generator(strategy='randomized')
         def all_ops():
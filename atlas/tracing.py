@@ -1,11 +1,15 @@
+import collections
 import textwrap
-from typing import List, Optional, Any
+from array import array
+from typing import List, Optional, Any, Dict, Tuple, NamedTuple, Union
 
 from atlas.hooks import Hook
 from atlas.operators import OpInfo
 
 
 class OpTrace:
+    __slots__ = ('choice', 'domain', 'context', 'op_info', 'kwargs')
+
     def __init__(self, choice, domain, context, op_info: OpInfo, **kwargs):
         self.choice = choice
         self.domain = domain
@@ -23,6 +27,14 @@ class OpTrace:
                 **{self.kwargs!r}
                )""")
 
+    def __setstate__(self, state):
+        #  Traces pickled before OpTrace used slots have their attributes in a dict instead of a slots dict
+        if isinstance(state, tuple):
+            state = state[1]
+
+        for k, v in state.items():
+            setattr(self, k, v)
+
     def copy(self):
         return OpTrace(
             choice=self.choice,
@@ -55,6 +67,393 @@ class GeneratorTrace:
         return r
 
 
+#  Choices of these types are looked up in list and tuple domains by equality in addition to identity
+_SCALAR_TYPES = (int, float, str, bool, bytes, type(None))
+
+
+def _find_choice(domain: Any, choice: Any) -> int:
+    t = type(domain)
+    if t is list or t is tuple:
+        for i, v in enumerate(domain):
+            if v is choice:
+                return i
+
+        if type(choice) in _SCALAR_TYPES:
+            choice_type = type(choice)
+            for i, v in enumerate(domain):
+                if type(v) is choice_type and v == choice:
+                    return i
+
+    elif t is range:
+        if type(choice) is int and choice in domain:
+            return domain.index(choice)
+
+    elif t is str:
+        if type(choice) is str and len(choice) == 1:
+            return domain.find(choice)
+
+    return -1
+
+
+class DomainIndex(NamedTuple):
+    """
+    Stands for the element at ``index`` in the domain of an operator, in the choices replayed from a ``ChoiceTrace``
+    """
+    index: int
+
+
+class ChoiceTrace:
+    """
+    A trace recording only the operators called and the choices they made, without domains or contexts.
+    Choices are stored as their index in the domain where possible (see ``TraceStore``), and by value otherwise.
+    Like ``GeneratorTrace``, it can be used for replay, and the full trace can be reconstructed on demand
+    using ``Generator.reconstruct_trace``.
+    """
+    __slots__ = ('f_inputs', 'op_infos', 'choice_indices', 'values')
+
+    def __init__(self, f_inputs=None):
+        self.f_inputs = f_inputs
+        self.op_infos: List[OpInfo] = []
+        #  Index of the choice in the domain, or -1 if the choice is stored in ``values``
+        self.choice_indices = array('q')
+        #  Maps positions in the trace to choices that could not be located in the domain
+        self.values: Dict[int, Any] = {}
+
+    def __len__(self):
+        return len(self.op_infos)
+
+    def __repr__(self):
+        return f"ChoiceTrace(inputs={self.f_inputs}, sids={[o.sid for o in self.op_infos]})"
+
+    def record_choice(self, op_info: OpInfo, domain: Any, choice: Any):
+        choice_idx = _find_choice(domain, choice)
+        if choice_idx < 0:
+            self.values[len(self.op_infos)] = choice
+
+        self.op_infos.append(op_info)
+        self.choice_indices.append(choice_idx)
+
+    def get_choice(self, t: int) -> Any:
+        """
+        Return the choice made by the operator call at position ``t``, as a ``DomainIndex`` if it was stored
+        as an index into the domain
+        """
+        choice_idx = self.choice_indices[t]
+        return DomainIndex(choice_idx) if choice_idx >= 0 else self.values[t]
+
+    def get_op_choices(self) -> Dict[str, List[Any]]:
+        """
+        Return a mapping from the sids of the operators to the choices they made, in order
+        """
+        op_choices = collections.defaultdict(list)
+        for t, op_info in enumerate(self.op_infos):
+            op_choices[op_info.sid].append(self.get_choice(t))
+
+        return op_choices
+
+
+class TraceStore:
+    """
+    Columnar storage for generator traces, which keeps the memory used per traced operator call small and
+    constant. Instead of an ``OpTrace`` object per operator call, the store keeps a few integer columns:
+    the index of the ``OpInfo`` (interned), the indices of the domain, context and keyword arguments in
+    tables of objects deduplicated by identity, and the index of the choice in the domain. Choices that
+    cannot be located in the domain cheaply are stored in the object table as well.
+
+    Traces are accessed as ``StoredTrace`` views, which create the ``OpTrace`` objects on demand.
+    The store keeps every recorded domain and context alive, so they must not be mutated afterwards.
+
+    A store is used for tracing by passing it as ``tracing`` to ``Generator.with_env``.
+    """
+
+    def __init__(self):
+        self.op_infos: List[OpInfo] = []
+        self.objects: List[Any] = []
+        self.kwargs_table: List[Dict[str, Any]] = []
+        self._op_info_ids: Dict[OpInfo, int] = {}
+        self._object_ids: Dict[int, int] = {}
+        self._kwargs_ids: Dict[Tuple, int] = {}
+
+        #  One entry per operator call. Choices are stored as the index in the domain if non-negative,
+        #  and as ``-(index in the object table) - 1`` otherwise
+        self.op_info_col = array('q')
+        self.domain_col = array('q')
+        self.context_col = array('q')
+        self.kwargs_col = array('q')
+        self.choice_col = array('q')
+
+        #  One entry per trace. The operator calls of trace ``i`` start at ``trace_starts[i]``
+        self.trace_starts = array('q')
+        self.trace_args = array('q')
+        self.trace_kwargs = array('q')
+
+        #  The trace being recorded, if it has not been committed yet, as the number of objects
+        #  and keyword arguments interned before it started
+        self._pending: Optional[Tuple[int, int]] = None
+
+    def __len__(self):
+        return len(self.trace_starts) - (self._pending is not None)
+
+    def __getitem__(self, index: int) -> 'StoredTrace':
+        num_traces = len(self)
+        if index < 0:
+            index += num_traces
+
+        if not 0 <= index < num_traces:
+            raise IndexError("Trace index out of range")
+
+        return StoredTrace(self, index)
+
+    def __iter__(self):
+        return (StoredTrace(self, i) for i in range(len(self)))
+
+    def get_num_op_calls(self) -> int:
+        """
+        Return the number of operator calls in the committed traces
+        """
+        return len(self.op_info_col) if self._pending is None else self.trace_starts[-1]
+
+    def _intern(self, obj: Any) -> int:
+        idx = self._object_ids.get(id(obj), None)
+        if idx is None:
+            idx = self._object_ids[id(obj)] = len(self.objects)
+            self.objects.append(obj)
+
+        return idx
+
+    def _intern_kwargs(self, kwargs: Dict[str, Any]) -> int:
+        key = tuple((k, id(v)) for k, v in kwargs.items())
+        idx = self._kwargs_ids.get(key, None)
+        if idx is None:
+            idx = self._kwargs_ids[key] = len(self.kwargs_table)
+            self.kwargs_table.append(kwargs)
+
+        return idx
+
+    def start_trace(self, f_args, f_kwargs):
+        """
+        Start recording a new trace, discarding the trace being recorded if it was not committed
+        """
+        self.discard_trace()
+        self._pending = (len(self.objects), len(self.kwargs_table))
+        self.trace_starts.append(len(self.op_info_col))
+        self.trace_args.append(self._intern(f_args))
+        self.trace_kwargs.append(self._intern(f_kwargs))
+
+    def record_op(self, choice: Any, domain: Any, context: Any, op_info: OpInfo, **kwargs):
+        op_info_idx = self._op_info_ids.get(op_info, None)
+        if op_info_idx is None:
+            op_info_idx = self._op_info_ids[op_info] = len(self.op_infos)
+            self.op_infos.append(op_info)
+
+        choice_idx = _find_choice(domain, choice)
+        if choice_idx < 0:
+            choice_idx = -self._intern(choice) - 1
+
+        self.op_info_col.append(op_info_idx)
+        self.domain_col.append(self._intern(domain))
+        self.context_col.append(self._intern(context))
+        self.kwargs_col.append(self._intern_kwargs(kwargs))
+        self.choice_col.append(choice_idx)
+
+    def commit_trace(self) -> 'StoredTrace':
+        """
+        Finish recording the current trace, and return a view of it
+        """
+        self._pending = None
+        return StoredTrace(self, len(self.trace_starts) - 1)
+
+    def discard_trace(self):
+        """
+        Discard the trace being recorded, if any, along with the objects interned only for it
+        """
+        if self._pending is None:
+            return
+
+        num_objects, num_kwargs = self._pending
+        for obj in self.objects[num_objects:]:
+            del self._object_ids[id(obj)]
+
+        for kwargs in self.kwargs_table[num_kwargs:]:
+            del self._kwargs_ids[tuple((k, id(v)) for k, v in kwargs.items())]
+
+        del self.objects[num_objects:]
+        del self.kwargs_table[num_kwargs:]
+
+        start = self.trace_starts.pop()
+        self.trace_args.pop()
+        self.trace_kwargs.pop()
+        for col in (self.op_info_col, self.domain_col, self.context_col, self.kwargs_col, self.choice_col):
+            del col[start:]
+
+        self._pending = None
+
+    def finish(self):
+        self.discard_trace()
+
+    def _get_end(self, index: int) -> int:
+        return self.trace_starts[index + 1] if index + 1 < len(self.trace_starts) else len(self.op_info_col)
+
+    def get_inputs(self, index: int) -> Tuple[Any, Any]:
+        return self.objects[self.trace_args[index]], self.objects[self.trace_kwargs[index]]
+
+    def get_op_traces(self, index: int) -> List[OpTrace]:
+        objects = self.objects
+        op_traces = []
+        for t in range(self.trace_starts[index], self._get_end(index)):
+            domain = objects[self.domain_col[t]]
+            choice_idx = self.choice_col[t]
+            choice = domain[choice_idx] if choice_idx >= 0 else objects[-choice_idx - 1]
+            op_traces.append(OpTrace(choice=choice, domain=domain, context=objects[self.context_col[t]],
+                                     op_info=self.op_infos[self.op_info_col[t]],
+                                     **self.kwargs_table[self.kwargs_col[t]]))
+
+        return op_traces
+
+
+class StoredTrace(GeneratorTrace):
+    """
+    A read-only view of a trace in a ``TraceStore``. The operator traces are created every time ``op_traces``
+    is accessed. Pickling a view (e.g. to send it across processes) produces a standalone ``GeneratorTrace``.
+    """
+
+    def __init__(self, store: TraceStore, index: int):
+        #  The attributes of GeneratorTrace are provided as properties
+        self.store = store
+        self.index = index
+
+    @property
+    def f_inputs(self):
+        return self.store.get_inputs(self.index)
+
+    @property
+    def op_traces(self) -> List[OpTrace]:
+        return self.store.get_op_traces(self.index)
+
+    def record_op_trace(self, op_trace: OpTrace):
+        raise TypeError("Traces in a TraceStore are read-only")
+
+    def __reduce__(self):
+        return _make_generator_trace, (self.f_inputs, self.op_traces)
+
+
+def _make_generator_trace(f_inputs, op_traces: List[OpTrace]) -> GeneratorTrace:
+    trace = GeneratorTrace(f_inputs)
+    trace.op_traces = op_traces
+    return trace
+
+
+class _TrieNode:
+    __slots__ = ('parent', 'op_trace')
+
+    def __init__(self, parent: Optional['_TrieNode'], op_trace: OpTrace):
+        self.parent = parent
+        self.op_trace = op_trace
+
+
+def _same_choice(a: Any, b: Any) -> bool:
+    return a is b or (type(a) is type(b) and type(a) in _SCALAR_TYPES and a == b)
+
+
+class TraceTrie:
+    """
+    Stores traces as paths in a trie of operator calls, so that traces sharing a prefix of operator calls share
+    the nodes for the prefix. Every trace is a pointer to the node of its last operator call, and every node
+    points to its parent. Memory is proportional to the number of nodes in the explored search tree rather than
+    the total length of the traces.
+
+    The operator calls of a run are matched against the previous run only, which finds the longest shared prefix
+    for depth-first enumeration. Operator calls match if they have the same ``OpInfo`` and make the same choice
+    (by identity, or by equality for scalars). The domain and context of a shared node are the ones seen by
+    the first run, which assumes that the generator is deterministic modulo operator choices.
+
+    Traces are accessed as ``TrieTrace`` views. A trie is used for tracing by passing it as ``tracing`` to
+    ``Generator.with_env``.
+    """
+
+    def __init__(self):
+        #  Tuples of the form (f_inputs, node of the last operator call)
+        self.traces: List[Tuple[Any, Optional[_TrieNode]]] = []
+        self.num_nodes: int = 0
+
+        #  The nodes of the previous run, and the nodes of the current run matched against them so far
+        self._prev_path: List[_TrieNode] = []
+        self._path: List[_TrieNode] = []
+        self._diverged: bool = False
+        self._f_inputs: Any = None
+
+    def __len__(self):
+        return len(self.traces)
+
+    def __getitem__(self, index: int) -> 'TrieTrace':
+        f_inputs, node = self.traces[index]
+        return TrieTrace(f_inputs, node)
+
+    def __iter__(self):
+        return (TrieTrace(f_inputs, node) for f_inputs, node in self.traces)
+
+    def start_trace(self, f_args, f_kwargs):
+        if self._path:
+            self._prev_path = self._path
+
+        self._path = []
+        self._diverged = False
+        self._f_inputs = (f_args, f_kwargs)
+
+    def record_op(self, choice: Any, domain: Any, context: Any, op_info: OpInfo, **kwargs):
+        path = self._path
+        t = len(path)
+        if not self._diverged and t < len(self._prev_path):
+            node = self._prev_path[t]
+            if node.op_trace.op_info == op_info and _same_choice(node.op_trace.choice, choice):
+                path.append(node)
+                return
+
+        self._diverged = True
+        path.append(_TrieNode(path[-1] if t > 0 else None,
+                              OpTrace(choice=choice, domain=domain, context=context, op_info=op_info, **kwargs)))
+        self.num_nodes += 1
+
+    def commit_trace(self) -> 'TrieTrace':
+        node = self._path[-1] if self._path else None
+        self.traces.append((self._f_inputs, node))
+        return TrieTrace(self._f_inputs, node)
+
+    def finish(self):
+        #  Release the nodes of the last runs that are not part of any trace
+        self._prev_path = []
+        self._path = []
+
+
+class TrieTrace(GeneratorTrace):
+    """
+    A read-only view of a trace in a ``TraceTrie``. The operator traces are collected from the trie every time
+    ``op_traces`` is accessed. Pickling a view produces a standalone ``GeneratorTrace``.
+    """
+
+    def __init__(self, f_inputs, node: Optional[_TrieNode]):
+        #  ``op_traces`` is provided as a property
+        self.f_inputs = f_inputs
+        self.node = node
+
+    @property
+    def op_traces(self) -> List[OpTrace]:
+        op_traces = []
+        node = self.node
+        while node is not None:
+            op_traces.append(node.op_trace)
+            node = node.parent
+
+        op_traces.reverse()
+        return op_traces
+
+    def record_op_trace(self, op_trace: OpTrace):
+        raise TypeError("Traces in a TraceTrie are read-only")
+
+    def __reduce__(self):
+        return _make_generator_trace, (self.f_inputs, self.op_traces)
+
+
 class DefaultTracer(Hook):
     def __init__(self):
         self.cur_trace: Optional[GeneratorTrace] = None
@@ -68,3 +467,67 @@ class DefaultTracer(Hook):
 
     def get_last_trace(self):
         return self.cur_trace
+
+
+class StoreTracer(DefaultTracer):
+    """
+    Records traces into a ``TraceStore`` or a ``TraceTrie``. Traces of failed runs are discarded when the next
+    run starts.
+    """
+
+    def __init__(self, store: Union[TraceStore, TraceTrie]):
+        super().__init__()
+        self.store = store
+
+    def init_run(self, f_args, f_kwargs, **kwargs):
+        self.store.start_trace(f_args, f_kwargs)
+
+    def after_op(self, domain=None, context=None, op_info: OpInfo = None, retval: Any = None, **kwargs):
+        self.store.record_op(retval, domain, context, op_info, **kwargs)
+
+    def finish(self):
+        self.store.finish()
+
+    def get_last_trace(self):
+        return self.store.commit_trace()
+
+
+class ChoiceTracer(DefaultTracer):
+    """
+    Records ``ChoiceTrace`` objects, which only contain the choices made by the operators
+    """
+
+    def init_run(self, f_args, f_kwargs, **kwargs):
+        self.cur_trace = ChoiceTrace((f_args, f_kwargs))
+
+    def after_op(self, domain=None, context=None, op_info: OpInfo = None, retval: Any = None, **kwargs):
+        self.cur_trace.record_choice(op_info, domain, retval)
+
+
+def make_tracer(tracing: Union[bool, str, TraceStore, TraceTrie]) -> Optional[DefaultTracer]:
+    """
+    Create the tracer for the ``tracing`` option of an execution environment. Valid options are False (no tracing),
+    True or ``'full'`` (``GeneratorTrace`` objects), ``'choices'`` (``ChoiceTrace`` objects), a ``TraceStore``
+    and a ``TraceTrie``.
+    """
+    if isinstance(tracing, (TraceStore, TraceTrie)):
+        return StoreTracer(tracing)
+
+    if tracing is True or tracing == 'full':
+        return DefaultTracer()
+
+    if tracing == 'choices':
+        return ChoiceTracer()
+
+    if tracing is False or tracing is None:
+        return None
+
+    raise ValueError(f"Unrecognized tracing option - {tracing!r}")
+
+
+def get_worker_tracing(tracing: Union[bool, str, TraceStore, TraceTrie]) -> Union[bool, str]:
+    """
+    Return the tracing option for worker processes, which send back standalone traces instead of recording
+    them into a ``TraceStore`` or ``TraceTrie``
+    """
+    return True if isinstance(tracing, (TraceStore, TraceTrie)) else tracing
@@ -0,0 +1,53 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    A set of byte-strings with bounded memory, which may report false positives at roughly ``error_rate`` once
+    ``capacity`` keys have been added, but never false negatives.
+
+    Args:
+        capacity (int): The expected number of keys
+        error_rate (float): The desired false-positive rate at capacity
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("Bloom filters require a positive capacity and an error rate in (0, 1)")
+
+        self.num_bits: int = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes: int = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.size: int = 0
+
+    def _positions(self, key: bytes):
+        #  Double hashing i.e. h1 + i * h2 using two halves of a single digest
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key: bytes) -> bool:
+        """
+        Add ``key`` to the filter. Returns True if the key was (probably) present already.
+        """
+        present = True
+        bits = self.bits
+        for pos in self._positions(key):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+
+        if not present:
+            self.size += 1
+
+        return present
+
+    def __contains__(self, key: bytes) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,285 @@
+import bisect
+import collections.abc
+import itertools
+import math
+from abc import abstractmethod
+from typing import Collection, Iterable, Iterator, List, Sequence, Tuple, Union
+
+
+class CombinatorialDomain(collections.abc.Sequence):
+    """
+    A lazy, read-only sequence of combinatorial objects. Supports ``len``, indexing (unranking) and slicing without
+    materializing the elements. Iteration produces the elements in the same order as the corresponding
+    ``itertools`` function.
+    """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def unrank(self, k: int) -> Tuple:
+        """
+        Return the element at index ``k``, assuming ``0 <= k < len(self)``
+        """
+
+    @abstractmethod
+    def iterate(self, start: int = 0) -> Iterator[Tuple]:
+        """
+        Iterate over the elements starting from index ``start``, assuming ``0 <= start``
+        """
+
+    def __getitem__(self, k: Union[int, slice]):
+        if isinstance(k, slice):
+            return DomainSlice(self, range(len(self))[k])
+
+        n = len(self)
+        if k < 0:
+            k += n
+
+        if not 0 <= k < n:
+            raise IndexError(f"Index out of range for domain of size {n}")
+
+        return self.unrank(k)
+
+    def __iter__(self):
+        return self.iterate(0)
+
+    def __bool__(self):
+        return len(self) > 0
+
+
+class DomainSlice(CombinatorialDomain):
+    def __init__(self, base: CombinatorialDomain, indices: range):
+        self.base = base
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def unrank(self, k: int):
+        return self.base.unrank(self.indices[k])
+
+    def iterate(self, start: int = 0):
+        indices = self.indices[start:]
+        if indices.step == 1:
+            return itertools.islice(self.base.iterate(indices.start), len(indices))
+
+        return (self.base.unrank(i) for i in indices)
+
+    def __getitem__(self, k: Union[int, slice]):
+        if isinstance(k, slice):
+            return DomainSlice(self.base, self.indices[k])
+
+        return super().__getitem__(k)
+
+
+class _FixedLengthDomain(CombinatorialDomain):
+    """
+    Base for domains that are the concatenation of sub-domains of fixed-length tuples, one for every length.
+    Sub-classes operate on tuples of indices into ``domain``.
+    """
+
+    def __init__(self, domain: Iterable, lengths: Collection[int]):
+        self.domain: List = list(domain)
+        self.lengths: List[int] = list(lengths)
+        self.offsets: List[int] = list(itertools.accumulate((self.count(l) for l in self.lengths), initial=0))
+
+    @abstractmethod
+    def count(self, length: int) -> int:
+        pass
+
+    @abstractmethod
+    def unrank_indices(self, length: int, k: int) -> List[int]:
+        pass
+
+    @abstractmethod
+    def next_indices(self, indices: List[int]) -> bool:
+        """
+        Advance ``indices`` in place to the indices of the next element. Returns False if there is none.
+        """
+
+    @abstractmethod
+    def iterate_fixed(self, length: int) -> Iterator[Tuple]:
+        pass
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def unrank(self, k: int):
+        idx = bisect.bisect_right(self.offsets, k) - 1
+        domain = self.domain
+        return tuple(domain[i] for i in self.unrank_indices(self.lengths[idx], k - self.offsets[idx]))
+
+    def iterate(self, start: int = 0):
+        if start >= len(self):
+            return
+
+        idx = bisect.bisect_right(self.offsets, start) - 1
+        offset = start - self.offsets[idx]
+        if offset > 0:
+            #  Unrank the first element, and continue from it using the successor function
+            domain = self.domain
+            indices = self.unrank_indices(self.lengths[idx], offset)
+            while True:
+                yield tuple(domain[i] for i in indices)
+                if not self.next_indices(indices):
+                    break
+
+            idx += 1
+
+        for length in self.lengths[idx:]:
+            yield from self.iterate_fixed(length)
+
+
+class Combinations(_FixedLengthDomain):
+    """
+    Subsets of ``domain`` of the given lengths, in the order of ``itertools.combinations``
+    """
+
+    def count(self, length: int):
+        return math.comb(len(self.domain), length) if length >= 0 else 0
+
+    def unrank_indices(self, length: int, k: int):
+        n = len(self.domain)
+        indices = []
+        c = 0
+        for i in range(length):
+            #  Skip all the combinations with ``c`` at position ``i``
+            while True:
+                count = math.comb(n - c - 1, length - i - 1)
+                if k < count:
+                    break
+
+                k -= count
+                c += 1
+
+            indices.append(c)
+            c += 1
+
+        return indices
+
+    def next_indices(self, indices: List[int]):
+        n = len(self.domain)
+        length = len(indices)
+        for i in range(length - 1, -1, -1):
+            if indices[i] != i + n - length:
+                indices[i] += 1
+                for j in range(i + 1, length):
+                    indices[j] = indices[j - 1] + 1
+
+                return True
+
+        return False
+
+    def iterate_fixed(self, length: int):
+        return itertools.combinations(self.domain, length)
+
+
+class Permutations(_FixedLengthDomain):
+    """
+    Ordered subsets of ``domain`` of the given lengths, in the order of ``itertools.permutations``
+    """
+
+    def count(self, length: int):
+        return math.perm(len(self.domain), length) if length >= 0 else 0
+
+    def unrank_indices(self, length: int, k: int):
+        available = list(range(len(self.domain)))
+        indices = []
+        for i in range(length):
+            block = math.perm(len(available) - 1, length - i - 1)
+            idx, k = divmod(k, block)
+            indices.append(available.pop(idx))
+
+        return indices
+
+    def next_indices(self, indices: List[int]):
+        n = len(self.domain)
+        used = set(indices)
+        for i in range(len(indices) - 1, -1, -1):
+            used.discard(indices[i])
+            for v in range(indices[i] + 1, n):
+                if v not in used:
+                    #  Fill the remaining positions with the smallest unused indices in increasing order
+                    indices[i] = v
+                    used.add(v)
+                    rest = (x for x in range(n) if x not in used)
+                    for j in range(i + 1, len(indices)):
+                        indices[j] = next(rest)
+
+                    return True
+
+        return False
+
+    def iterate_fixed(self, length: int):
+        return itertools.permutations(self.domain, length)
+
+
+def _next_mixed_radix(indices: List[int], radices: Sequence[int]) -> bool:
+    for i in range(len(indices) - 1, -1, -1):
+        indices[i] += 1
+        if indices[i] < radices[i]:
+            return True
+
+        indices[i] = 0
+
+    return False
+
+
+def _unrank_mixed_radix(k: int, radices: Sequence[int]) -> List[int]:
+    indices = [0] * len(radices)
+    for i in range(len(radices) - 1, -1, -1):
+        k, indices[i] = divmod(k, radices[i])
+
+    return indices
+
+
+class Sequences(_FixedLengthDomain):
+    """
+    Sequences of elements of ``domain`` (with repetition) of the given lengths, in the order of
+    ``itertools.product(domain, repeat=length)``
+    """
+
+    def count(self, length: int):
+        return len(self.domain) ** length if length >= 0 else 0
+
+    def unrank_indices(self, length: int, k: int):
+        return _unrank_mixed_radix(k, [len(self.domain)] * length)
+
+    def next_indices(self, indices: List[int]):
+        return _next_mixed_radix(indices, [len(self.domain)] * len(indices))
+
+    def iterate_fixed(self, length: int):
+        return itertools.product(self.domain, repeat=length)
+
+
+class CartesianProduct(CombinatorialDomain):
+    """
+    The cartesian product of ``domains``, in the order of ``itertools.product``
+    """
+
+    def __init__(self, domains: Iterable[Iterable]):
+        self.domains: List[List] = [list(d) for d in domains]
+        self.radices: List[int] = [len(d) for d in self.domains]
+        self.size = math.prod(self.radices)
+
+    def __len__(self):
+        return self.size
+
+    def unrank(self, k: int):
+        return tuple(d[i] for d, i in zip(self.domains, _unrank_mixed_radix(k, self.radices)))
+
+    def iterate(self, start: int = 0):
+        if start == 0:
+            yield from itertools.product(*self.domains)
+            return
+
+        if start >= self.size:
+            return
+
+        indices = _unrank_mixed_radix(start, self.radices)
+        while True:
+            yield tuple(d[i] for d, i in zip(self.domains, indices))
+            if not _next_mixed_radix(indices, self.radices):
+                break
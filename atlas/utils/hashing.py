@@ -0,0 +1,146 @@
+import hashlib
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+class Unhashable(Exception):
+    """
+    Raised by hashers for values that cannot be fingerprinted by content
+    """
+
+
+#  Marks values fingerprinted by identity, which only happens if ``refs`` is passed to ``ValueHasher.hash_value``
+_ID = object()
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _hash_ndarray(value: np.ndarray, hasher: 'ValueHasher') -> Any:
+    if value.dtype.hasobject:
+        #  The buffer of object arrays contains pointers, so the elements are hashed individually
+        return 'ndarray', value.dtype.str, value.shape, hasher.hash_value(value.tolist())
+
+    return 'ndarray', value.dtype.str, value.shape, _digest(np.ascontiguousarray(value).tobytes())
+
+
+def _hash_pandas_values(obj, hasher: 'ValueHasher') -> Any:
+    #  Cheaper than ``pandas.util.hash_pandas_object`` for the small objects common in synthesis, which spends
+    #  most of the time constructing intermediate series. Extension arrays are converted to object arrays
+    return str(obj.dtype), _hash_ndarray(obj.to_numpy(), hasher)
+
+
+def _hash_index(value, hasher: 'ValueHasher') -> Any:
+    import pandas as pd
+
+    if isinstance(value, pd.RangeIndex):
+        return 'RangeIndex', value.start, value.stop, value.step, hasher.hash_value(tuple(value.names))
+
+    return 'Index', type(value).__name__, hasher.hash_value(tuple(value.names)), _hash_pandas_values(value, hasher)
+
+
+def _hash_series(value, hasher: 'ValueHasher') -> Any:
+    return 'Series', hasher.hash_value(value.name), _hash_index(value.index, hasher), \
+        _hash_pandas_values(value, hasher)
+
+
+def _hash_dataframe(value, hasher: 'ValueHasher') -> Any:
+    return 'DataFrame', _hash_index(value.columns, hasher), _hash_index(value.index, hasher), \
+        tuple(_hash_pandas_values(column, hasher) for _, column in value.items())
+
+
+def default_hashers() -> Dict[type, Callable[[Any, 'ValueHasher'], Any]]:
+    """
+    Return the hashers used by ``ValueHasher`` by default, which cover numpy arrays and, if pandas is installed,
+    pandas data-frames, series and indexes.
+    """
+    hashers: Dict[type, Callable[[Any, 'ValueHasher'], Any]] = {np.ndarray: _hash_ndarray}
+    try:
+        import pandas as pd
+        hashers.update({pd.Index: _hash_index, pd.Series: _hash_series, pd.DataFrame: _hash_dataframe})
+
+    except ImportError:
+        pass
+
+    return hashers
+
+
+class ValueHasher:
+    """
+    Computes fingerprints of values by content, such that values with equal fingerprints are (with very high
+    probability) equal. Built-in containers are fingerprinted element-wise and other hashable objects by
+    themselves. Objects of other types are fingerprinted by the hasher registered for the closest class in
+    their MRO, if any.
+
+    A hasher is a callable taking the value and the ``ValueHasher`` (for fingerprinting nested values), and
+    returning a hashable fingerprint. It may raise ``Unhashable`` if the value cannot be fingerprinted.
+
+    Args:
+        hashers (Optional[Dict[type, Callable]]): Hashers to use in addition to (or instead of) the defaults
+            returned by ``default_hashers``
+    """
+
+    def __init__(self, hashers: Optional[Dict[type, Callable[[Any, 'ValueHasher'], Any]]] = None):
+        self.hashers = default_hashers()
+        if hashers is not None:
+            self.hashers.update(hashers)
+
+        self._resolved: Dict[type, Optional[Callable]] = {}
+
+    def _get_hasher(self, t: type) -> Optional[Callable]:
+        try:
+            return self._resolved[t]
+
+        except KeyError:
+            hasher = next((self.hashers[c] for c in t.__mro__ if c in self.hashers), None)
+            self._resolved[t] = hasher
+            return hasher
+
+    def hash_value(self, value: Any, refs: Optional[List[Any]] = None) -> Any:
+        """
+        Return the fingerprint of ``value``. Raises ``Unhashable`` if it cannot be fingerprinted by content,
+        unless ``refs`` is provided, in which case such values are fingerprinted by identity instead and
+        appended to ``refs``. The objects in ``refs`` must be kept alive as long as the fingerprint is in use
+        so that their ids are not reused.
+        """
+        t = type(value)
+        if t is tuple or t is list:
+            return t, tuple(self.hash_value(v, refs) for v in value)
+
+        if t is dict:
+            return t, tuple((self.hash_value(k, refs), self.hash_value(v, refs)) for k, v in value.items())
+
+        if t is set or t is frozenset:
+            return t, frozenset(self.hash_value(v, refs) for v in value)
+
+        try:
+            hasher = self._get_hasher(t)
+            if hasher is not None:
+                return hasher(value, self)
+
+            try:
+                hash(value)
+
+            except TypeError:
+                raise Unhashable
+
+        except Unhashable:
+            if refs is None:
+                raise
+
+            refs.append(value)
+            return _ID, id(value)
+
+        return t, value
+
+    def __call__(self, value: Any) -> Optional[Any]:
+        """
+        Return the fingerprint of ``value``, or None if it cannot be fingerprinted by content
+        """
+        try:
+            return self.hash_value(value)
+
+        except Unhashable:
+            return None
@@ -2,12 +2,34 @@ import ast
 import inspect
 import textwrap
 from inspect import builtins, ismodule, iscode, ClosureVars
-from typing import Optional
+from typing import Optional, List, Dict, Any, Tuple
 
 from atlas.utils import astutils
 
 
-def getclosurevars_recursive(func, f_ast: Optional[ast.FunctionDef] = None):
+def get_annotation_names(f_ast: ast.FunctionDef) -> List[str]:
+    """
+    Collect all the names referenced in the argument and return annotations of a function.
+
+    Args:
+        f_ast (ast.FunctionDef): The AST of the function
+
+    Returns:
+        A list of names
+
+    """
+    annotation_names = []
+    for n in ast.walk(f_ast.args):
+        if isinstance(n, ast.arg) and n.annotation is not None:
+            annotation_names.extend(astutils.get_all_names(n.annotation))
+    if f_ast.returns is not None:
+        annotation_names.extend(astutils.get_all_names(f_ast.returns))
+
+    return annotation_names
+
+
+def getclosurevars_recursive(func, f_ast: Optional[ast.FunctionDef] = None,
+                             annotation_names: Optional[List[str]] = None):
     """
     The default getclosurevars doesn't go over nested function defs and list comprehensions.
     We write a recursive version of the same.
@@ -16,6 +38,8 @@ def getclosurevars_recursive(func, f_ast: Optional[ast.FunctionDef] = None):
         f_ast (Optional[ast.FunctionDef]): The AST of the function if available.
             If not, an attempt will be made to retrieve the AST
         func (Callable): The function to inspect
+        annotation_names (Optional[List[str]]): The names used in the annotations of the function if known
+            in advance. If provided, the AST of the function is not required.
 
     Returns:
         An instance of ClosureVars
@@ -32,19 +56,16 @@ def getclosurevars_recursive(func, f_ast: Optional[ast.FunctionDef] = None):
             for var, cell in zip(f_code.co_freevars, func.__closure__)
         }
 
-    annotation_names = []
-    try:
-        if f_ast is None:
-            f_ast: ast.FunctionDef = astutils.parse(textwrap.dedent(inspect.getsource(func)))
+    if annotation_names is None:
+        annotation_names = []
+        try:
+            if f_ast is None:
+                f_ast: ast.FunctionDef = astutils.parse(textwrap.dedent(inspect.getsource(func)))
 
-        for n in ast.walk(f_ast.args):
-            if isinstance(n, ast.arg) and n.annotation is not None:
-                annotation_names.extend(astutils.get_all_names(n.annotation))
-        if f_ast.returns is not None:
-            annotation_names.extend(astutils.get_all_names(f_ast.returns))
+            annotation_names = get_annotation_names(f_ast)
 
-    except:
-        pass
+        except:
+            pass
 
     # Global and builtin references are named in co_names and resolved
     # by looking them up in __globals__ or __builtins__
@@ -88,3 +109,65 @@ def getclosurevars_recursive(func, f_ast: Optional[ast.FunctionDef] = None):
 
     return ClosureVars(nonlocal_vars, global_vars,
                        builtin_vars, unbound_names)
+
+
+def get_qualified_name(node: ast.AST) -> Optional[str]:
+    """
+    Get the dotted name corresponding to a chain of attribute accesses on a name such as ``a.b.c``.
+
+    Args:
+        node (ast.AST): The expression node
+
+    Returns:
+        The dotted name, or None if the expression is not such a chain
+
+    """
+    attrs = []
+    while isinstance(node, ast.Attribute):
+        attrs.append(node.attr)
+        node = node.value
+
+    if not isinstance(node, ast.Name):
+        return None
+
+    attrs.append(node.id)
+    return '.'.join(reversed(attrs))
+
+
+def resolve_qualified_name(name: str, namespace: Dict[str, Any]) -> Tuple[bool, Any]:
+    """
+    Statically resolve a dotted name against a namespace without evaluating any code. Attributes of modules are
+    looked up in their dictionaries, and attributes of other objects such as classes and instances with
+    ``inspect.getattr_static``, so descriptors and ``__getattr__`` are never invoked. Attributes defined through
+    descriptors resolve to the descriptor itself e.g. a generator defined in a class resolves to the unbound
+    generator even when accessed through an instance.
+
+    Args:
+        name (str): The dotted name, as returned by ``get_qualified_name``
+        namespace (Dict[str, Any]): The namespace to resolve the first component of the name in
+
+    Returns:
+        A tuple with the first element denoting whether the resolution succeeded,
+        and the second element being the resolved object
+
+    """
+    root, *attrs = name.split('.')
+    if root not in namespace:
+        return False, None
+
+    obj = namespace[root]
+    for attr in attrs:
+        if ismodule(obj):
+            if attr not in obj.__dict__:
+                return False, None
+
+            obj = obj.__dict__[attr]
+
+        else:
+            try:
+                obj = inspect.getattr_static(obj, attr)
+
+            except AttributeError:
+                return False, None
+
+    return True, obj
@@ -0,0 +1,41 @@
+"""
+Measures the compilation of the generators of the pandas group with the synthesis strategy, starting from an empty
+in-memory compilation cache every time. Reports the best, median and worst CPU time over the repetitions.
+The on-disk cache is disabled. To compare against another revision, run this script from a checkout of it.
+
+Usage: python benchmarks/compile_pandas.py [repetitions]
+"""
+import statistics
+import sys
+import time
+import warnings
+
+from atlas.generators import CompilationCache, compile_func
+from atlas.synthesis.pandas import engine  # noqa: F401 (registers the generators of the pandas group)
+from atlas.synthesis.pandas.strategies import PandasSynthesisStrategy
+from atlas.utils import get_group_by_name
+
+
+def main():
+    warnings.simplefilter('ignore')
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+
+    CompilationCache.disable_persistence()
+    gens = list(get_group_by_name('pandas'))
+    strategy = PandasSynthesisStrategy()
+
+    timings = []
+    for _ in range(repetitions):
+        CompilationCache.clear()
+        start = time.process_time()
+        for gen in gens:
+            compile_func(gen, gen.func, strategy)
+
+        timings.append(time.process_time() - start)
+
+    print(f"{len(gens)} generators, {repetitions} repetitions: best={min(timings):.3f}s  "
+          f"median={statistics.median(timings):.3f}s  worst={max(timings):.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Measures memoization of the API generators in the sequential pandas enumerator, comparing fingerprinting of
+data-frames by content (the default) and by identity. The enumerator is restricted to a few functions that often
+produce equal intermediates, so that the same API call is reached through different function sequences.
+
+Usage: python benchmarks/memo_pandas.py [num_results]
+"""
+import itertools
+import logging
+import sys
+import time
+import warnings
+
+import pandas as pd
+
+from atlas.memo import MemoCache
+from atlas.synthesis.pandas import engine
+from atlas.utils.hashing import Unhashable
+
+FUNCTIONS = ['df.abs', 'df.round', 'df.drop_duplicates', 'df.dropna', 'df.fillna', 'df.sort_values', 'df.head',
+             'df.tail', 'df.T']
+
+
+def by_identity(value, hasher):
+    raise Unhashable
+
+
+def run(num_results: int, memo: MemoCache):
+    inputs = [pd.DataFrame({'a': [1, 2, 3, 4], 'b': [5.0, 6.0, 7.0, 8.0]})]
+    output = pd.DataFrame({'a': [1, 2]})
+    env = engine.sequential_enumerator.with_env(memo=memo)
+    start = time.perf_counter()
+    results = [r[2] for r in itertools.islice(env.generate(inputs, output, log_errors=False), num_results)]
+    return time.perf_counter() - start, results
+
+
+def main():
+    warnings.simplefilter('ignore')
+    logging.disable(logging.CRITICAL)
+    num_results = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    all_gens = engine.api_gens
+    engine.api_gens = {name: all_gens[name] for name in FUNCTIONS}
+    for gen in engine.api_gens.values():
+        gen.memoize = True
+
+    identity = {pd.DataFrame: by_identity, pd.Series: by_identity, pd.Index: by_identity}
+    outcomes = {}
+    for label, memo in [("identity", MemoCache(hashers=identity)), ("content", MemoCache())]:
+        elapsed, results = run(num_results, memo)
+        outcomes[label] = results
+        total = memo.hits + memo.misses
+        print(f"{label:>8}: {elapsed:6.2f}s  hits={memo.hits}  misses={memo.misses}  "
+              f"hit-rate={memo.hits / max(total, 1):.1%}  entries={memo.num_entries}  bytes={memo.num_bytes}")
+
+    for gen in engine.api_gens.values():
+        gen.memoize = False
+
+    elapsed, results = run(num_results, None)
+    print(f"{'no memo':>8}: {elapsed:6.2f}s")
+    assert outcomes["identity"] == outcomes["content"] == results
+
+
+if __name__ == '__main__':
+    main()